@@ -0,0 +1,513 @@
+"""
+SQLite数据库(sqlite_database.py)和Parquet数据库(parquet_database.py)
+性能测试, 需要先将database.py安装为vnpy.trader.database, 然后在ch3目录
+下运行:
+
+    python benchmark_database.py ingest
+    python benchmark_database.py arrays
+    python benchmark_database.py iter
+    python benchmark_database.py overview
+    python benchmark_database.py parquet
+"""
+import csv
+import gc
+import multiprocessing
+import os
+import tracemalloc
+from argparse import ArgumentParser
+from copy import copy
+from datetime import datetime, timedelta
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Callable, List, Tuple
+
+import numpy as np
+from peewee import chunked
+
+import sqlite_database
+from parquet_database import ParquetDatabase
+from sqlite_database import DbBarData, DbBarOverview, DbTickData, SqliteDatabase
+
+from vnpy.trader.constant import Exchange, Interval
+from vnpy.trader.database import DB_TZ, BaseDatabase, convert_tz
+from vnpy.trader.object import BarData, TickData
+
+
+CSV_PATH: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ch5", "TA888_minutes.csv")
+
+
+def load_csv_bars(symbol: str = "TA888") -> List[BarData]:
+    """读取ch5/TA888_minutes.csv中的分钟K线"""
+    bars: List[BarData] = []
+
+    with open(CSV_PATH) as f:
+        for row in csv.DictReader(f):
+            bar: BarData = BarData(
+                symbol=symbol,
+                exchange=Exchange.CZCE,
+                datetime=datetime.strptime(row["datetime"], "%Y-%m-%d %H:%M").replace(tzinfo=DB_TZ),
+                interval=Interval.MINUTE,
+                volume=float(row["volume"]),
+                open_interest=float(row["open_interest"]),
+                open_price=float(row["open"]),
+                high_price=float(row["high"]),
+                low_price=float(row["low"]),
+                close_price=float(row["close"]),
+                gateway_name="DB"
+            )
+            bars.append(bar)
+
+    return bars
+
+
+def create_ticks(bars: List[BarData], count: int) -> List[TickData]:
+    """由K线生成count个TICK数据(每500毫秒一个)"""
+    ticks: List[TickData] = []
+    start: datetime = bars[0].datetime
+
+    for i in range(count):
+        bar: BarData = bars[i % len(bars)]
+        tick: TickData = TickData(
+            symbol=bar.symbol,
+            exchange=bar.exchange,
+            datetime=start + timedelta(milliseconds=500 * i),
+            name=bar.symbol,
+            volume=bar.volume,
+            open_interest=bar.open_interest,
+            last_price=bar.close_price,
+            last_volume=1,
+            limit_up=bar.close_price * 1.1,
+            limit_down=bar.close_price * 0.9,
+            open_price=bar.open_price,
+            high_price=bar.high_price,
+            low_price=bar.low_price,
+            pre_close=bar.open_price,
+            bid_price_1=bar.close_price - 2,
+            ask_price_1=bar.close_price + 2,
+            bid_volume_1=10,
+            ask_volume_1=10,
+            gateway_name="DB"
+        )
+        ticks.append(tick)
+
+    return ticks
+
+
+def legacy_save(bars: List[BarData], ticks: List[TickData]) -> None:
+    """改造前的写入方式: 修改对象__dict__后使用peewee insert_many, K线每批50条, TICK每批10条"""
+    for data, model, size in [(bars, DbBarData, 50), (ticks, DbTickData, 10)]:
+        rows: list = []
+
+        for obj in data:
+            obj.datetime = convert_tz(obj.datetime)
+
+            d: dict = obj.__dict__
+            d["exchange"] = d["exchange"].value
+            if "interval" in d:
+                d["interval"] = d["interval"].value
+            d.pop("gateway_name")
+            d.pop("vt_symbol")
+            rows.append(d)
+
+        with sqlite_database.db.atomic():
+            for c in chunked(rows, size):
+                model.insert_many(c).on_conflict_replace().execute()
+
+
+def benchmark_ingest(symbol_count: int = 4, tick_count: int = 200_000) -> None:
+    """
+    对比改造前后写入symbol_count个合约的TA888分钟K线(每个约5万条)
+    以及tick_count个TICK的速度, 第二次写入相同数据测试覆盖更新
+    """
+    bars: List[BarData] = []
+    for i in range(symbol_count):
+        bars.extend(load_csv_bars(f"TA{i}"))
+
+    ticks: List[TickData] = create_ticks(bars, tick_count)
+
+    def save(database: SqliteDatabase) -> None:
+        for i in range(symbol_count):
+            symbol: str = f"TA{i}"
+            database.save_bar_data([bar for bar in bars if bar.symbol == symbol])
+        database.save_tick_data(ticks)
+
+    cases: List[tuple] = [
+        ("legacy insert_many", None),
+        ("executemany", lambda database: save(database)),
+        ("bulk_ingest", lambda database: bulk_save(database, save, False)),
+        ("bulk_ingest defer_index", lambda database: bulk_save(database, save, True)),
+    ]
+
+    with TemporaryDirectory() as folder:
+        for n, (name, func) in enumerate(cases):
+            sqlite_database.db.init(os.path.join(folder, f"{n}.db"))
+            database: SqliteDatabase = SqliteDatabase()
+
+            for attempt in ["insert", "replace"]:
+                if func:
+                    start: float = perf_counter()
+                    func(database)
+                else:
+                    bar_copies: List[BarData] = [copy(bar) for bar in bars]
+                    tick_copies: List[TickData] = [copy(tick) for tick in ticks]
+
+                    start = perf_counter()
+                    legacy_save(bar_copies, tick_copies)
+
+                cost: float = perf_counter() - start
+                rows: int = len(bars) + len(ticks)
+                print(f"{name:<26}{attempt:<10}{rows:>10,} rows{cost:>8.2f} s{rows / cost:>12,.0f} rows/s")
+
+            assert DbBarData.select().count() == len(bars)
+            assert DbTickData.select().count() == len(ticks)
+
+            sqlite_database.db.close()
+
+    # 调用方的数据对象未被修改
+    assert bars[0].datetime.tzinfo and isinstance(bars[0].exchange, Exchange) and bars[0].vt_symbol
+    assert ticks[0].datetime.tzinfo and ticks[0].gateway_name == "DB"
+
+
+def bulk_save(database: SqliteDatabase, save: Callable, defer_index: bool) -> None:
+    """在批量导入模式下写入"""
+    with database.bulk_ingest(defer_index):
+        save(database)
+
+
+def create_bars(count: int, symbol: str = "TA888") -> List[BarData]:
+    """循环使用TA888分钟K线的价格, 生成count根连续的分钟K线"""
+    source: List[BarData] = load_csv_bars(symbol)
+    start: datetime = source[0].datetime
+
+    bars: List[BarData] = []
+    for i in range(count):
+        bar: BarData = copy(source[i % len(source)])
+        bar.datetime = start + timedelta(minutes=i)
+        bars.append(bar)
+
+    return bars
+
+
+def measure(func: Callable) -> Tuple[float, float, object]:
+    """返回耗时(秒), 内存峰值(MB)以及函数返回值"""
+    gc.collect()
+    start: float = perf_counter()
+    func()
+    cost: float = perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    result: object = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return cost, peak / 1024 / 1024, result
+
+
+def benchmark_arrays(bar_count: int = 1_000_000, tick_count: int = 300_000) -> None:
+    """
+    对比load_bar_data/load_tick_data返回对象列表和load_bar_arrays/
+    load_tick_arrays返回结构化数组的耗时和内存峰值, 并校验数据一致
+    """
+    bars: List[BarData] = create_bars(bar_count)
+    ticks: List[TickData] = create_ticks(bars, tick_count)
+
+    start: datetime = bars[0].datetime
+    end: datetime = bars[-1].datetime
+
+    with TemporaryDirectory() as folder:
+        sqlite_database.db.init(os.path.join(folder, "arrays.db"))
+        database: SqliteDatabase = SqliteDatabase()
+
+        with database.bulk_ingest():
+            database.save_bar_data(bars)
+            database.save_tick_data(ticks)
+
+        del bars, ticks
+
+        cases: list = [
+            (
+                f"{bar_count:,} bars",
+                lambda: database.load_bar_data("TA888", Exchange.CZCE, Interval.MINUTE, start, end),
+                lambda: database.load_bar_arrays("TA888", Exchange.CZCE, Interval.MINUTE, start, end),
+                "close_price"
+            ),
+            (
+                f"{tick_count:,} ticks",
+                lambda: database.load_tick_data("TA888", Exchange.CZCE, start, end),
+                lambda: database.load_tick_arrays("TA888", Exchange.CZCE, start, end),
+                "last_price"
+            ),
+        ]
+
+        for name, load_objects, load_arrays, field in cases:
+            object_cost, object_peak, objects = measure(load_objects)
+            array_cost, array_peak, array = measure(load_arrays)
+
+            print(f"{name:<16}{'objects':<8}{object_cost:>8.2f} s{object_peak:>10.1f} MB")
+            print(f"{'':<16}{'arrays':<8}{array_cost:>8.2f} s{array_peak:>10.1f} MB")
+
+            assert len(objects) == len(array)
+            assert np.array_equal(array[field], [getattr(d, field) for d in objects])
+            assert array["datetime"][-1] == np.datetime64(convert_tz(objects[-1].datetime))
+
+            del objects, array
+
+        sqlite_database.db.close()
+
+
+def run_tick_load(path: str, mode: str, start: datetime, end: datetime, queue: multiprocessing.Queue) -> None:
+    """
+    在子进程中读取并遍历TICK数据, 返回数量、耗时和内存峰值(VmHWM),
+    mode为list(一次读取全部)、iter(分块读取)或none(只导入模块)
+    """
+    sqlite_database.db.init(path)
+    database: SqliteDatabase = SqliteDatabase()
+
+    count: int = 0
+    start_time: float = perf_counter()
+
+    if mode == "list":
+        for tick in database.load_tick_data("TA888", Exchange.CZCE, start, end):
+            count += 1
+    elif mode == "iter":
+        for ticks in database.iter_tick_data("TA888", Exchange.CZCE, start, end):
+            for tick in ticks:
+                count += 1
+
+    cost: float = perf_counter() - start_time
+
+    # ru_maxrss会继承自父进程, 使用本进程内存空间的VmHWM
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                peak: float = int(line.split()[1]) / 1024
+
+    queue.put((count, cost, peak))
+
+
+def benchmark_iter(tick_count: int = 500_000) -> None:
+    """
+    对比load_tick_data一次读取全部TICK和iter_tick_data分块读取时
+    进程的内存峰值(RSS), 每种方式在新启动的子进程中运行
+    """
+    bars: List[BarData] = create_bars(tick_count // 100)
+    ticks: List[TickData] = create_ticks(bars, tick_count)
+
+    start: datetime = convert_tz(ticks[0].datetime)
+    end: datetime = convert_tz(ticks[-1].datetime)
+
+    with TemporaryDirectory() as folder:
+        path: str = os.path.join(folder, "iter.db")
+        sqlite_database.db.init(path)
+        database: SqliteDatabase = SqliteDatabase()
+
+        with database.bulk_ingest():
+            database.save_tick_data(ticks)
+        sqlite_database.db.close()
+
+        del bars, ticks
+
+        context = multiprocessing.get_context("spawn")
+
+        for mode in ["none", "list", "iter"]:
+            queue: multiprocessing.Queue = context.Queue()
+            process = context.Process(target=run_tick_load, args=(path, mode, start, end, queue))
+            process.start()
+            count, cost, peak = queue.get()
+            process.join()
+
+            print(f"{mode:<8}{count:>10,} ticks{cost:>8.2f} s{peak:>10.1f} MB peak RSS")
+
+            if mode != "none":
+                assert count == tick_count
+
+
+def legacy_init_bar_overview() -> None:
+    """改造前的汇总初始化: 分组统计数量后, 每组再分别查询最早和最晚的K线"""
+    s = (
+        DbBarData.select(
+            DbBarData.symbol,
+            DbBarData.exchange,
+            DbBarData.interval,
+            sqlite_database.fn.COUNT(DbBarData.id).alias("count")
+        ).group_by(
+            DbBarData.symbol,
+            DbBarData.exchange,
+            DbBarData.interval
+        )
+    )
+
+    for data in s:
+        overview: DbBarOverview = DbBarOverview()
+        overview.symbol = data.symbol
+        overview.exchange = data.exchange
+        overview.interval = data.interval
+        overview.count = data.count
+
+        condition = (
+            (DbBarData.symbol == data.symbol)
+            & (DbBarData.exchange == data.exchange)
+            & (DbBarData.interval == data.interval)
+        )
+        overview.start = DbBarData.select().where(condition).order_by(DbBarData.datetime.asc()).first().datetime
+        overview.end = DbBarData.select().where(condition).order_by(DbBarData.datetime.desc()).first().datetime
+        overview.save()
+
+
+def benchmark_overview(symbol_count: int = 100, bar_count: int = 100_000, batch_size: int = 1_000) -> None:
+    """
+    写入symbol_count个合约各bar_count根K线(默认共1000万条)后, 对比:
+    1. 非stream模式下保存batch_size根K线(一半覆盖已有数据)时, 增量维护
+       汇总与改造前全量COUNT的耗时, 并校验汇总数量正确
+    2. init_bar_overview改造前后的耗时
+    """
+    with TemporaryDirectory() as folder:
+        sqlite_database.db.init(os.path.join(folder, "overview.db"))
+        database: SqliteDatabase = SqliteDatabase()
+
+        start: float = perf_counter()
+        with database.bulk_ingest(defer_index=True):
+            for i in range(symbol_count):
+                database.save_bar_data(create_bars(bar_count, f"S{i}"))
+        cost: float = perf_counter() - start
+
+        rows: int = symbol_count * bar_count
+        print(f"{'ingest':<32}{rows:>12,} rows{cost:>10.2f} s{rows / cost:>12,.0f} rows/s")
+
+        # 最后batch_size/2根覆盖已有数据, 其余为新数据
+        bars: List[BarData] = create_bars(bar_count + batch_size // 2, "S0")[-batch_size:]
+
+        start = perf_counter()
+        database.save_bar_data(bars)
+        cost = perf_counter() - start
+        print(f"{'save_bar_data (incremental)':<32}{batch_size:>12,} bars{cost * 1000:>10.2f} ms")
+
+        condition = (
+            (DbBarData.symbol == "S0")
+            & (DbBarData.exchange == Exchange.CZCE.value)
+            & (DbBarData.interval == Interval.MINUTE.value)
+        )
+        # 新版每次保存前后各统计一次写入范围内的数据量, 改造前则全量统计
+        range_condition = (
+            condition
+            & (DbBarData.datetime >= convert_tz(bars[0].datetime))
+            & (DbBarData.datetime <= convert_tz(bars[-1].datetime))
+        )
+        start = perf_counter()
+        range_count: int = DbBarData.select().where(range_condition).count()
+        range_count = DbBarData.select().where(range_condition).count()
+        cost = perf_counter() - start
+        print(f"{'range COUNT x2 per save':<32}{range_count:>12,} bars{cost * 1000:>10.2f} ms")
+
+        start = perf_counter()
+        count: int = DbBarData.select().where(condition).count()
+        cost = perf_counter() - start
+        print(f"{'full COUNT per save (legacy)':<32}{count:>12,} bars{cost * 1000:>10.2f} ms")
+
+        overview: DbBarOverview = DbBarOverview.get(DbBarOverview.symbol == "S0")
+        assert overview.count == count == bar_count + batch_size // 2
+
+        for name, func in [("init_bar_overview (legacy)", legacy_init_bar_overview),
+                           ("init_bar_overview", database.init_bar_overview)]:
+            DbBarOverview.delete().execute()
+
+            start = perf_counter()
+            func()
+            cost = perf_counter() - start
+            print(f"{name:<32}{DbBarOverview.select().count():>12,} groups{cost:>8.2f} s")
+
+        overview = DbBarOverview.get(DbBarOverview.symbol == "S0")
+        assert overview.count == count and str(overview.end) == str(convert_tz(bars[-1].datetime))
+
+        sqlite_database.db.close()
+
+
+def benchmark_parquet(bar_count: int = 1_000_000, tick_count: int = 300_000) -> None:
+    """
+    对比SQLite和Parquet数据库写入数据, 读取全部和一个月范围内的数据
+    (对象列表和结构化数组), 以及查询汇总信息的耗时, 并校验读取结果一致
+    """
+    bars: List[BarData] = create_bars(bar_count)
+    ticks: List[TickData] = create_ticks(bars, tick_count)
+
+    start: datetime = convert_tz(bars[0].datetime)
+    end: datetime = convert_tz(bars[-1].datetime)
+    month_end: datetime = start + timedelta(days=30)
+    tick_end: datetime = convert_tz(ticks[len(ticks) // 10].datetime)
+
+    with TemporaryDirectory() as folder:
+        sqlite_database.db.init(os.path.join(folder, "parquet.db"))
+        databases: dict = {
+            "sqlite": SqliteDatabase(),
+            "parquet": ParquetDatabase(Path(folder, "parquet"))
+        }
+
+        def save(database: BaseDatabase) -> None:
+            if isinstance(database, SqliteDatabase):
+                with database.bulk_ingest():
+                    database.save_bar_data(bars)
+                    database.save_tick_data(ticks)
+            else:
+                database.save_bar_data(bars)
+                database.save_tick_data(ticks)
+
+        cases: list = [
+            ("save", save),
+            ("load_bar_data all", lambda d: d.load_bar_data("TA888", Exchange.CZCE, Interval.MINUTE, start, end)),
+            ("load_bar_data month", lambda d: d.load_bar_data("TA888", Exchange.CZCE, Interval.MINUTE, start, month_end)),
+            ("load_bar_arrays all", lambda d: d.load_bar_arrays("TA888", Exchange.CZCE, Interval.MINUTE, start, end)),
+            ("load_bar_arrays month", lambda d: d.load_bar_arrays("TA888", Exchange.CZCE, Interval.MINUTE, start, month_end)),
+            ("load_tick_data all", lambda d: d.load_tick_data("TA888", Exchange.CZCE, start, end)),
+            ("load_tick_data 10%", lambda d: d.load_tick_data("TA888", Exchange.CZCE, start, tick_end)),
+            ("load_tick_arrays all", lambda d: d.load_tick_arrays("TA888", Exchange.CZCE, start, end)),
+            ("get_bar_overview", lambda d: d.get_bar_overview()),
+        ]
+
+        print(f"{'':<24}{'sqlite':>10}{'parquet':>10}{'speedup':>10}")
+
+        for name, func in cases:
+            costs: list = []
+            results: list = []
+
+            for database in databases.values():
+                gc.collect()
+                begin: float = perf_counter()
+                results.append(func(database))
+                costs.append(perf_counter() - begin)
+
+            print(f"{name:<24}{costs[0]:>8.3f} s{costs[1]:>8.3f} s{costs[0] / costs[1]:>9.1f}x")
+
+            sqlite_result, parquet_result = results
+            if name.startswith("load"):
+                assert len(sqlite_result) == len(parquet_result)
+            if "arrays" in name:
+                assert np.array_equal(sqlite_result, parquet_result)
+            elif "bar_data" in name:
+                assert sqlite_result[-1].close_price == parquet_result[-1].close_price
+                assert sqlite_result[-1].datetime == parquet_result[-1].datetime
+            elif name == "get_bar_overview":
+                assert sqlite_result[0].count == parquet_result[0].count == bar_count
+                assert str(sqlite_result[0].end) == str(parquet_result[0].end)
+
+            del results, sqlite_result, parquet_result
+
+        sqlite_database.db.close()
+
+
+if __name__ == "__main__":
+    parser: ArgumentParser = ArgumentParser()
+    parser.add_argument("case", choices=["ingest", "arrays", "iter", "overview", "parquet"])
+    args = parser.parse_args()
+
+    if args.case == "ingest":
+        benchmark_ingest()
+    elif args.case == "arrays":
+        benchmark_arrays()
+    elif args.case == "iter":
+        benchmark_iter()
+    elif args.case == "overview":
+        benchmark_overview()
+    elif args.case == "parquet":
+        benchmark_parquet()
@@ -0,0 +1,708 @@
+"""
+事件引擎性能测试, 在ch3目录下运行:
+
+    python benchmark_event_engine.py batch
+    python benchmark_event_engine.py shard
+    python benchmark_event_engine.py async
+    python benchmark_event_engine.py queue
+    python benchmark_event_engine.py pool
+    python benchmark_event_engine.py journal
+    python benchmark_event_engine.py bounded
+    python benchmark_event_engine.py handler
+    python benchmark_event_engine.py shm
+"""
+import gc
+import multiprocessing
+import os
+import sys
+import tracemalloc
+from argparse import ArgumentParser
+from dataclasses import dataclass
+from datetime import datetime
+from threading import Event as Signal, Lock, Thread
+from time import perf_counter, sleep, time
+from typing import Any, Dict, List
+
+from event_engine import (
+    EVENT_QUEUE_WARNING,
+    AsyncEventEngine,
+    Event,
+    EventEngine,
+    EventPool,
+    HandlerMode,
+    MultiProducerRingBuffer,
+    OverflowPolicy,
+    RingBuffer,
+    ShardedEventEngine
+)
+from event_journal import EventJournal, JournalReplayer
+from shm_event_bus import CHINA_TZ, ShmEventPublisher, ShmEventSubscriber
+
+from vnpy.trader.constant import Direction, Exchange, Offset, OrderType
+from vnpy.trader.event import EVENT_TICK
+from vnpy.trader.object import OrderRequest, TickData
+
+
+EVENT_BENCHMARK = "eBenchmark"
+EVENT_BLOCKING = "eBlocking"
+
+
+def percentile(data: List[float], q: float) -> float:
+    """计算已排序数据的分位数"""
+    index: int = min(int(len(data) * q), len(data) - 1)
+    return data[index]
+
+
+def run_dispatch(event_engine: EventEngine, count: int, is_async: bool = False) -> dict:
+    """
+    从生产者线程以最快速度推送count个事件, 统计吞吐量以及
+    从put到handler执行的延时
+    """
+    latencies: List[float] = []
+    finished: Signal = Signal()
+
+    def handler(event: Event) -> None:
+        latencies.append(perf_counter() - event.data)
+        if len(latencies) == count:
+            finished.set()
+
+    async def async_handler(event: Event) -> None:
+        handler(event)
+
+    if is_async:
+        event_engine.register(EVENT_BENCHMARK, async_handler)
+    else:
+        event_engine.register(EVENT_BENCHMARK, handler)
+    event_engine.start()
+
+    start: float = perf_counter()
+    for _ in range(count):
+        event_engine.put(Event(EVENT_BENCHMARK, perf_counter()))
+    finished.wait()
+    cost: float = perf_counter() - start
+
+    event_engine.stop()
+
+    latencies.sort()
+    return {
+        "rate": count / cost,
+        "p50": percentile(latencies, 0.5) * 1000,
+        "p99": percentile(latencies, 0.99) * 1000,
+    }
+
+
+def print_result(name: str, result: dict) -> None:
+    """输出测试结果"""
+    print(
+        f"{name:<24}{result['rate']:>14,.0f} events/s"
+        f"{result['p50']:>12.3f} ms p50{result['p99']:>12.3f} ms p99"
+    )
+
+
+def benchmark_batch(count: int) -> None:
+    """对比逐个获取与批量获取两种分发循环"""
+    for batch_size in [1, 16, 256, 4096]:
+        event_engine: EventEngine = EventEngine(batch_size=batch_size)
+        result: dict = run_dispatch(event_engine, count)
+        print_result(f"batch_size={batch_size}", result)
+
+        if batch_size > 1:
+            sizes: dict = event_engine.get_batch_sizes()
+            wakeups: int = sum(sizes.values())
+            print(f"{'':<24}{wakeups:>14,} wakeups, max batch {max(sizes)}")
+
+
+@dataclass
+class SymbolData:
+    """带有vt_symbol的测试数据, 用于分片路由"""
+
+    vt_symbol: str
+    sequence: int
+
+
+def benchmark_shard(count: int, symbol_count: int = 100, work: float = 0.0002) -> None:
+    """
+    对比不同分片数量下的吞吐量, handler中以sleep模拟阻塞耗时
+    (网络请求、数据库写入等会释放GIL的操作), 并检查同一合约内的事件顺序
+    """
+    symbols: List[str] = [f"rb{i}.SHFE" for i in range(symbol_count)]
+
+    for shard_count in [0, 1, 2, 4, 8, 16]:
+        if shard_count:
+            event_engine: EventEngine = ShardedEventEngine(shard_count=shard_count)
+        else:
+            event_engine = EventEngine()
+
+        last_sequence: Dict[str, int] = {}
+        disorder: List[str] = []
+        processed: List[int] = [0]
+        lock: Lock = Lock()
+        finished: Signal = Signal()
+
+        def handler(event: Event) -> None:
+            data: SymbolData = event.data
+            if data.sequence < last_sequence.get(data.vt_symbol, -1):
+                disorder.append(data.vt_symbol)
+            last_sequence[data.vt_symbol] = data.sequence
+
+            sleep(work)
+
+            with lock:
+                processed[0] += 1
+                if processed[0] == count:
+                    finished.set()
+
+        event_engine.register(EVENT_BENCHMARK, handler)
+        event_engine.start()
+
+        start: float = perf_counter()
+        for i in range(count):
+            data: SymbolData = SymbolData(symbols[i % symbol_count], i)
+            event_engine.put(Event(EVENT_BENCHMARK, data))
+        finished.wait()
+        cost: float = perf_counter() - start
+
+        event_engine.stop()
+
+        name: str = f"shard_count={shard_count}" if shard_count else "EventEngine"
+        print(f"{name:<24}{count / cost:>14,.0f} events/s{len(disorder):>12} disorder")
+
+
+def benchmark_async(count: int) -> None:
+    """对比线程版与asyncio版事件引擎的分发延时"""
+    print_result("EventEngine", run_dispatch(EventEngine(), count))
+    print_result("EventEngine batch", run_dispatch(EventEngine(batch_size=256), count))
+    print_result("AsyncEventEngine", run_dispatch(AsyncEventEngine(), count))
+    print_result("AsyncEventEngine async", run_dispatch(AsyncEventEngine(), count, True))
+
+    # 低负载下逐个推送事件, 对比单个事件的唤醒延时
+    for name, event_engine in [
+        ("EventEngine idle", EventEngine()),
+        ("AsyncEventEngine idle", AsyncEventEngine())
+    ]:
+        latencies: List[float] = []
+        received: Signal = Signal()
+
+        def handler(event: Event) -> None:
+            latencies.append(perf_counter() - event.data)
+            received.set()
+
+        event_engine.register(EVENT_BENCHMARK, handler)
+        event_engine.start()
+
+        for _ in range(1000):
+            received.clear()
+            event_engine.put(Event(EVENT_BENCHMARK, perf_counter()))
+            received.wait()
+
+        event_engine.stop()
+
+        latencies.sort()
+        print(
+            f"{name:<24}{'':>23}"
+            f"{percentile(latencies, 0.5) * 1000:>12.3f} ms p50"
+            f"{percentile(latencies, 0.99) * 1000:>12.3f} ms p99"
+        )
+
+
+def benchmark_queue(duration: float = 1) -> None:
+    """
+    按固定速率(1k/10k/100k每秒)推送事件, 对比不同队列后端下
+    生产者(接口线程)每次put的耗时, 以及从put到handler执行的延时
+    """
+    backends: dict = {
+        "Queue": None,
+        "RingBuffer": lambda: RingBuffer(65536),
+        "MultiProducerRingBuffer": lambda: MultiProducerRingBuffer(65536),
+    }
+
+    for rate in [1_000, 10_000, 100_000]:
+        count: int = int(rate * duration)
+        print(f"{rate:,} events/s")
+
+        for name, queue_factory in backends.items():
+            event_engine: EventEngine = EventEngine(batch_size=256, queue_factory=queue_factory)
+
+            latencies: List[float] = []
+            finished: Signal = Signal()
+
+            def handler(event: Event) -> None:
+                latencies.append(perf_counter() - event.data)
+                if len(latencies) == count:
+                    finished.set()
+
+            event_engine.register(EVENT_BENCHMARK, handler)
+            event_engine.start()
+
+            put_cost: float = 0
+            start: float = perf_counter()
+
+            for i in range(count):
+                # 等到下一个发送时刻, 模拟均匀到达的行情(sleep(0)让出GIL)
+                target: float = start + i / rate
+                while perf_counter() < target:
+                    sleep(0)
+
+                t: float = perf_counter()
+                event_engine.put(Event(EVENT_BENCHMARK, t))
+                put_cost += perf_counter() - t
+
+            finished.wait()
+            cost: float = perf_counter() - start
+            event_engine.stop()
+
+            latencies.sort()
+            print(
+                f"  {name:<24}{count / cost:>10,.0f} events/s"
+                f"{put_cost / count * 1e6:>10.2f} us/put"
+                f"{percentile(latencies, 0.5) * 1e6:>10.1f} us p50"
+                f"{percentile(latencies, 0.99) * 1e6:>10.1f} us p99"
+            )
+
+
+class DictEvent:
+    """带__dict__的事件对象, 即改为__slots__之前的Event"""
+
+    pool = None
+
+    def __init__(self, type: str, data: Any = None) -> None:
+        """"""
+        self.type: str = type
+        self.data: Any = data
+
+
+def benchmark_pool(rate: int = 50_000, duration: float = 5) -> None:
+    """
+    以50k/s的速率持续推送行情事件, 对比普通对象、__slots__对象和事件池
+    三种方式下的单个事件内存占用、GC触发次数和GC停顿时间
+    """
+    count: int = int(rate * duration)
+    symbols: List[str] = [f"rb{i}.SHFE" for i in range(100)]
+
+    event_pool: EventPool = EventPool(4096)
+    creators: dict = {
+        "DictEvent": DictEvent,
+        "Event(__slots__)": Event,
+        "EventPool": event_pool.acquire,
+    }
+
+    for name, create in creators.items():
+        sample: Any = create(EVENT_BENCHMARK, None)
+        size: int = sys.getsizeof(sample)
+        if hasattr(sample, "__dict__"):
+            size += sys.getsizeof(sample.__dict__)
+
+        # 通过gc回调统计各代回收次数以及每次回收的停顿时间
+        pauses: List[float] = []
+        collections: Dict[int, int] = {0: 0, 1: 0, 2: 0}
+        gc_start: List[float] = [0]
+
+        def gc_callback(phase: str, info: dict) -> None:
+            if phase == "start":
+                gc_start[0] = perf_counter()
+            else:
+                pauses.append(perf_counter() - gc_start[0])
+                collections[info["generation"]] += 1
+
+        ticks: Dict[str, SymbolData] = {}
+        processed: List[int] = [0]
+        finished: Signal = Signal()
+
+        def handler(event: Event) -> None:
+            data: SymbolData = event.data
+            ticks[data.vt_symbol] = data
+
+            processed[0] += 1
+            if processed[0] == count:
+                finished.set()
+
+        event_engine: EventEngine = EventEngine(batch_size=256)
+        event_engine.register(EVENT_BENCHMARK, handler)
+        event_engine.start()
+
+        gc.collect()
+        gc.callbacks.append(gc_callback)
+        start: float = perf_counter()
+
+        for i in range(count):
+            target: float = start + i / rate
+            while perf_counter() < target:
+                sleep(0)
+
+            data: SymbolData = SymbolData(symbols[i % 100], i)
+            event_engine.put(create(EVENT_BENCHMARK, data))
+
+        finished.wait()
+        cost: float = perf_counter() - start
+        gc.callbacks.remove(gc_callback)
+        event_engine.stop()
+
+        print(
+            f"{name:<20}{size:>6} bytes/event{count / cost:>10,.0f} events/s"
+            f"{collections[0] / cost:>8.1f} gen0/s{collections[1] + collections[2]:>6} gen1+2"
+            f"{sum(pauses) * 1000:>10.2f} ms gc total{max(pauses, default=0) * 1000:>8.3f} ms gc max"
+        )
+
+
+def benchmark_journal(count: int, path: str = "benchmark.journal") -> None:
+    """
+    对比开启事件日志前后的分发速度, 并测试日志全速回放的速度
+    """
+    symbols: List[str] = [f"rb{i}.SHFE" for i in range(100)]
+
+    for recording in [False, True]:
+        processed: List[int] = [0]
+        finished: Signal = Signal()
+
+        def handler(event: Event) -> None:
+            processed[0] += 1
+            if processed[0] == count:
+                finished.set()
+
+        event_engine: EventEngine = EventEngine(batch_size=256)
+        event_engine.register(EVENT_BENCHMARK, handler)
+
+        if recording:
+            journal: EventJournal = EventJournal(event_engine, path)
+            journal.start()
+
+        event_engine.start()
+
+        start: float = perf_counter()
+        for i in range(count):
+            data: SymbolData = SymbolData(symbols[i % 100], i)
+            event_engine.put(Event(EVENT_BENCHMARK, data))
+        finished.wait()
+        cost: float = perf_counter() - start
+
+        event_engine.stop()
+
+        name: str = "with journal" if recording else "without journal"
+        print(f"{name:<24}{count / cost:>14,.0f} events/s")
+
+    journal.close()
+    size: int = os.path.getsize(path)
+    print(f"{'journal file':<24}{journal.count:>14,} events{size / journal.count:>10.1f} bytes/event")
+
+    # 回放时不启动事件引擎, 由回放器直接同步分发
+    replayed: List[int] = []
+    event_engine = EventEngine()
+    event_engine.register(EVENT_BENCHMARK, lambda event: replayed.append(event.data.sequence))
+
+    start = perf_counter()
+    JournalReplayer(path).replay(event_engine)
+    cost = perf_counter() - start
+
+    in_order: bool = replayed == list(range(count))
+    print(f"{'replay':<24}{len(replayed) / cost * 60:>14,.0f} events/min{'':>6}in order: {in_order}")
+
+    os.remove(path)
+
+
+def benchmark_bounded(count: int, max_size: int = 10_000, stall: float = 1) -> None:
+    """
+    行情处理函数卡住期间持续推送行情, 对比无界队列和各溢出策略下的
+    队列内存峰值、推送速度、丢弃统计和高水位告警(阻塞策略下最多等待
+    stall秒)
+    """
+    symbols: List[str] = [f"rb{i}.SHFE" for i in range(100)]
+
+    cases: Dict[str, dict] = {"unbounded": {}}
+    for policy in OverflowPolicy:
+        cases[policy.value] = {
+            "max_size": max_size,
+            "overflow_policies": {EVENT_BENCHMARK: policy}
+        }
+
+    for name, kwargs in cases.items():
+        resumed: Signal = Signal()
+        warnings: List[dict] = []
+
+        def handler(event: Event) -> None:
+            resumed.wait()
+
+        event_engine: EventEngine = EventEngine(**kwargs)
+        event_engine.register(EVENT_BENCHMARK, handler)
+        event_engine.register(EVENT_QUEUE_WARNING, lambda event: warnings.append(event.data))
+        event_engine.start()
+
+        # 阻塞策略下生产者会被卡住, 因此在单独线程中推送
+        def produce() -> None:
+            for i in range(count):
+                data: SymbolData = SymbolData(symbols[i % 100], i)
+                event_engine.put(Event(EVENT_BENCHMARK, data))
+
+        tracemalloc.start()
+        start: float = perf_counter()
+
+        producer: Thread = Thread(target=produce)
+        producer.start()
+        if name == OverflowPolicy.BLOCK.value:
+            producer.join(stall)
+        else:
+            producer.join()
+
+        finished: bool = not producer.is_alive()
+        cost: float = perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        resumed.set()
+        producer.join()
+        while event_engine._queue.qsize():
+            sleep(0.01)
+        event_engine.stop()
+
+        shed: int = sum(sum(counts.values()) for counts in event_engine.get_shed_counts().values())
+        rate: str = f"{count / cost:,.0f} puts/s" if finished else "producer blocked"
+
+        print(
+            f"{name:<14}{peak / 1024 / 1024:>8.1f} MB peak{rate:>20}"
+            f"{shed:>10,} shed{event_engine.get_blocked_count():>4} blocked"
+            f"{len(warnings):>4} warnings"
+        )
+
+
+def benchmark_handler(rate: int = 10_000, duration: float = 2, block: float = 0.005) -> None:
+    """
+    每100个行情事件中夹带一个耗时block秒的阻塞事件(模拟发送邮件),
+    对比阻塞handler在分发线程内执行、放入线程池以及由看门狗自动降级
+    三种方式下行情事件的分发延时
+    """
+    count: int = int(rate * duration)
+    cases: List[str] = ["inline", "thread pool", "watchdog demote"]
+
+    for name in cases:
+        latencies: List[float] = []
+        finished: Signal = Signal()
+
+        def handler(event: Event) -> None:
+            latencies.append(perf_counter() - event.data)
+            if len(latencies) == count:
+                finished.set()
+
+        def blocking_handler(event: Event) -> None:
+            sleep(block)
+
+        event_engine: EventEngine = EventEngine(batch_size=256)
+        event_engine.register(EVENT_BENCHMARK, handler)
+
+        if name == "thread pool":
+            event_engine.register(EVENT_BLOCKING, blocking_handler, HandlerMode.THREAD)
+        else:
+            event_engine.register(EVENT_BLOCKING, blocking_handler)
+
+        if name == "watchdog demote":
+            event_engine.enable_watchdog(block / 2, HandlerMode.THREAD)
+
+        event_engine.start()
+
+        start: float = perf_counter()
+        for i in range(count):
+            target: float = start + i / rate
+            while perf_counter() < target:
+                sleep(0)
+
+            event_engine.put(Event(EVENT_BENCHMARK, perf_counter()))
+            if not i % 100:
+                event_engine.put(Event(EVENT_BLOCKING))
+
+        finished.wait()
+        event_engine.stop()
+
+        latencies.sort()
+        print(
+            f"{name:<24}{percentile(latencies, 0.5) * 1000:>12.3f} ms p50"
+            f"{percentile(latencies, 0.99) * 1000:>12.3f} ms p99"
+            f"{latencies[-1] * 1000:>12.3f} ms max"
+        )
+
+
+class BenchmarkMainEngine:
+    """
+    代替主引擎处理委托请求, 直接返回委托号
+    """
+
+    def __init__(self) -> None:
+        """"""
+        self.count: int = 0
+
+    def send_order(self, req: OrderRequest, gateway_name: str) -> str:
+        """"""
+        self.count += 1
+        return f"{gateway_name}.{self.count}"
+
+    def cancel_order(self, req: Any, gateway_name: str) -> None:
+        """"""
+        pass
+
+
+def run_shm_subscriber(name: str, count: int, order_count: int, results: multiprocessing.Queue) -> None:
+    """
+    子进程: 订阅共享内存总线, 统计行情从网关进程推送到本进程handler的
+    延时, 然后测试委托请求往返延时
+    """
+    latencies: List[float] = []
+    finished: Signal = Signal()
+
+    def handler(event: Event) -> None:
+        tick: TickData = event.data
+        latencies.append(time() - tick.datetime.timestamp())
+        if len(latencies) == count:
+            finished.set()
+
+    event_engine: EventEngine = EventEngine()
+    event_engine.register(EVENT_TICK, handler)
+    event_engine.start()
+
+    subscriber: ShmEventSubscriber = ShmEventSubscriber(event_engine, name, 0)
+    subscriber.start()
+    results.put("ready")
+
+    finished.wait()
+
+    req: OrderRequest = OrderRequest(
+        symbol="rb2401",
+        exchange=Exchange.SHFE,
+        direction=Direction.LONG,
+        type=OrderType.LIMIT,
+        volume=1,
+        price=3500,
+        offset=Offset.OPEN
+    )
+    round_trips: List[float] = []
+    for _ in range(order_count):
+        start: float = perf_counter()
+        subscriber.send_order(req, "CTP")
+        round_trips.append(perf_counter() - start)
+
+    subscriber.close()
+    event_engine.stop()
+
+    results.put((latencies, round_trips, subscriber.get_lost_count()))
+
+
+def run_queue_subscriber(count: int, queue: multiprocessing.Queue, results: multiprocessing.Queue) -> None:
+    """
+    子进程: 从multiprocessing.Queue接收行情(pickle序列化)并放入本进程
+    事件引擎, 作为对比
+    """
+    latencies: List[float] = []
+    finished: Signal = Signal()
+
+    def handler(event: Event) -> None:
+        tick: TickData = event.data
+        latencies.append(time() - tick.datetime.timestamp())
+        if len(latencies) == count:
+            finished.set()
+
+    event_engine: EventEngine = EventEngine()
+    event_engine.register(EVENT_TICK, handler)
+    event_engine.start()
+    results.put("ready")
+
+    for _ in range(count):
+        event_engine.put(Event(EVENT_TICK, queue.get()))
+
+    finished.wait()
+    event_engine.stop()
+
+    results.put((latencies, [], 0))
+
+
+def benchmark_shm(count: int, rate: int = 5_000, order_count: int = 1000) -> None:
+    """
+    以rate速率推送行情, 对比共享内存总线和multiprocessing.Queue跨进程
+    传递行情的延时(从网关进程事件引擎到策略进程事件引擎的handler),
+    以及共享内存总线上委托请求的往返延时
+    """
+    count = min(count, rate * 5)
+    name: str = f"vnpy_bench_{os.getpid()}"
+
+    for case in ["shm", "mp.Queue"]:
+        results: multiprocessing.Queue = multiprocessing.Queue()
+        event_engine: EventEngine = EventEngine()
+
+        if case == "shm":
+            publisher: ShmEventPublisher = ShmEventPublisher(event_engine, name, BenchmarkMainEngine())
+            publisher.start()
+
+            process: multiprocessing.Process = multiprocessing.Process(
+                target=run_shm_subscriber,
+                args=(name, count, order_count, results)
+            )
+        else:
+            queue: multiprocessing.Queue = multiprocessing.Queue()
+            event_engine.register(EVENT_TICK, lambda event: queue.put(event.data))
+
+            process = multiprocessing.Process(
+                target=run_queue_subscriber,
+                args=(count, queue, results)
+            )
+
+        process.start()
+        results.get()
+        event_engine.start()
+
+        start: float = perf_counter()
+        for i in range(count):
+            target: float = start + i / rate
+            while perf_counter() < target:
+                sleep(0)
+
+            tick: TickData = TickData(
+                symbol="rb2401",
+                exchange=Exchange.SHFE,
+                datetime=datetime.now(CHINA_TZ),
+                last_price=3500 + i % 10,
+                gateway_name="CTP"
+            )
+            event_engine.put(Event(EVENT_TICK, tick))
+
+        latencies, round_trips, lost = results.get()
+        process.join()
+        event_engine.stop()
+
+        if case == "shm":
+            publisher.close()
+
+        latencies.sort()
+        print(
+            f"{case:<16}{percentile(latencies, 0.5) * 1_000_000:>10.0f} us p50"
+            f"{percentile(latencies, 0.99) * 1_000_000:>10.0f} us p99"
+            f"{len(latencies):>10,} ticks{lost:>6} lost"
+        )
+
+        if round_trips:
+            round_trips.sort()
+            print(
+                f"{'send_order':<16}{percentile(round_trips, 0.5) * 1_000_000:>10.0f} us p50"
+                f"{percentile(round_trips, 0.99) * 1_000_000:>10.0f} us p99"
+                f"{len(round_trips):>10,} round trips"
+            )
+
+
+if __name__ == "__main__":
+    parser: ArgumentParser = ArgumentParser()
+    parser.add_argument("case", choices=["batch", "shard", "async", "queue", "pool", "journal", "bounded", "handler", "shm"])
+    parser.add_argument("--count", type=int, default=200_000)
+    args = parser.parse_args()
+
+    if args.case == "batch":
+        benchmark_batch(args.count)
+    elif args.case == "shard":
+        benchmark_shard(args.count)
+    elif args.case == "async":
+        benchmark_async(args.count)
+    elif args.case == "queue":
+        benchmark_queue()
+    elif args.case == "pool":
+        benchmark_pool()
+    elif args.case == "journal":
+        benchmark_journal(args.count)
+    elif args.case == "bounded":
+        benchmark_bounded(args.count)
+    elif args.case == "handler":
+        benchmark_handler()
+    elif args.case == "shm":
+        benchmark_shm(args.count)
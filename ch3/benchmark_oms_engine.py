@@ -0,0 +1,453 @@
+"""
+委托管理引擎(OmsEngine)性能测试, 需要先将trader_engine.py安装为
+vnpy.trader.engine, 然后运行:
+
+    python benchmark_oms_engine.py index
+    python benchmark_oms_engine.py archive
+    python benchmark_oms_engine.py snapshot
+    python benchmark_oms_engine.py exposure
+"""
+import os
+import random
+import tracemalloc
+from argparse import ArgumentParser
+from copy import copy
+from datetime import datetime
+from time import perf_counter, sleep
+from typing import Callable, List
+
+from vnpy.event import Event, EventEngine
+from vnpy.trader.constant import Direction, Exchange, Offset, OrderType, Product, Status
+from vnpy.trader.engine import MainEngine, OmsEngine
+from vnpy.trader.event import EVENT_ACCOUNT, EVENT_CONTRACT, EVENT_ORDER, EVENT_POSITION, EVENT_TICK, EVENT_TRADE
+from vnpy.trader.object import AccountData, ContractData, OrderData, PositionData, TickData, TradeData
+
+
+def create_oms_engine() -> OmsEngine:
+    """创建委托管理引擎(事件由测试直接调用处理函数推送)"""
+    main_engine: MainEngine = MainEngine(EventEngine())
+    return main_engine.get_engine("oms")
+
+
+def create_order(i: int, symbol_count: int, status: Status = Status.NOTTRADED) -> OrderData:
+    """创建第i个委托"""
+    return OrderData(
+        symbol=f"rb{2400 + i % symbol_count}",
+        exchange=Exchange.SHFE,
+        orderid=str(i),
+        type=OrderType.LIMIT,
+        direction=Direction.LONG if i // symbol_count % 2 else Direction.SHORT,
+        offset=Offset.OPEN,
+        price=3500,
+        volume=1,
+        status=status,
+        datetime=datetime.now(),
+        gateway_name=f"CTP{i % 2}"
+    )
+
+
+def timeit(func: Callable, count: int) -> float:
+    """返回单次调用耗时(微秒)"""
+    start: float = perf_counter()
+    for _ in range(count):
+        func()
+    return (perf_counter() - start) / count * 1_000_000
+
+
+def benchmark_index(order_count: int = 20_000, symbol_count: int = 100) -> None:
+    """
+    在order_count个活动委托下, 对比线性扫描和二级索引查询单个合约
+    活动委托的耗时, 以及委托推送处理的耗时
+    """
+    oms_engine: OmsEngine = create_oms_engine()
+
+    orders: List[OrderData] = [create_order(i, symbol_count) for i in range(order_count)]
+    events: List[Event] = [Event(EVENT_ORDER, order) for order in orders]
+
+    start: float = perf_counter()
+    for event in events:
+        oms_engine.process_order_event(event)
+    cost: float = (perf_counter() - start) / order_count * 1_000_000
+    print(f"{'process_order_event':<32}{cost:>10.2f} us/order")
+
+    vt_symbol: str = orders[0].vt_symbol
+
+    def scan() -> list:
+        return [
+            order
+            for order in oms_engine.active_orders.values()
+            if order.vt_symbol == vt_symbol
+        ]
+
+    def query() -> list:
+        return oms_engine.get_all_active_orders(vt_symbol)
+
+    def query_direction() -> list:
+        return oms_engine.get_all_active_orders(vt_symbol, direction=Direction.LONG)
+
+    assert scan() == query()
+
+    print(f"{'linear scan by vt_symbol':<32}{timeit(scan, 200):>10.2f} us/call{len(scan()):>8} orders")
+    print(f"{'index by vt_symbol':<32}{timeit(query, 20_000):>10.2f} us/call{len(query()):>8} orders")
+    print(f"{'index by vt_symbol, direction':<32}{timeit(query_direction, 20_000):>10.2f} us/call"
+          f"{len(query_direction()):>8} orders")
+
+    # 全部撤单后索引应清空
+    for order in orders:
+        order.status = Status.CANCELLED
+    for event in events:
+        oms_engine.process_order_event(event)
+
+    print(f"{'index size after all cancelled':<32}{len(oms_engine.symbol_active_orders):>10}")
+
+    oms_engine.main_engine.close()
+
+
+def run_order_flow(oms_engine: OmsEngine, order_count: int, archive_interval: int = 1000) -> None:
+    """
+    模拟一天的委托流: 每个委托依次推送提交中、未成交, 然后每4个委托中
+    1个全部成交(推送成交), 其余撤单. 每archive_interval个委托触发一次
+    归档(相当于定时器事件)
+    """
+    for i in range(order_count):
+        order: OrderData = create_order(i, 100, Status.SUBMITTING)
+        oms_engine.process_order_event(Event(EVENT_ORDER, order))
+
+        order = copy(order)
+        order.status = Status.NOTTRADED
+        oms_engine.process_order_event(Event(EVENT_ORDER, order))
+
+        order = copy(order)
+        if i % 4:
+            order.status = Status.CANCELLED
+        else:
+            order.status = Status.ALLTRADED
+            order.traded = order.volume
+
+            trade: TradeData = TradeData(
+                symbol=order.symbol,
+                exchange=order.exchange,
+                orderid=order.orderid,
+                tradeid=str(i),
+                direction=order.direction,
+                offset=order.offset,
+                price=order.price,
+                volume=order.volume,
+                datetime=order.datetime,
+                gateway_name=order.gateway_name
+            )
+            oms_engine.process_trade_event(Event(EVENT_TRADE, trade))
+        oms_engine.process_order_event(Event(EVENT_ORDER, order))
+
+        if oms_engine.archive and not i % archive_interval:
+            oms_engine.archive_finished()
+
+
+def benchmark_archive(order_count: int = 100_000, max_count: int = 5_000, path: str = "benchmark_oms.db") -> None:
+    """
+    对比开启归档前后, 完成一天委托流后委托管理引擎占用的内存, 以及
+    内存中和归档中查询委托的耗时
+    """
+    for archiving in [False, True]:
+        tracemalloc.start()
+        oms_engine: OmsEngine = create_oms_engine()
+
+        if archiving:
+            oms_engine.enable_archive(max_count, path=path)
+
+        start: float = perf_counter()
+        run_order_flow(oms_engine, order_count)
+        cost: float = perf_counter() - start
+
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        name: str = "archive" if archiving else "no archive"
+        print(
+            f"{name:<16}{current / 1024 / 1024:>8.1f} MB{len(oms_engine.orders):>10,} orders in memory"
+            f"{order_count / cost:>12,.0f} orders/s"
+        )
+
+        first: str = create_order(0, 100).vt_orderid
+        last: str = create_order(order_count - 1, 100).vt_orderid
+        assert oms_engine.get_order(first) and oms_engine.get_order(last)
+        assert oms_engine.get_order_trades(first)
+
+        print(
+            f"{'':<16}get_order {timeit(lambda: oms_engine.get_order(first), 1000):.2f} us (oldest), "
+            f"{timeit(lambda: oms_engine.get_order(last), 1000):.2f} us (latest)"
+        )
+
+        oms_engine.main_engine.close()
+
+    os.remove(path)
+
+
+def benchmark_snapshot(
+    contract_count: int = 20_000,
+    position_count: int = 1_000,
+    order_count: int = 2_000,
+    path: str = "benchmark_oms_snapshot.pkl"
+) -> None:
+    """
+    测试快照在事件引擎线程上的数据拷贝耗时, 后台线程写入耗时, 以及
+    重启时加载快照恢复数据的耗时, 最后模拟接口推送后核对快照数据
+    """
+    oms_engine: OmsEngine = create_oms_engine()
+
+    for i in range(contract_count):
+        contract: ContractData = ContractData(
+            symbol=f"c{i}",
+            exchange=Exchange.SHFE,
+            name=f"c{i}",
+            product=Product.FUTURES,
+            size=10,
+            pricetick=1,
+            gateway_name="CTP0"
+        )
+        oms_engine.process_contract_event(Event(EVENT_CONTRACT, contract))
+
+    for i in range(position_count):
+        position: PositionData = PositionData(
+            symbol=f"c{i // 2}",
+            exchange=Exchange.SHFE,
+            direction=Direction.LONG if i % 2 else Direction.SHORT,
+            volume=i,
+            gateway_name="CTP0"
+        )
+        oms_engine.process_position_event(Event(EVENT_POSITION, position))
+
+    account: AccountData = AccountData(accountid="000001", balance=1_000_000, gateway_name="CTP0")
+    oms_engine.process_account_event(Event(EVENT_ACCOUNT, account))
+
+    for i in range(order_count):
+        oms_engine.process_order_event(Event(EVENT_ORDER, create_order(i, 100)))
+
+    oms_engine.enable_snapshot(path=path)
+
+    start: float = perf_counter()
+    oms_engine.take_snapshot()
+    copy_cost: float = perf_counter() - start
+
+    # 关闭时等待快照线程写完文件
+    oms_engine.close()
+    write_cost: float = perf_counter() - start
+    oms_engine.main_engine.close()
+
+    print(f"{'copy on dispatch thread':<32}{copy_cost * 1000:>10.2f} ms")
+    print(f"{'copy and write to file':<32}{write_cost * 1000:>10.2f} ms{os.path.getsize(path) / 1024 / 1024:>8.1f} MB")
+
+    # 重启后加载快照
+    oms_engine = create_oms_engine()
+
+    start = perf_counter()
+    assert oms_engine.load_snapshot(path)
+    load_cost: float = perf_counter() - start
+
+    print(f"{'load snapshot':<32}{load_cost * 1000:>10.2f} ms")
+    print(
+        f"{'restored':<32}{len(oms_engine.contracts):>10,} contracts{len(oms_engine.positions):>8,} positions"
+        f"{len(oms_engine.get_all_active_orders()):>8,} active orders"
+    )
+    assert len(oms_engine.get_all_active_orders(create_order(0, 100).vt_symbol)) == order_count // 100
+
+    # 等待恢复数据的事件处理完成
+    while not oms_engine.event_engine._queue.empty():
+        sleep(0.01)
+
+    # 接口只推送了一半的委托, 另一半已在停机期间结束, 核对后被移除
+    for i in range(0, order_count, 2):
+        oms_engine.process_order_event(Event(EVENT_ORDER, create_order(i, 100)))
+    oms_engine.process_account_event(Event(EVENT_ACCOUNT, copy(account)))
+
+    oms_engine.reconcile_snapshot()
+    print(
+        f"{'reconciled':<32}{len(oms_engine.contracts):>10,} contracts{len(oms_engine.positions):>8,} positions"
+        f"{len(oms_engine.get_all_active_orders()):>8,} active orders"
+    )
+
+    oms_engine.main_engine.close()
+    os.remove(path)
+
+
+def scan_exposure(oms_engine: OmsEngine) -> tuple:
+    """风控面板原有的计算方式: 遍历所有持仓, 查询行情和合约计算总盈亏、敞口和保证金"""
+    pnl: float = 0
+    exposure: float = 0
+    margin: float = 0
+
+    for position in oms_engine.get_all_positions():
+        contract: ContractData = oms_engine.get_contract(position.vt_symbol)
+        tick: TickData = oms_engine.get_tick(position.vt_symbol)
+
+        volume: float = -position.volume if position.direction == Direction.SHORT else position.volume
+        value: float = tick.last_price * volume * contract.size
+
+        pnl += value - position.price * volume * contract.size
+        exposure += value
+        margin += abs(value) * 0.1
+
+    return pnl, exposure, margin
+
+
+def benchmark_exposure(symbol_count: int = 1_000, gateway_count: int = 2, tick_count: int = 100_000) -> None:
+    """
+    在symbol_count个合约、每个合约多空持仓各gateway_count个的情况下,
+    测试行情推送时增量更新盈亏的耗时, 并对比全量遍历和O(1)查询
+    总盈亏的耗时, 最后校验增量结果和全量计算结果一致
+    """
+    oms_engine: OmsEngine = create_oms_engine()
+    oms_engine.enable_exposure(margin_rate=0.1)
+
+    vt_symbols: List[str] = []
+    for i in range(symbol_count):
+        contract: ContractData = ContractData(
+            symbol=f"c{i}",
+            exchange=Exchange.SHFE,
+            name=f"c{i}",
+            product=Product.FUTURES if i % 4 else Product.OPTION,
+            size=10,
+            pricetick=1,
+            gateway_name="CTP0"
+        )
+        oms_engine.process_contract_event(Event(EVENT_CONTRACT, contract))
+        vt_symbols.append(contract.vt_symbol)
+
+        for j in range(gateway_count):
+            for direction in [Direction.LONG, Direction.SHORT]:
+                position: PositionData = PositionData(
+                    symbol=contract.symbol,
+                    exchange=contract.exchange,
+                    direction=direction,
+                    volume=1 + i % 5,
+                    price=3500,
+                    gateway_name=f"CTP{j}"
+                )
+                oms_engine.process_position_event(Event(EVENT_POSITION, position))
+
+    random.seed(0)
+    ticks: List[TickData] = [
+        TickData(
+            symbol=f"c{i % symbol_count}",
+            exchange=Exchange.SHFE,
+            datetime=datetime.now(),
+            last_price=3500 + random.randint(-100, 100),
+            gateway_name="CTP0"
+        )
+        for i in range(tick_count)
+    ]
+
+    start: float = perf_counter()
+    for tick in ticks:
+        oms_engine.process_tick_event(Event(EVENT_TICK, tick))
+    cost: float = (perf_counter() - start) / tick_count * 1_000_000
+
+    print(f"{'process_tick_event':<32}{cost:>10.2f} us/tick{len(oms_engine.positions):>8,} positions")
+
+    # 成交先于持仓推送时, 按成交增量更新
+    trade: TradeData = TradeData(
+        symbol="c1",
+        exchange=Exchange.SHFE,
+        orderid="1",
+        tradeid="1",
+        direction=Direction.LONG,
+        offset=Offset.OPEN,
+        price=3600,
+        volume=2,
+        datetime=datetime.now(),
+        gateway_name="CTP0"
+    )
+    oms_engine.process_trade_event(Event(EVENT_TRADE, trade))
+
+    position = copy(oms_engine.get_position("CTP0.c1.SHFE.多"))
+    position.price = (position.price * position.volume + trade.price * trade.volume) / (position.volume + trade.volume)
+    position.volume += trade.volume
+    oms_engine.process_position_event(Event(EVENT_POSITION, position))
+
+    print(f"{'full scan':<32}{timeit(lambda: scan_exposure(oms_engine), 20):>10.2f} us/call")
+    print(f"{'get_total_exposure':<32}{timeit(oms_engine.get_total_exposure, 100_000):>10.2f} us/call")
+    print(f"{'get_product_exposure':<32}{timeit(lambda: oms_engine.get_product_exposure(Product.OPTION), 100_000):>10.2f} us/call")
+
+    total = oms_engine.get_total_exposure()
+    expected: tuple = scan_exposure(oms_engine)
+    for value, expected_value in zip((total.pnl, total.exposure, total.margin), expected):
+        assert abs(value - expected_value) < 1e-6 * max(1, abs(expected_value)), (value, expected_value)
+
+    accounts: float = sum(oms_engine.get_account_exposure(f"CTP{j}").pnl for j in range(gateway_count))
+    products: float = sum(oms_engine.get_product_exposure(p).pnl for p in [Product.FUTURES, Product.OPTION])
+    assert abs(accounts - total.pnl) < 1e-6 * max(1, abs(total.pnl)) and abs(products - total.pnl) < 1e-6 * max(1, abs(total.pnl))
+
+    print(f"{'total pnl':<32}{total.pnl:>14,.0f}  exposure {total.exposure:,.0f}  margin {total.margin:,.0f}")
+
+    oms_engine.main_engine.close()
+
+    check_net_exposure()
+
+
+def check_net_exposure() -> None:
+    """
+    校验净持仓接口: 成交先于首次净持仓推送时, 应计入净持仓, 不产生
+    多余的多空持仓导致总敞口重复计算
+    """
+    oms_engine: OmsEngine = create_oms_engine()
+    oms_engine.enable_exposure(margin_rate=0.1)
+
+    contract: ContractData = ContractData(
+        symbol="rb2410",
+        exchange=Exchange.SHFE,
+        name="rb2410",
+        product=Product.FUTURES,
+        size=10,
+        pricetick=1,
+        gateway_name="NET"
+    )
+    oms_engine.process_contract_event(Event(EVENT_CONTRACT, contract))
+
+    trade: TradeData = TradeData(
+        symbol=contract.symbol,
+        exchange=contract.exchange,
+        orderid="1",
+        tradeid="1",
+        direction=Direction.LONG,
+        offset=Offset.NONE,
+        price=3600,
+        volume=2,
+        datetime=datetime.now(),
+        gateway_name="NET"
+    )
+    oms_engine.process_trade_event(Event(EVENT_TRADE, trade))
+
+    position: PositionData = PositionData(
+        symbol=contract.symbol,
+        exchange=contract.exchange,
+        direction=Direction.NET,
+        volume=2,
+        price=3600,
+        gateway_name="NET"
+    )
+    oms_engine.process_position_event(Event(EVENT_POSITION, position))
+
+    assert list(oms_engine.position_exposures) == [position.vt_positionid], list(oms_engine.position_exposures)
+
+    total = oms_engine.get_total_exposure()
+    expected: float = 3600 * 2 * contract.size
+    assert total.exposure == expected and oms_engine.get_account_exposure("NET").exposure == expected, total
+
+    print(f"{'net trade before position':<32}{'ok':>10}")
+
+    oms_engine.main_engine.close()
+
+
+if __name__ == "__main__":
+    parser: ArgumentParser = ArgumentParser()
+    parser.add_argument("case", choices=["index", "archive", "snapshot", "exposure"])
+    args = parser.parse_args()
+
+    if args.case == "index":
+        benchmark_index()
+    elif args.case == "archive":
+        benchmark_archive()
+    elif args.case == "snapshot":
+        benchmark_snapshot()
+    elif args.case == "exposure":
+        benchmark_exposure()
@@ -0,0 +1,260 @@
+"""
+日志引擎(LogEngine)和邮件引擎(EmailEngine)性能测试, 需要先将
+trader_engine.py安装为vnpy.trader.engine, 然后运行:
+
+    python benchmark_trader_engine.py log
+    python benchmark_trader_engine.py email
+
+邮件测试使用本地SMTP服务器(优先aiosmtpd, 否则为标准库smtpd)
+"""
+import logging
+import os
+import sys
+from argparse import ArgumentParser
+from email.message import EmailMessage
+from pathlib import Path
+from queue import Empty
+from tempfile import TemporaryDirectory
+from threading import Thread
+from time import perf_counter, sleep
+from typing import List
+
+from vnpy.event import Event, EventEngine
+from vnpy.trader.engine import DailyFileHandler, EmailEngine, LogEngine, MainEngine
+from vnpy.trader.event import EVENT_LOG
+from vnpy.trader.object import LogData
+from vnpy.trader.setting import SETTINGS
+
+
+def percentile(data: List[float], q: float) -> float:
+    """计算已排序数据的分位数"""
+    index: int = min(int(len(data) * q), len(data) - 1)
+    return data[index]
+
+
+class SyncLogEngine(LogEngine):
+    """改造前的日志引擎: 在事件引擎线程上直接格式化并写入控制台和文件"""
+
+    def __init__(self, main_engine: MainEngine, event_engine: EventEngine, folder: Path) -> None:
+        """"""
+        self.main_engine = main_engine
+        self.event_engine = event_engine
+        self.engine_name = "sync_log"
+
+        self.logger = logging.getLogger("benchmark_sync")
+        self.logger.setLevel(logging.INFO)
+
+        formatter: logging.Formatter = logging.Formatter("%(asctime)s  %(levelname)s: %(message)s")
+
+        console_handler: logging.StreamHandler = logging.StreamHandler()
+        console_handler.setFormatter(formatter)
+        self.logger.addHandler(console_handler)
+
+        file_handler: logging.FileHandler = logging.FileHandler(
+            folder.joinpath("sync.log"), mode="a", encoding="utf8"
+        )
+        file_handler.setFormatter(formatter)
+        self.logger.addHandler(file_handler)
+
+    def close(self) -> None:
+        """"""
+        for handler in self.logger.handlers:
+            handler.close()
+
+
+def run_log(log_engine: LogEngine, count: int) -> List[float]:
+    """在当前线程(相当于事件引擎线程)处理count个日志事件, 返回每个事件的耗时"""
+    costs: List[float] = []
+
+    for i in range(count):
+        event: Event = Event(EVENT_LOG, LogData(msg=f"策略CtaDemo新K线 {i}", gateway_name="CTA"))
+
+        start: float = perf_counter()
+        log_engine.process_log_event(event)
+        costs.append(perf_counter() - start)
+
+    return costs
+
+
+def benchmark_log(count: int = 100_000) -> None:
+    """
+    对比改造前后日志引擎在事件引擎线程上处理单个日志事件的耗时,
+    以及所有日志写入文件的总耗时(控制台输出重定向到os.devnull)
+    """
+    SETTINGS["log.level"] = logging.INFO
+    SETTINGS["log.file"] = False
+
+    stderr = sys.stderr
+    sys.stderr = open(os.devnull, "w")
+
+    with TemporaryDirectory() as folder:
+        for name in ["sync", "async"]:
+            main_engine: MainEngine = MainEngine(EventEngine())
+
+            if name == "sync":
+                log_engine: LogEngine = SyncLogEngine(main_engine, main_engine.event_engine, Path(folder))
+            else:
+                log_engine = main_engine.get_engine("log")
+                log_engine.listener.handlers += (DailyFileHandler(Path(folder)),)
+
+            start: float = perf_counter()
+            costs: List[float] = run_log(log_engine, count)
+            main_engine.close()
+            total: float = perf_counter() - start
+
+            if name == "sync":
+                log_engine.close()
+
+            costs.sort()
+            print(
+                f"{name:<8}{sum(costs) / count * 1e6:>8.2f} us mean{percentile(costs, 0.5) * 1e6:>8.2f} us p50"
+                f"{percentile(costs, 0.99) * 1e6:>8.2f} us p99{percentile(costs, 0.999) * 1e6:>9.2f} us p99.9"
+                f"{count / total:>12,.0f} logs/s written",
+                file=stderr
+            )
+
+    sys.stderr = stderr
+
+
+class SmtpServer:
+    """本地SMTP服务器, 统计收到的邮件数量"""
+
+    def __init__(self, port: int) -> None:
+        """"""
+        self.port: int = port
+        self.count: int = 0
+
+        try:
+            from aiosmtpd.controller import Controller
+
+            self.controller = Controller(self, hostname="127.0.0.1", port=port)
+        except ImportError:
+            self.controller = None
+
+    async def handle_DATA(self, server, session, envelope) -> str:
+        """aiosmtpd收到邮件"""
+        self.count += 1
+        return "250 OK"
+
+    def start(self) -> None:
+        """"""
+        if self.controller:
+            self.controller.start()
+            return
+
+        import asyncore
+        import smtpd
+
+        stand_in: SmtpServer = self
+
+        class Server(smtpd.SMTPServer):
+            def process_message(self, peer, mailfrom, rcpttos, data, **kwargs) -> None:
+                stand_in.count += 1
+
+        self.server = Server(("127.0.0.1", self.port), None)
+        self.thread: Thread = Thread(target=asyncore.loop, kwargs={"timeout": 0.01}, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """"""
+        if self.controller:
+            self.controller.stop()
+        else:
+            self.server.close()
+
+
+class BenchmarkEmailEngine(EmailEngine):
+    """统计连接次数, 每次连接额外等待latency秒模拟SSL握手和登录"""
+
+    latency: float = 0
+    connections: int = 0
+
+    def connect(self) -> None:
+        """"""
+        sleep(self.latency)
+        self.connections += 1
+        super().connect()
+
+
+class SyncEmailEngine(BenchmarkEmailEngine):
+    """改造前的邮件引擎: 每封邮件新建连接并登录"""
+
+    def run(self) -> None:
+        """"""
+        while self.active or not self.queue.empty():
+            try:
+                msg: EmailMessage = self.queue.get(block=True, timeout=1)
+
+                self.connect()
+                self.smtp.send_message(msg)
+                self.disconnect()
+            except Empty:
+                pass
+
+
+def benchmark_email(count: int = 200, latency: float = 0.05, port: int = 8025) -> None:
+    """
+    模拟一次策略告警风暴: 瞬间发出count封邮件(发给1个和10个收件人),
+    对比改造前后发送完所有邮件的耗时, 建立连接的次数, 以及服务器
+    实际收到的邮件数量. 每次连接额外等待latency秒, 模拟远程服务器
+    的SSL握手和登录耗时
+    """
+    SETTINGS["email.server"] = "127.0.0.1"
+    SETTINGS["email.port"] = port
+    SETTINGS["email.ssl"] = False
+    SETTINGS["email.username"] = ""
+    SETTINGS["email.sender"] = "sender@localhost"
+
+    server: SmtpServer = SmtpServer(port)
+    server.start()
+
+    for receiver_count in [1, 10]:
+        for name in ["sync", "persistent", "digest"]:
+            SETTINGS["email.window"] = 0.5 if name == "digest" else 0
+            SETTINGS["email.interval"] = 0
+
+            main_engine: MainEngine = MainEngine(EventEngine())
+            engine_class: type = SyncEmailEngine if name == "sync" else BenchmarkEmailEngine
+            email_engine: BenchmarkEmailEngine = engine_class(main_engine, main_engine.event_engine)
+            email_engine.latency = latency
+
+            # 持久连接模式下不合并邮件, 逐封发送
+            if name == "persistent":
+                email_engine.window = 0
+                email_engine.send_pending = lambda flush=False: send_each(email_engine)
+
+            server.count = 0
+            start: float = perf_counter()
+
+            for i in range(count):
+                email_engine.send_email(f"策略告警{i}", f"CtaDemo触发告警{i}", f"user{i % receiver_count}@localhost")
+            email_engine.close()
+
+            cost: float = perf_counter() - start
+            print(
+                f"{receiver_count:>3} receivers  {name:<12}{cost:>8.2f} s{count / cost:>10,.0f} alerts/s"
+                f"{email_engine.connections:>8} connections{server.count:>8} emails received"
+            )
+
+            main_engine.close()
+
+    server.stop()
+
+
+def send_each(email_engine: EmailEngine) -> None:
+    """持久连接模式下, 逐封发送待发邮件"""
+    for msgs in email_engine.pending.values():
+        for msg in msgs:
+            email_engine.send_message(msg)
+    email_engine.pending.clear()
+
+
+if __name__ == "__main__":
+    parser: ArgumentParser = ArgumentParser()
+    parser.add_argument("case", choices=["log", "email"])
+    args = parser.parse_args()
+
+    if args.case == "log":
+        benchmark_log()
+    elif args.case == "email":
+        benchmark_email()
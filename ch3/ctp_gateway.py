@@ -158,6 +158,9 @@ class CtpGateway(BaseGateway):
         self.td_api: "CtpTdApi" = CtpTdApi(self)
         self.md_api: "CtpMdApi" = CtpMdApi(self)
 
+        # 定时查询使用的定时器，事件引擎不支持add_timer时为EVENT_TIMER
+        self.timer_type: str = ""
+
     def connect(self, setting: dict) -> None:
         """连接交易接口"""
         userid: str = setting["用户名"]
@@ -209,6 +212,12 @@ class CtpGateway(BaseGateway):
 
     def close(self) -> None:
         """关闭接口"""
+        if self.timer_type == EVENT_TIMER:
+            self.event_engine.unregister(EVENT_TIMER, self.process_timer_event)
+        elif self.timer_type:
+            self.event_engine.remove_timer(self.timer_type)
+        self.timer_type = ""
+
         self.td_api.close()
         self.md_api.close()
 
@@ -221,10 +230,12 @@ class CtpGateway(BaseGateway):
 
     def process_timer_event(self, event) -> None:
         """定时事件处理"""
-        self.count += 1
-        if self.count < 2:
-            return
-        self.count = 0
+        # 使用EVENT_TIMER时每2秒查询一次
+        if self.timer_type == EVENT_TIMER:
+            self.count += 1
+            if self.count < 2:
+                return
+            self.count = 0
 
         func = self.query_functions.pop(0)
         func()
@@ -233,10 +244,18 @@ class CtpGateway(BaseGateway):
         self.md_api.update_date()
 
     def init_query(self) -> None:
-        """初始化查询任务"""
+        """初始化查询任务，重复连接时不再添加定时器"""
         self.count: int = 0
         self.query_functions: list = [self.query_account, self.query_position]
-        self.event_engine.register(EVENT_TIMER, self.process_timer_event)
+
+        if self.timer_type:
+            return
+
+        if hasattr(self.event_engine, "add_timer"):
+            self.timer_type = self.event_engine.add_timer(2, self.process_timer_event)
+        else:
+            self.timer_type = EVENT_TIMER
+            self.event_engine.register(EVENT_TIMER, self.process_timer_event)
 
 
 class CtpMdApi(MdApi):
@@ -1,10 +1,12 @@
 from abc import ABC, abstractmethod
 from datetime import datetime
 from types import ModuleType
-from typing import List
+from typing import Iterator, List
 from dataclasses import dataclass
 from importlib import import_module
 
+import numpy as np
+
 from .constant import Interval, Exchange
 from .object import BarData, TickData
 from .setting import SETTINGS
@@ -22,6 +24,41 @@ def convert_tz(dt: datetime) -> datetime:
     return dt.replace(tzinfo=None)
 
 
+# Struct-of-arrays layout returned by load_bar_arrays/load_tick_arrays,
+# datetime is naive in DB_TZ
+BAR_DTYPE: np.dtype = np.dtype([
+    ("datetime", "datetime64[us]"),
+    ("open_price", "f8"),
+    ("high_price", "f8"),
+    ("low_price", "f8"),
+    ("close_price", "f8"),
+    ("volume", "f8"),
+    ("turnover", "f8"),
+    ("open_interest", "f8"),
+])
+
+TICK_DTYPE: np.dtype = np.dtype(
+    [
+        ("datetime", "datetime64[us]"),
+        ("last_price", "f8"),
+        ("last_volume", "f8"),
+        ("volume", "f8"),
+        ("turnover", "f8"),
+        ("open_interest", "f8"),
+        ("limit_up", "f8"),
+        ("limit_down", "f8"),
+        ("open_price", "f8"),
+        ("high_price", "f8"),
+        ("low_price", "f8"),
+        ("pre_close", "f8"),
+    ]
+    + [(f"bid_price_{i}", "f8") for i in range(1, 6)]
+    + [(f"ask_price_{i}", "f8") for i in range(1, 6)]
+    + [(f"bid_volume_{i}", "f8") for i in range(1, 6)]
+    + [(f"ask_volume_{i}", "f8") for i in range(1, 6)]
+)
+
+
 @dataclass
 class BarOverview:
     """
@@ -95,6 +132,78 @@ class BaseDatabase(ABC):
         """
         pass
 
+    def iter_bar_data(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        interval: Interval,
+        start: datetime,
+        end: datetime,
+        chunk_size: int = 10_000
+    ) -> Iterator[List[BarData]]:
+        """
+        Load bar data from database in chunks of at most chunk_size bars,
+        so that memory usage is bounded by chunk size.
+
+        This default implementation splits result of load_bar_data,
+        database should override it to page through the query.
+        """
+        bars: List[BarData] = self.load_bar_data(symbol, exchange, interval, start, end)
+        for i in range(0, len(bars), chunk_size):
+            yield bars[i:i + chunk_size]
+
+    def iter_tick_data(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        start: datetime,
+        end: datetime,
+        chunk_size: int = 10_000
+    ) -> Iterator[List[TickData]]:
+        """
+        Load tick data from database in chunks of at most chunk_size ticks.
+
+        This default implementation splits result of load_tick_data,
+        database should override it to page through the query.
+        """
+        ticks: List[TickData] = self.load_tick_data(symbol, exchange, start, end)
+        for i in range(0, len(ticks), chunk_size):
+            yield ticks[i:i + chunk_size]
+
+    def load_bar_arrays(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        interval: Interval,
+        start: datetime,
+        end: datetime
+    ) -> np.ndarray:
+        """
+        Load bar data from database as structured array of BAR_DTYPE,
+        which can be turned into DataFrame with pandas.DataFrame(array).
+
+        This default implementation converts result of load_bar_data,
+        database should override it to read columns directly.
+        """
+        bars: List[BarData] = self.load_bar_data(symbol, exchange, interval, start, end)
+        return to_array(bars, BAR_DTYPE)
+
+    def load_tick_arrays(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        start: datetime,
+        end: datetime
+    ) -> np.ndarray:
+        """
+        Load tick data from database as structured array of TICK_DTYPE.
+
+        This default implementation converts result of load_tick_data,
+        database should override it to read columns directly.
+        """
+        ticks: List[TickData] = self.load_tick_data(symbol, exchange, start, end)
+        return to_array(ticks, TICK_DTYPE)
+
     @abstractmethod
     def delete_bar_data(
         self,
@@ -133,6 +242,21 @@ class BaseDatabase(ABC):
         pass
 
 
+def to_array(data: list, dtype: np.dtype) -> np.ndarray:
+    """
+    Convert list of BarData/TickData into structured array.
+    """
+    names: tuple = dtype.names[1:]
+
+    return np.array(
+        [
+            (convert_tz(d.datetime), *[getattr(d, name) for name in names])
+            for d in data
+        ],
+        dtype=dtype
+    )
+
+
 database: BaseDatabase = None
 
 
@@ -2,13 +2,22 @@
 Event-driven framework of VeighNa framework.
 """
 
-from collections import defaultdict
-from queue import Empty, Queue
-from threading import Thread
-from time import sleep
-from typing import Any, Callable, List
+import asyncio
+import sys
+from collections import defaultdict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from enum import Enum
+from itertools import count
+from math import ceil
+from queue import Empty, Full, Queue
+from threading import Condition, Event as Signal, Lock, Thread, get_ident
+from time import monotonic, perf_counter, perf_counter_ns
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
 
 EVENT_TIMER = "eTimer"
+EVENT_METRICS = "eMetrics"
+EVENT_QUEUE_WARNING = "eQueueWarning"
+EVENT_SLOW_HANDLER = "eSlowHandler"
 
 
 class Event:
@@ -18,51 +27,1912 @@ class Event:
     object which contains the real data.
     """
 
+    __slots__ = ("type", "data", "pool", "put_time")
+
     def __init__(self, type: str, data: Any = None) -> None:
         """"""
         self.type: str = type
         self.data: Any = data
+        self.pool: Optional["EventPool"] = None
+
+
+# Defines handler function to be used in event engine.
+HandlerType: callable = Callable[[Event], None]
+
+
+class EventPool:
+    """
+    Pool of preallocated event objects for high frequency event types
+    such as tick, to avoid allocating a new event for every put.
+
+    Event acquired from pool is owned by event engine after put, and
+    recycled once all handlers have processed it, so handlers must not
+    keep reference to the event itself (keeping event.data is fine).
+    Recycled event is cleared, so such mistake shows as empty event.
+
+    Events dropped or coalesced by queue are not recycled, and new
+    events are allocated when pool is empty.
+    """
+
+    def __init__(self, size: int = 4096) -> None:
+        """"""
+        self.events: Deque[Event] = deque()
+
+        for _ in range(size):
+            self.release(Event(""))
+
+    def acquire(self, type: str, data: Any = None) -> Event:
+        """
+        Get an event from pool, this can be called from any thread.
+        """
+        try:
+            event: Event = self.events.pop()
+        except IndexError:
+            event = Event(type, data)
+            event.pool = self
+            return event
+
+        event.type = type
+        event.data = data
+        return event
+
+    def release(self, event: Event) -> None:
+        """
+        Clear event and return it to pool.
+        """
+        event.type = ""
+        event.data = None
+        event.pool = self
+        self.events.append(event)
+
+
+class HandlerMode(Enum):
+    """
+    Where handler is called by event engine.
+    """
+
+    INLINE = "inline"
+    THREAD = "thread"
+    PROCESS = "process"
+
+
+class PooledHandler:
+    """
+    Wraps handler to be called in worker pool instead of dispatch thread.
+
+    Events are kept in a queue of the handler and processed by at most
+    one worker at a time, so each handler still sees events in order,
+    while different handlers run in parallel.
+
+    In PROCESS mode, handler and events are pickled into worker process
+    in batches, so handler must be a module level function. Event (or
+    list of events) returned by handler is put back into event engine.
+
+    Wrapper compares equal to the handler wrapped, so it can be found
+    and unregistered by the original handler.
+    """
+
+    def __init__(self, handler: HandlerType, mode: HandlerMode, event_engine: "EventEngine") -> None:
+        """"""
+        self.handler: HandlerType = handler
+        self.mode: HandlerMode = mode
+        self.event_engine: "EventEngine" = event_engine
+
+        self.events: Deque[Event] = deque()
+        self.lock: Lock = Lock()
+        self.running: bool = False
+
+    def __call__(self, event: Event) -> None:
+        """
+        Keep event and start a worker if none is running.
+        """
+        # Pooled event is recycled after dispatch, so keep a copy
+        if event.pool:
+            event = Event(event.type, event.data)
+
+        with self.lock:
+            self.events.append(event)
+            if self.running:
+                return
+            self.running = True
+
+        try:
+            self.event_engine._get_pool(HandlerMode.THREAD).submit(self.run)
+        except RuntimeError:
+            # Pools are shut down after engine stopped
+            self.run()
+
+    def __eq__(self, other: Any) -> bool:
+        """"""
+        if isinstance(other, PooledHandler):
+            return self.handler == other.handler
+        return self.handler == other
+
+    def __hash__(self) -> int:
+        """"""
+        return hash(self.handler)
+
+    def run(self) -> None:
+        """
+        Process events kept until there is none left.
+        """
+        while True:
+            with self.lock:
+                if not self.events:
+                    self.running = False
+                    return
+
+                events: List[Event] = list(self.events)
+                self.events.clear()
+
+            if self.mode is HandlerMode.PROCESS:
+                self.run_process(events)
+            else:
+                for event in events:
+                    try:
+                        self.handler(event)
+                    except Exception:
+                        sys.excepthook(*sys.exc_info())
+
+    def run_process(self, events: List[Event]) -> None:
+        """
+        Process events in worker process and put events returned.
+        """
+        try:
+            pool: Executor = self.event_engine._get_pool(HandlerMode.PROCESS)
+            results: List[Event] = pool.submit(call_handler, self.handler, events).result()
+        except Exception:
+            sys.excepthook(*sys.exc_info())
+            return
+
+        for result in results:
+            self.event_engine.put(result)
+
+
+class OverflowPolicy(Enum):
+    """
+    Policy of bounded event queue when it is full.
+    """
+
+    BLOCK = "block"
+    DROP_NEWEST = "drop_newest"
+    DROP_OLDEST = "drop_oldest"
+    CONFLATE = "conflate"
+
+
+class EventQueue(Queue):
+    """
+    Event queue with several priority lanes, lane 0 is served first.
+
+    Priorities are configured by event type prefix, the longest prefix
+    matched is used (e.g. "eTick." also matches "eTick.rb2401.SHFE"),
+    and the empty prefix "" can be used as default. Types not matched
+    go to the lowest lane.
+
+    A lower lane which has been skipped for starvation_limit times while
+    holding events will be served once before higher lanes again.
+
+    Events with type prefix in conflate_types are conflated by vt_symbol
+    of data: if an event of same type and vt_symbol is still waiting in
+    queue, its data is replaced in place by the newer one.
+
+    If max_size is given, the overflow policy of event type (by longest
+    prefix matched in overflow_policies, BLOCK by default) is applied
+    when queue is full:
+    BLOCK: producer waits until dispatch thread frees space.
+    DROP_NEWEST: the new event is discarded.
+    DROP_OLDEST: the oldest event in the same lane is discarded, or in
+        the lowest lane holding events, but never one in a higher lane.
+        The new event is discarded if there is none.
+    CONFLATE: data of the event waiting with same type and vt_symbol
+        is replaced, or the oldest event is discarded if there is none.
+        Events of the type are also conflated before queue is full, so
+        each vt_symbol keeps only its latest event in queue.
+    Threads in engine_threads (dispatch and timer threads) never block,
+    to avoid deadlock when queue is full, so their events may exceed
+    max_size.
+
+    watermark_callback is called with queue depth (outside the lock, on
+    the producer thread) when depth reaches high_watermark, and again
+    only after depth has fallen to half of high_watermark.
+    """
+
+    def __init__(
+        self,
+        priorities: Dict[str, int],
+        starvation_limit: int = 100,
+        conflate_types: List[str] = None,
+        max_size: int = 0,
+        overflow_policies: Dict[str, OverflowPolicy] = None,
+        high_watermark: int = 0,
+        watermark_callback: Callable[[int], None] = None,
+        engine_threads: Set[int] = None
+    ) -> None:
+        """"""
+        self.priorities: Dict[str, int] = priorities
+        self.starvation_limit: int = starvation_limit
+        self.lane_map: Dict[str, int] = {}
+
+        self.conflate_types: List[str] = conflate_types or []
+        self.conflate_map: Dict[str, bool] = {}
+        self.pending: Dict[tuple, Event] = {}
+        self.coalesced: Dict[str, int] = defaultdict(int)
+
+        self.overflow_policies: Dict[str, OverflowPolicy] = overflow_policies or {}
+        self.policy_map: Dict[str, OverflowPolicy] = {}
+        self.indexed: bool = bool(self.conflate_types) or (
+            OverflowPolicy.CONFLATE in self.overflow_policies.values()
+        )
+        self.index_map: Dict[str, bool] = {}
+        self.engine_threads: Set[int] = engine_threads if engine_threads is not None else set()
+
+        self.shed: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.blocked: int = 0
+
+        self.high_watermark: int = high_watermark
+        self.watermark_callback: Callable[[int], None] = watermark_callback
+        self.armed: bool = True
+
+        super().__init__(max_size)
+
+    def _init(self, maxsize: int) -> None:
+        """"""
+        super()._init(maxsize)
+
+        lane_count: int = max(self.priorities.values()) + 1
+        self.lanes: List[Deque[Event]] = [deque() for _ in range(lane_count)]
+        self.urgent: Deque[Event] = deque()
+        self.skips: List[int] = [0] * lane_count
+        self.max_depths: List[int] = [0] * lane_count
+        self.size: int = 0      # Events in lanes, urgent ones not counted against max_size
+
+    def _qsize(self) -> int:
+        """"""
+        return self.size + len(self.urgent)
+
+    def _put(self, event: Event) -> None:
+        """"""
+        if self.indexed and self.is_indexed(event.type):
+            vt_symbol: str = getattr(event.data, "vt_symbol", None)
+            if vt_symbol:
+                key: tuple = (event.type, vt_symbol)
+                pending: Optional[Event] = self.pending.get(key, None)
+
+                # Replace data of the event still waiting in queue
+                if pending:
+                    pending.data = event.data
+                    self.coalesced[vt_symbol] += 1
+                    return
+
+                self.pending[key] = event
+
+        lane_index: int = self.lane_map.get(event.type, None)
+        if lane_index is None:
+            lane_index = self.get_lane(event.type)
+
+        lane: Deque[Event] = self.lanes[lane_index]
+        lane.append(event)
+        self.size += 1
+
+        if len(lane) > self.max_depths[lane_index]:
+            self.max_depths[lane_index] = len(lane)
+
+    def _get(self) -> Event:
+        """"""
+        if self.urgent:
+            return self.urgent.popleft()
+
+        served: Optional[int] = None
+
+        for i, lane in enumerate(self.lanes):
+            if not lane:
+                continue
+
+            # Serve the highest lane holding events
+            if served is None:
+                served = i
+            # Count lower lanes skipped, and serve the starved one
+            else:
+                self.skips[i] += 1
+                if self.skips[i] >= self.starvation_limit:
+                    served = i
+                    break
+
+        self.skips[served] = 0
+        self.size -= 1
+        event: Event = self.lanes[served].popleft()
+
+        if self.pending:
+            self.remove_pending(event)
+
+        # Arm watermark callback again once depth is back to half
+        if not self.armed and self.size <= self.high_watermark // 2:
+            self.armed = True
+
+        return event
+
+    def put(self, event: Event, block: bool = True, timeout: float = None) -> None:
+        """
+        Put event into queue, overflow policy of event type is applied
+        when queue is full.
+        """
+        with self.not_full:
+            if 0 < self.maxsize <= self.size:
+                policy: OverflowPolicy = self.get_policy(event.type)
+
+                if policy is OverflowPolicy.BLOCK:
+                    if get_ident() not in self.engine_threads:
+                        self.wait_not_full(block, timeout)
+                elif not self.overflow(event, policy):
+                    return
+
+            self._put(event)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+            triggered: bool = False
+            if self.armed and self.high_watermark and self.size >= self.high_watermark:
+                self.armed = False
+                triggered = True
+            depth: int = self.size
+
+        if triggered and self.watermark_callback:
+            self.watermark_callback(depth)
+
+    def put_urgent(self, event: Event) -> None:
+        """
+        Put event before all lanes regardless of max_size, used for
+        engine notices such as queue warning, which are never shed.
+        Urgent events do not take space counted against max_size.
+        """
+        with self.mutex:
+            self.urgent.append(event)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def wait_not_full(self, block: bool, timeout: Optional[float]) -> None:
+        """
+        Wait with lock held until queue has space, raise Full if timeout.
+        """
+        self.blocked += 1
+
+        if not block:
+            raise Full
+        elif timeout is None:
+            while self.size >= self.maxsize:
+                self.not_full.wait()
+        else:
+            end: float = monotonic() + timeout
+            while self.size >= self.maxsize:
+                remaining: float = end - monotonic()
+                if remaining <= 0:
+                    raise Full
+                self.not_full.wait(remaining)
+
+    def overflow(self, event: Event, policy: OverflowPolicy) -> bool:
+        """
+        Make room for new event with lock held. Return True if the new
+        event should still be put into queue.
+        """
+        if policy is OverflowPolicy.CONFLATE:
+            vt_symbol: str = getattr(event.data, "vt_symbol", None)
+            pending: Optional[Event] = self.pending.get((event.type, vt_symbol), None)
+
+            if pending:
+                pending.data = event.data
+                self.coalesced[vt_symbol] += 1
+                self.shed[event.type][policy.value] += 1
+                return False
+        elif policy is OverflowPolicy.DROP_NEWEST:
+            self.shed[event.type][policy.value] += 1
+            return False
+
+        # Discard the oldest event of same lane, or of lower lanes
+        lane_index: int = self.lane_map.get(event.type, None)
+        if lane_index is None:
+            lane_index = self.get_lane(event.type)
+
+        lane: Deque[Event] = self.lanes[lane_index]
+        if not lane:
+            for i in range(len(self.lanes) - 1, lane_index, -1):
+                if self.lanes[i]:
+                    lane = self.lanes[i]
+                    break
+
+        if lane:
+            oldest: Event = lane.popleft()
+            self.size -= 1
+            if self.pending:
+                self.remove_pending(oldest)
+
+            self.shed[oldest.type][OverflowPolicy.DROP_OLDEST.value] += 1
+            return True
+
+        self.shed[event.type][OverflowPolicy.DROP_NEWEST.value] += 1
+        return False
+
+    def remove_pending(self, event: Event) -> None:
+        """
+        Remove event leaving queue from pending index.
+        """
+        key: tuple = (event.type, getattr(event.data, "vt_symbol", None))
+        if self.pending.get(key, None) is event:
+            self.pending.pop(key)
+
+    def get_lane(self, type: str) -> int:
+        """
+        Get lane index of event type by longest prefix matched.
+        """
+        matched: str = None
+        for prefix in self.priorities:
+            if type.startswith(prefix) and (matched is None or len(prefix) > len(matched)):
+                matched = prefix
+
+        if matched is None:
+            lane_index: int = len(self.lanes) - 1
+        else:
+            lane_index: int = self.priorities[matched]
+
+        self.lane_map[type] = lane_index
+        return lane_index
+
+    def is_conflated(self, type: str) -> bool:
+        """
+        Check if event type is conflated by prefix matched.
+        """
+        conflated: Optional[bool] = self.conflate_map.get(type, None)
+
+        if conflated is None:
+            conflated = any(type.startswith(prefix) for prefix in self.conflate_types)
+            self.conflate_map[type] = conflated
+
+        return conflated
+
+    def is_indexed(self, type: str) -> bool:
+        """
+        Check if waiting events of the type are indexed by vt_symbol,
+        for conflation or CONFLATE overflow policy.
+        """
+        indexed: Optional[bool] = self.index_map.get(type, None)
+
+        if indexed is None:
+            indexed = (
+                (bool(self.conflate_types) and self.is_conflated(type))
+                or self.get_policy(type) is OverflowPolicy.CONFLATE
+            )
+            self.index_map[type] = indexed
+
+        return indexed
+
+    def get_policy(self, type: str) -> OverflowPolicy:
+        """
+        Get overflow policy of event type by longest prefix matched.
+        """
+        policy: Optional[OverflowPolicy] = self.policy_map.get(type, None)
+
+        if policy is None:
+            matched: str = None
+            for prefix in self.overflow_policies:
+                if type.startswith(prefix) and (matched is None or len(prefix) > len(matched)):
+                    matched = prefix
+
+            if matched is None:
+                policy = OverflowPolicy.BLOCK
+            else:
+                policy = self.overflow_policies[matched]
+            self.policy_map[type] = policy
+
+        return policy
+
+    def get_shed_counts(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get number of events shed on overflow for each event type
+        and policy (drop_newest, drop_oldest, conflate).
+        """
+        with self.mutex:
+            return {type: dict(counts) for type, counts in self.shed.items()}
+
+    def get_coalesced(self) -> Dict[str, int]:
+        """
+        Get number of events coalesced for each vt_symbol.
+        """
+        with self.mutex:
+            return dict(self.coalesced)
+
+    def get_depths(self) -> Dict[int, int]:
+        """
+        Get number of events waiting in each lane (urgent ones not
+        included).
+        """
+        with self.mutex:
+            return {i: len(lane) for i, lane in enumerate(self.lanes)}
+
+    def get_max_depths(self) -> Dict[int, int]:
+        """
+        Get max number of events ever waiting in each lane.
+        """
+        with self.mutex:
+            return dict(enumerate(self.max_depths))
+
+
+class RingBuffer:
+    """
+    Preallocated bounded ring buffer handing events from one producer
+    thread (e.g. gateway API callback) to one consumer thread (dispatch
+    thread of event engine).
+
+    Head index is only written by consumer and tail index only by
+    producer, so no lock is taken when buffer is neither empty nor full.
+    Consumer only sleeps when buffer is empty, and producer only signals
+    when consumer is sleeping, so a burst of puts costs a single wakeup.
+
+    Policy when buffer is full:
+    BLOCK: producer waits until consumer frees space.
+    DROP_NEWEST: the new event is discarded.
+    DROP_OLDEST: the oldest event in buffer is discarded.
+    CONFLATE: the event waiting with same type and vt_symbol is replaced,
+        or the oldest event is discarded if there is none.
+    With lossy policies consumer takes a lock once for each get/drain.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 65536,
+        policy: OverflowPolicy = OverflowPolicy.BLOCK
+    ) -> None:
+        """
+        Capacity is rounded up to power of 2.
+        """
+        size: int = 1
+        while size < capacity:
+            size <<= 1
+
+        self.capacity: int = size
+        self.mask: int = size - 1
+        self.buffer: List[Optional[Event]] = [None] * size
+        self.policy: OverflowPolicy = policy
+        self.lossy: bool = policy is not OverflowPolicy.BLOCK
+
+        self.head: int = 0
+        self.tail: int = 0
+
+        self.consumer_waiting: bool = False
+        self.producer_waiting: bool = False
+        self.not_empty: Signal = Signal()
+        self.not_full: Signal = Signal()
+        self.lock: Lock = Lock()
+
+        self.last_index: Dict[tuple, int] = {}
+        self.dropped: int = 0
+        self.conflated: int = 0
+
+    def qsize(self) -> int:
+        """
+        Get number of events in buffer.
+        """
+        return self.tail - self.head
+
+    def put(self, event: Event) -> None:
+        """
+        Put event into buffer, overflow policy is applied if full.
+        """
+        if self.tail - self.head >= self.capacity:
+            if not self.lossy:
+                self.wait_not_full()
+            else:
+                with self.lock:
+                    if self.tail - self.head >= self.capacity and self.overflow(event):
+                        return
+
+        if self.policy is OverflowPolicy.CONFLATE:
+            vt_symbol: str = getattr(event.data, "vt_symbol", None)
+            if vt_symbol:
+                self.last_index[(event.type, vt_symbol)] = self.tail
+
+        self.buffer[self.tail & self.mask] = event
+        self.tail += 1
+
+        if self.consumer_waiting:
+            self.consumer_waiting = False
+            self.not_empty.set()
+
+    def overflow(self, event: Event) -> bool:
+        """
+        Make room for new event with lock held. Return True if the
+        event is conflated into the one waiting in buffer or discarded.
+        """
+        if self.policy is OverflowPolicy.DROP_NEWEST:
+            self.dropped += 1
+            return True
+        elif self.policy is OverflowPolicy.CONFLATE:
+            vt_symbol: str = getattr(event.data, "vt_symbol", None)
+            index: Optional[int] = self.last_index.get((event.type, vt_symbol), None)
+
+            if index is not None and index >= self.head:
+                self.buffer[index & self.mask] = event
+                self.conflated += 1
+                return True
+
+        self.buffer[self.head & self.mask] = None
+        self.head += 1
+        self.dropped += 1
+        return False
+
+    def get(self, block: bool = True, timeout: float = None) -> Event:
+        """
+        Get the oldest event, raise Empty if no event is available.
+        """
+        while self.tail == self.head:
+            if not block or not self.wait_not_empty(timeout):
+                raise Empty
+
+        if self.lossy:
+            with self.lock:
+                return self.pop(1)[0]
+        else:
+            return self.pop(1)[0]
+
+    def drain(self, count: int) -> List[Event]:
+        """
+        Take at most count events in buffer without waiting.
+        """
+        if self.lossy:
+            with self.lock:
+                return self.pop(count)
+        else:
+            return self.pop(count)
+
+    def pop(self, count: int) -> List[Event]:
+        """
+        Take events from head and move head once.
+        """
+        head: int = self.head
+        count = min(count, self.tail - head)
+
+        events: List[Event] = []
+        for i in range(head, head + count):
+            index: int = i & self.mask
+            events.append(self.buffer[index])
+            self.buffer[index] = None
+
+        self.head = head + count
+
+        if self.producer_waiting:
+            self.producer_waiting = False
+            self.not_full.set()
+
+        return events
+
+    def wait_not_empty(self, timeout: float = None) -> bool:
+        """
+        Sleep until producer puts event into buffer.
+        """
+        self.not_empty.clear()
+        self.consumer_waiting = True
+
+        # Check again in case event put before flag set
+        if self.tail != self.head:
+            self.consumer_waiting = False
+            return True
+
+        self.not_empty.wait(timeout)
+        self.consumer_waiting = False
+        return self.tail != self.head
+
+    def wait_not_full(self) -> None:
+        """
+        Sleep until consumer takes event from buffer.
+        """
+        while self.tail - self.head >= self.capacity:
+            self.not_full.clear()
+            self.producer_waiting = True
+
+            if self.tail - self.head < self.capacity:
+                break
+
+            self.not_full.wait(1)
+
+        self.producer_waiting = False
+
+
+class MultiProducerRingBuffer(RingBuffer):
+    """
+    Ring buffer for several producer threads (e.g. more than one gateway)
+    and one consumer thread. Producers are serialized by a lock, while
+    consumer side is the same as RingBuffer.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 65536,
+        policy: OverflowPolicy = OverflowPolicy.BLOCK
+    ) -> None:
+        """"""
+        super().__init__(capacity, policy)
+
+        self.put_lock: Lock = Lock()
+
+    def put(self, event: Event) -> None:
+        """
+        Put event into buffer, overflow policy is applied if full.
+        """
+        with self.put_lock:
+            super().put(event)
+
+
+class Histogram:
+    """
+    Histogram with log-linear buckets (HDR style) for integer values
+    such as latency in nanoseconds. Values are recorded with relative
+    precision of 1 / 2 ** precision_bits.
+    """
+
+    def __init__(self, precision_bits: int = 5) -> None:
+        """"""
+        self.precision_bits: int = precision_bits
+        self.sub_count: int = 1 << precision_bits
+
+        self.buckets: Dict[int, int] = defaultdict(int)
+        self.count: int = 0
+        self.total: int = 0
+        self.max: int = 0
+
+    def record(self, value: int) -> None:
+        """
+        Record a non-negative integer value.
+        """
+        if value < self.sub_count:
+            index: int = value
+        else:
+            shift: int = value.bit_length() - self.precision_bits - 1
+            index: int = (shift + 1) * self.sub_count + (value >> shift) - self.sub_count
+
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += value
+
+        if value > self.max:
+            self.max = value
+
+    def get_value(self, index: int) -> int:
+        """
+        Get middle value of bucket.
+        """
+        if index < self.sub_count:
+            return index
+
+        shift: int = index // self.sub_count - 1
+        lower: int = (index % self.sub_count + self.sub_count) << shift
+        return lower + ((1 << shift) >> 1)
+
+    def get_percentile(self, percent: float) -> int:
+        """
+        Get value at percentile (0-100) of recorded values.
+        """
+        if not self.count:
+            return 0
+
+        target: float = self.count * percent / 100
+        accumulated: int = 0
+
+        for index in sorted(self.buckets):
+            accumulated += self.buckets[index]
+            if accumulated >= target:
+                return min(self.get_value(index), self.max)
+
+        return self.max
+
+    def get_summary(self, unit: int = 1) -> dict:
+        """
+        Get count/mean/max/percentiles summary, values are divided by unit.
+        """
+        if self.count:
+            mean: float = self.total / self.count / unit
+        else:
+            mean: float = 0
+
+        return {
+            "count": self.count,
+            "mean": mean,
+            "max": self.max / unit,
+            "p50": self.get_percentile(50) / unit,
+            "p90": self.get_percentile(90) / unit,
+            "p99": self.get_percentile(99) / unit,
+            "p999": self.get_percentile(99.9) / unit,
+        }
+
+
+class Timer:
+    """
+    Timer scheduled in timer wheel, which generates event of event_type
+    at deadline (monotonic time in seconds).
+    """
+
+    def __init__(self, event_type: str, interval: float, once: bool = False) -> None:
+        """"""
+        self.event_type: str = event_type
+        self.interval: float = interval
+        self.once: bool = once
+
+        self.deadline: float = 0
+        self.tick: int = 0
+        self.slot: Optional[Set["Timer"]] = None
+
+        # Timer event has no data, so the same object is put every time
+        self.event: Event = Event(event_type)
+
+
+class TimerWheel:
+    """
+    Hierarchical timer wheel driven by monotonic clock.
+
+    Time is divided into ticks of resolution seconds. Level 0 has one slot
+    for each of the next 256 ticks, and every higher level covers 64 times
+    the range of the level below. Timers in higher level are cascaded down
+    when the level below wraps around, so adding, cancelling and expiring
+    a timer are all O(1).
+    """
+
+    level_bits: List[int] = [8, 6, 6, 6]
+
+    def __init__(self, resolution: float = 0.01) -> None:
+        """"""
+        self.resolution: float = resolution
+        self.start_time: float = monotonic()
+        self.current_tick: int = 0
+        self.count: int = 0
+
+        self.shifts: List[int] = []
+        self.masks: List[int] = []
+        self.levels: List[List[Set[Timer]]] = []
+
+        shift: int = 0
+        for bits in self.level_bits:
+            self.shifts.append(shift)
+            self.masks.append((1 << bits) - 1)
+            self.levels.append([set() for _ in range(1 << bits)])
+            shift += bits
+
+        self.max_ticks: int = 1 << shift
+
+    def add(self, timer: Timer) -> None:
+        """
+        Add timer by its deadline.
+        """
+        tick: int = ceil((timer.deadline - self.start_time) / self.resolution)
+        timer.tick = max(tick, self.current_tick + 1)
+
+        self.place(timer)
+        self.count += 1
+
+    def remove(self, timer: Timer) -> None:
+        """
+        Remove timer not expired yet.
+        """
+        if timer.slot is None:
+            return
+
+        timer.slot.discard(timer)
+        timer.slot = None
+        self.count -= 1
+
+    def place(self, timer: Timer) -> None:
+        """
+        Put timer into the slot of lowest level covering its tick.
+        """
+        # Timers beyond range of top level are placed in its last slot
+        tick: int = min(timer.tick, self.current_tick + self.max_ticks - 1)
+        delta: int = tick - self.current_tick
+
+        for level, shift in enumerate(self.shifts):
+            if delta < (self.masks[level] + 1) << shift:
+                break
+
+        slot: Set[Timer] = self.levels[level][(tick >> shift) & self.masks[level]]
+        slot.add(timer)
+        timer.slot = slot
+
+    def cascade(self) -> None:
+        """
+        Move timers of higher levels down when lower levels wrap around.
+        """
+        levels: List[int] = [
+            level for level in range(1, len(self.levels))
+            if not self.current_tick & ((1 << self.shifts[level]) - 1)
+        ]
+
+        for level in reversed(levels):
+            index: int = (self.current_tick >> self.shifts[level]) & self.masks[level]
+            slot: Set[Timer] = self.levels[level][index]
+            timers: List[Timer] = list(slot)
+            slot.clear()
+
+            for timer in timers:
+                self.place(timer)
+
+    def advance(self, now: float) -> List[Timer]:
+        """
+        Move current tick to now and return timers expired in tick order.
+        """
+        # Small epsilon to avoid missing the tick by float rounding
+        target: int = int((now - self.start_time) / self.resolution + 1e-6)
+
+        # Skip directly to target if no timer scheduled
+        if not self.count:
+            self.current_tick = max(target, self.current_tick)
+            return []
+
+        expired: List[Timer] = []
+
+        while self.current_tick < target:
+            self.current_tick += 1
+
+            if not self.current_tick & self.masks[0]:
+                self.cascade()
+
+            slot: Set[Timer] = self.levels[0][self.current_tick & self.masks[0]]
+            if slot:
+                for timer in slot:
+                    timer.slot = None
+
+                expired.extend(sorted(slot, key=lambda timer: timer.deadline))
+                self.count -= len(slot)
+                slot.clear()
+
+        return expired
+
+    def get_next_time(self) -> Optional[float]:
+        """
+        Get time when wheel should be advanced next, which is the next
+        tick with timer in level 0, or the next wrap around of level 0.
+        """
+        if not self.count:
+            return None
+
+        slots: List[Set[Timer]] = self.levels[0]
+
+        tick: int = self.current_tick + 1
+        boundary: int = (self.current_tick | self.masks[0]) + 1
+
+        while tick < boundary and not slots[tick & self.masks[0]]:
+            tick += 1
+
+        return self.start_time + tick * self.resolution
+
+
+class EventEngine:
+    """
+    Event engine distributes event object based on its type
+    to those handlers registered.
+
+    It also generates timer event by every interval seconds,
+    which can be used for timing purpose. More timers with their own
+    interval can be added by add_timer.
+    """
+
+    def __init__(
+        self,
+        interval: float = 1,
+        batch_size: int = 1,
+        priorities: Dict[str, int] = None,
+        starvation_limit: int = 100,
+        conflate_types: List[str] = None,
+        timer_resolution: float = 0.01,
+        queue_factory: Callable[[], Any] = None,
+        max_size: int = 0,
+        overflow_policies: Dict[str, OverflowPolicy] = None,
+        high_watermark: float = 0.8
+    ) -> None:
+        """
+        Timer event is generated every 1 second by default, if
+        interval not specified. All timers are scheduled on a timer
+        wheel with tick of timer_resolution seconds.
+
+        queue_factory can be used to replace the queue backend, e.g.
+        lambda: RingBuffer(65536, OverflowPolicy.DROP_OLDEST), which
+        overrides priorities and conflate_types.
+
+        When batch_size is larger than 1, every wakeup of the dispatch
+        thread also takes the events already waiting in queue (up to
+        batch_size in total) and processes them in one pass.
+
+        If priorities (event type prefix -> lane, 0 is highest) is given,
+        events are queued in priority lanes, for example:
+
+            {
+                "eTrade.": 0, "eOrder.": 0,
+                "eAccount.": 1, "ePosition.": 1,
+                "eTick.": 2, "": 2,
+                "eTimer": 3, "eLog": 3
+            }
+
+        If conflate_types (event type prefixes, e.g. ["eTick."]) is given,
+        an event waiting in queue is replaced in place by a newer one
+        with same type and vt_symbol, so that handlers only see the
+        latest data under backpressure. Other events keep strict order.
+
+        If max_size is given, queue is bounded and overflow_policies
+        (event type prefix -> OverflowPolicy, BLOCK by default) decide
+        what to do with each event type when queue is full, for example:
+
+            {
+                "eTick.": OverflowPolicy.CONFLATE,
+                "eLog": OverflowPolicy.DROP_NEWEST,
+                "": OverflowPolicy.BLOCK
+            }
+
+        A queue warning event is put ahead of all lanes once queue
+        depth reaches high_watermark (ratio of max_size). Events shed are
+        counted by get_shed_counts.
+        """
+        self._interval: float = interval
+        self._batch_size: int = batch_size
+        self._batch_sizes: List[Dict[int, int]] = []     # One histogram per dispatch thread
+
+        self._priorities: Dict[str, int] = priorities
+        self._starvation_limit: int = starvation_limit
+        self._conflate_types: List[str] = conflate_types
+        self._queue_factory: Callable[[], Any] = queue_factory
+        self._max_size: int = max_size
+        self._overflow_policies: Dict[str, OverflowPolicy] = overflow_policies
+        self._high_watermark: float = high_watermark
+        self._engine_threads: Set[int] = set()
+        self._queue: Queue = self._create_queue()
+
+        self._active: bool = False
+        self._thread: Thread = Thread(target=self._run, args=(self._queue,))
+        self._timer: Thread = Thread(target=self._run_timer)
+        self._timer_wheel: TimerWheel = TimerWheel(timer_resolution)
+        self._timer_condition: Condition = Condition()
+        self._timer_ids: count = count(1)
+        self._timers: Dict[str, Timer] = {}
+        self._handlers: defaultdict = defaultdict(list)
+        self._general_handlers: List = []
+
+        self._metrics_lock: Lock = Lock()
+        self._handler_metrics: Dict[Tuple[str, HandlerType], Histogram] = {}
+        self._delay_metrics: Histogram = Histogram()
+        self._depth_metrics: Histogram = Histogram()
+        self._metrics_timer: str = ""
+
+        self._pools: Dict[HandlerMode, Executor] = {}
+        self._pool_lock: Lock = Lock()
+
+        self._watchdog: Optional[Thread] = None
+        self._watchdog_signal: Signal = Signal()
+        self._watchdog_lock: Lock = Lock()
+        self._watchdog_budget: float = 0
+        self._watchdog_demote: Optional[HandlerMode] = None
+        self._running_call: Optional[tuple] = None
+        self._flagged_call: Optional[tuple] = None
+        self._slow_handlers: Dict[Tuple[str, HandlerType], dict] = {}
+
+    def _create_queue(self) -> Queue:
+        """
+        Create event queue according to queue backend, priority,
+        conflation and bound setting.
+        """
+        if self._queue_factory:
+            return self._queue_factory()
+        elif self._priorities or self._conflate_types or self._max_size:
+            return EventQueue(
+                self._priorities or {"": 0},
+                self._starvation_limit,
+                self._conflate_types,
+                self._max_size,
+                self._overflow_policies,
+                int(self._max_size * self._high_watermark),
+                self._put_warning,
+                self._engine_threads
+            )
+        else:
+            return Queue()
+
+    # 不断从队列中获取事件
+    def _run(self, queue: Queue) -> None:
+        """
+        Get event from queue and then process it.
+        """
+        self._engine_threads.add(get_ident())
+
+        batch_sizes: Dict[int, int] = defaultdict(int)
+        self._batch_sizes.append(batch_sizes)
+
+        while self._active:
+            try:
+                event: Event = queue.get(block=True, timeout=1)
+            except Empty:
+                continue
+
+            if self._batch_size > 1:
+                events: List[Event] = self._drain(queue, event)
+                batch_sizes[len(events)] += 1
+
+                for event in events:
+                    self._process(event)
+
+                    if event.pool:
+                        event.pool.release(event)
+            else:
+                self._process(event)
+
+                if event.pool:
+                    event.pool.release(event)
+
+    # 一次性取出队列中已有的事件
+    def _drain(self, queue: Queue, event: Event) -> List[Event]:
+        """
+        Take events already waiting in queue (batch_size in total
+        with the one just got) under a single lock acquire.
+        """
+        events: List[Event] = [event]
+
+        if not isinstance(queue, Queue):
+            events.extend(queue.drain(self._batch_size - 1))
+            return events
+
+        with queue.mutex:
+            count: int = min(queue._qsize(), self._batch_size - 1)
+
+            for _ in range(count):
+                events.append(queue._get())
+
+            if count:
+                queue.not_full.notify(count)
+
+        return events
+
+    # 将不同类型的事件分发给不同的handler
+    def _process(self, event: Event) -> None:
+        """
+        First distribute event to those handlers registered listening
+        to this type.
+
+        Then distribute event to those general handlers which listens
+        to all types.
+        """
+        if event.type in self._handlers:
+            [handler(event) for handler in self._handlers[event.type]]
+
+        if self._general_handlers:
+            [handler(event) for handler in self._general_handlers]
+
+    # 记录各handler耗时的事件分发（启用统计后替换_process）
+    def _process_metrics(self, event: Event) -> None:
+        """
+        Distribute event same as _process, and record handler call
+        time, enqueue-to-dispatch delay and queue depth.
+        """
+        put_time: int = getattr(event, "put_time", 0)
+        if put_time:
+            delay: int = perf_counter_ns() - put_time
+        else:
+            delay: int = 0
+        depth: int = sum(self.get_queue_depths().values())
+
+        handlers: list = self._handlers.get(event.type, []) + self._general_handlers
+        costs: list = []
+
+        for handler in handlers:
+            # Inline handler is watched as in _call_watched when watchdog is enabled
+            if not self._watchdog_budget or isinstance(handler, PooledHandler):
+                start: int = perf_counter_ns()
+                handler(event)
+                costs.append((handler, perf_counter_ns() - start))
+                continue
+
+            call: tuple = (event.type, handler, perf_counter())
+            start: int = perf_counter_ns()
+            self._running_call = call
+            handler(event)
+            self._running_call = None
+            cost: int = perf_counter_ns() - start
+            costs.append((handler, cost))
+
+            if cost > self._watchdog_budget * 1e9 and call is not self._flagged_call:
+                self._flag_handler(event.type, handler, cost / 1e9)
+
+        with self._metrics_lock:
+            if put_time:
+                self._delay_metrics.record(delay)
+            self._depth_metrics.record(depth)
+
+            for handler, cost in costs:
+                key: tuple = (event.type, handler)
+                histogram: Optional[Histogram] = self._handler_metrics.get(key, None)
+                if not histogram:
+                    histogram = Histogram()
+                    self._handler_metrics[key] = histogram
+                histogram.record(cost)
+
+    # 检查各handler耗时的事件分发（启用看门狗后替换_process）
+    def _process_watchdog(self, event: Event) -> None:
+        """
+        Distribute event same as _process, and check call time of each
+        inline handler against time budget.
+        """
+        if event.type in self._handlers:
+            self._call_watched(event, self._handlers[event.type])
+
+        if self._general_handlers:
+            self._call_watched(event, self._general_handlers)
+
+    def _call_watched(self, event: Event, handlers: List[HandlerType]) -> None:
+        """
+        Call handlers and flag those exceeding time budget.
+        """
+        for handler in list(handlers):
+            if isinstance(handler, PooledHandler):
+                handler(event)
+                continue
+
+            call: tuple = (event.type, handler, perf_counter())
+            self._running_call = call
+            handler(event)
+            self._running_call = None
+
+            cost: float = perf_counter() - call[2]
+            if cost > self._watchdog_budget and call is not self._flagged_call:
+                self._flag_handler(event.type, handler, cost)
+
+    def _run_watchdog(self) -> None:
+        """
+        Flag inline handler which is still running over time budget,
+        e.g. blocked by network call.
+        """
+        while self._active and self._watchdog_budget:
+            self._watchdog_signal.wait(self._watchdog_budget / 2)
+
+            call: Optional[tuple] = self._running_call
+            if not call or call is self._flagged_call:
+                continue
+
+            cost: float = perf_counter() - call[2]
+            if cost > self._watchdog_budget:
+                self._flagged_call = call
+                self._flag_handler(call[0], call[1], cost)
+
+    def _flag_handler(self, type: str, handler: HandlerType, cost: float) -> None:
+        """
+        Record slow handler, demote it to worker pool if enabled and
+        put slow handler event.
+        """
+        with self._watchdog_lock:
+            key: tuple = (type, handler)
+            record: Optional[dict] = self._slow_handlers.get(key, None)
+
+            if not record:
+                record = {
+                    "type": type,
+                    "handler": get_handler_name(handler),
+                    "count": 0,
+                    "max": 0,
+                    "mode": HandlerMode.INLINE.value
+                }
+                self._slow_handlers[key] = record
+
+            record["count"] += 1
+            record["max"] = max(record["max"], cost)
+
+            if self._watchdog_demote and record["mode"] == HandlerMode.INLINE.value:
+                self._demote_handler(handler, self._watchdog_demote)
+                record["mode"] = self._watchdog_demote.value
+
+            data: dict = dict(record, cost=cost)
+
+        # Avoid flagging loop caused by slow handler of this event
+        if type != EVENT_SLOW_HANDLER:
+            self.put(Event(EVENT_SLOW_HANDLER, data))
+
+    def _demote_handler(self, handler: HandlerType, mode: HandlerMode) -> None:
+        """
+        Replace inline handler by a pooled one in all handler lists,
+        sharing one wrapper so that events of all types keep order.
+
+        Handlers are matched by equality, as bound methods registered
+        for different types are different objects of one method.
+        """
+        pooled: PooledHandler = PooledHandler(handler, mode, self)
+
+        for handler_list in list(self._handlers.values()) + [self._general_handlers]:
+            for i, h in enumerate(handler_list):
+                if h == handler and not isinstance(h, PooledHandler):
+                    handler_list[i] = pooled
+
+    def _get_pool(self, mode: HandlerMode) -> Executor:
+        """
+        Get worker pool of handler mode, created when first used.
+        """
+        pool: Optional[Executor] = self._pools.get(mode, None)
+        if pool:
+            return pool
+
+        with self._pool_lock:
+            if mode not in self._pools:
+                if mode is HandlerMode.PROCESS:
+                    self._pools[mode] = ProcessPoolExecutor()
+                else:
+                    self._pools[mode] = ThreadPoolExecutor(thread_name_prefix="EventHandler")
+            return self._pools[mode]
+
+    # 记录事件放入队列的时间（启用统计后替换put）
+    def _put_metrics(self, event: Event) -> None:
+        """
+        Put event into queue with enqueue timestamp.
+        """
+        event.put_time = perf_counter_ns()
+        type(self).put(self, event)
+
+    def _report_metrics(self, event: Event) -> None:
+        """
+        Put metrics event with snapshot, called by report timer.
+        """
+        self.put(Event(EVENT_METRICS, self.get_metrics()))
+
+    def _put_warning(self, depth: int) -> None:
+        """
+        Put queue warning event when depth reaches high watermark.
+        """
+        data: dict = {
+            "depth": depth,
+            "max_size": self._max_size,
+            "shed": self.get_shed_counts()
+        }
+        event: Event = Event(EVENT_QUEUE_WARNING, data)
+
+        if isinstance(self._queue, EventQueue):
+            self._queue.put_urgent(event)
+        else:
+            self._queue.put(event)
+
+    def _run_timer(self) -> None:
+        """
+        Wait until next tick of timer wheel and then generate timer
+        events of those timers expired.
+
+        Periodic timer is rescheduled from its previous deadline instead
+        of the time it fired, so the period does not drift.
+        """
+        wheel: TimerWheel = self._timer_wheel
+        self._engine_threads.add(get_ident())
+
+        while self._active:
+            with self._timer_condition:
+                next_time: Optional[float] = wheel.get_next_time()
+
+                if next_time is None:
+                    self._timer_condition.wait(1)
+                else:
+                    timeout: float = next_time - monotonic()
+                    if timeout > 0:
+                        self._timer_condition.wait(min(timeout, 1))
 
+                now: float = monotonic()
+                expired: List[Timer] = wheel.advance(now)
 
-# Defines handler function to be used in event engine.
-HandlerType: callable = Callable[[Event], None]
+                for timer in expired:
+                    if timer.once:
+                        self._timers.pop(timer.event_type, None)
+                        continue
 
+                    timer.deadline += timer.interval
+                    if timer.deadline <= now:
+                        missed: int = int((now - timer.deadline) / timer.interval) + 1
+                        timer.deadline += missed * timer.interval
+                    wheel.add(timer)
 
-class EventEngine:
+            for timer in expired:
+                self.put(timer.event)
+
+    def _add_timer(self, event_type: str, interval: float, once: bool) -> None:
+        """
+        Schedule timer generating event of event_type.
+        """
+        timer: Timer = Timer(event_type, interval, once)
+        timer.deadline = monotonic() + interval
+
+        with self._timer_condition:
+            self._timers[event_type] = timer
+            self._timer_wheel.add(timer)
+            self._timer_condition.notify()
+
+    def start(self) -> None:
+        """
+        Start event engine to process events and generate timer events.
+        """
+        self._active = True
+        self._add_timer(EVENT_TIMER, self._interval, False)
+        self._thread.start()
+        self._timer.start()
+
+        if self._watchdog_budget:
+            self._start_watchdog()
+
+    def stop(self) -> None:
+        """
+        Stop event engine. Events kept by pooled handlers are processed
+        before worker pools are shut down.
+        """
+        self._active = False
+
+        with self._timer_condition:
+            self._timer_condition.notify()
+
+        self._timer.join()
+        self._thread.join()
+
+        if self._watchdog:
+            self._watchdog_signal.set()
+            self._watchdog.join()
+
+        # Thread pool first, as it waits for process pool results
+        for mode in [HandlerMode.THREAD, HandlerMode.PROCESS]:
+            pool: Optional[Executor] = self._pools.get(mode, None)
+            if pool:
+                pool.shutdown()
+
+    def add_timer(self, interval: float, handler: HandlerType, once: bool = False) -> str:
+        """
+        Add timer calling handler (on the dispatch thread) every interval
+        seconds, or only once after interval seconds if once is True.
+
+        Return event type of the timer, which is used to remove it.
+        """
+        timer_type: str = f"{EVENT_TIMER}.{next(self._timer_ids)}"
+
+        if once:
+            def process_once(event: Event) -> None:
+                self._handlers.pop(timer_type, None)
+                handler(event)
+
+            self.register(timer_type, process_once)
+        else:
+            self.register(timer_type, handler)
+
+        self._add_timer(timer_type, interval, once)
+        return timer_type
+
+    def remove_timer(self, timer_type: str) -> None:
+        """
+        Remove timer added by add_timer.
+        """
+        with self._timer_condition:
+            timer: Optional[Timer] = self._timers.pop(timer_type, None)
+            if timer:
+                self._timer_wheel.remove(timer)
+
+        self._handlers.pop(timer_type, None)
+
+    # 将待处理事件放入队列
+    def put(self, event: Event) -> None:
+        """
+        Put an event object into event queue.
+        """
+        self._queue.put(event)
+
+    # 在调用线程中直接分发事件（不经过队列），用于回放等场景
+    def dispatch(self, event: Event) -> None:
+        """
+        Distribute an event to handlers synchronously in calling thread,
+        bypassing the queue (metrics and watchdog still apply).
+        """
+        self._process(event)
+
+    def get_batch_sizes(self) -> Dict[int, int]:
+        """
+        Get number of wakeups for each batch size processed by the
+        dispatch threads (only recorded when batch_size > 1).
+        """
+        sizes: Dict[int, int] = defaultdict(int)
+
+        # Each dispatch thread updates its own histogram, copy is atomic
+        for batch_sizes in list(self._batch_sizes):
+            for size, n in batch_sizes.copy().items():
+                sizes[size] += n
+
+        return dict(sizes)
+
+    def get_queue_depths(self) -> Dict[int, int]:
+        """
+        Get number of events waiting in queue for each priority lane.
+        """
+        if isinstance(self._queue, EventQueue):
+            return self._queue.get_depths()
+        else:
+            return {0: self._queue.qsize()}
+
+    def get_coalesced_counts(self) -> Dict[str, int]:
+        """
+        Get number of events coalesced for each vt_symbol in
+        conflating mode.
+        """
+        if isinstance(self._queue, EventQueue):
+            return self._queue.get_coalesced()
+        else:
+            return {}
+
+    def get_shed_counts(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get number of events shed by bounded queue for each event type
+        and overflow policy.
+        """
+        if isinstance(self._queue, EventQueue):
+            return self._queue.get_shed_counts()
+        else:
+            return {}
+
+    def get_blocked_count(self) -> int:
+        """
+        Get number of puts which had to wait for space in bounded queue.
+        """
+        if isinstance(self._queue, EventQueue):
+            return self._queue.blocked
+        else:
+            return 0
+
+    def enable_metrics(self, report_interval: float = 0) -> None:
+        """
+        Start recording per handler and per event metrics.
+
+        If report_interval (seconds) is given, a metrics event with
+        the snapshot is put periodically by a timer (see add_timer).
+        Metrics are not recorded when disabled, so there is no extra
+        cost on the dispatch thread.
+        """
+        self._process = self._process_metrics
+        self.put = self._put_metrics
+
+        if report_interval and not self._metrics_timer:
+            self._metrics_timer = self.add_timer(report_interval, self._report_metrics)
+
+    def disable_metrics(self) -> None:
+        """
+        Stop recording metrics.
+        """
+        self.__dict__.pop("_process", None)
+        self.__dict__.pop("put", None)
+        if self._metrics_timer:
+            self.remove_timer(self._metrics_timer)
+            self._metrics_timer = ""
+
+        if self._watchdog_budget:
+            self._process = self._process_watchdog
+
+    def enable_watchdog(self, budget: float = 0.1, demote: Optional[HandlerMode] = None) -> None:
+        """
+        Start checking call time of inline handlers.
+
+        Handler taking longer than budget (seconds), or still running
+        over budget (checked by a watchdog thread), is flagged with a
+        slow handler event. If demote is given (THREAD or PROCESS),
+        flagged handler is also moved into that worker pool.
+
+        When metrics is enabled, handler time recorded by metrics is
+        used for the check instead.
+        """
+        self._watchdog_budget = budget
+        self._watchdog_demote = demote
+
+        if self._process != self._process_metrics:
+            self._process = self._process_watchdog
+
+        if self._active and not (self._watchdog and self._watchdog.is_alive()):
+            self._start_watchdog()
+
+    def disable_watchdog(self) -> None:
+        """
+        Stop checking call time of handlers. Handlers already demoted
+        stay in worker pool.
+        """
+        self._watchdog_budget = 0
+        self._watchdog_signal.set()
+
+        if self._process == self._process_watchdog:
+            self.__dict__.pop("_process", None)
+
+    def get_slow_handlers(self) -> List[dict]:
+        """
+        Get handlers flagged by watchdog with flagged count, max call
+        time (seconds) and current mode.
+        """
+        with self._watchdog_lock:
+            return [dict(record) for record in self._slow_handlers.values()]
+
+    def _start_watchdog(self) -> None:
+        """
+        Start watchdog thread.
+        """
+        self._watchdog_signal.clear()
+        self._watchdog = Thread(target=self._run_watchdog, daemon=True)
+        self._watchdog.start()
+
+    def reset_metrics(self) -> None:
+        """
+        Clear metrics recorded.
+        """
+        with self._metrics_lock:
+            self._handler_metrics.clear()
+            self._delay_metrics = Histogram()
+            self._depth_metrics = Histogram()
+
+    def get_metrics(self) -> dict:
+        """
+        Get snapshot of metrics recorded. Time values are in microseconds.
+
+        handlers: call count, total/mean/max time and percentiles for
+        each (event type, handler).
+        queue_delay: time from put to dispatch of event.
+        queue_depth: number of events waiting when dispatched.
+        queue_shed/queue_blocked: overflow counts of bounded queue.
+        """
+        with self._metrics_lock:
+            handlers: List[dict] = []
+
+            for (type, handler), histogram in self._handler_metrics.items():
+                summary: dict = histogram.get_summary(1000)
+                summary["type"] = type
+                summary["handler"] = get_handler_name(handler)
+                summary["total"] = histogram.total / 1000
+                handlers.append(summary)
+
+            handlers.sort(key=lambda d: d["total"], reverse=True)
+
+            return {
+                "handlers": handlers,
+                "queue_delay": self._delay_metrics.get_summary(1000),
+                "queue_depth": self._depth_metrics.get_summary(),
+                "queue_depths": self.get_queue_depths(),
+                "queue_shed": self.get_shed_counts(),
+                "queue_blocked": self.get_blocked_count(),
+            }
+
+    def register(
+        self,
+        type: str,
+        handler: HandlerType,
+        mode: HandlerMode = HandlerMode.INLINE
+    ) -> None:
+        """
+        Register a new handler function for a specific event type. Every
+        function can only be registered once for each event type.
+
+        Handler is called on dispatch thread by default, or in thread
+        pool or process pool (see PooledHandler) according to mode.
+        """
+        handler_list: list = self._handlers[type]
+        if handler not in handler_list:
+            if mode is not HandlerMode.INLINE:
+                handler = PooledHandler(handler, mode, self)
+            handler_list.append(handler)
+
+    def unregister(self, type: str, handler: HandlerType) -> None:
+        """
+        Unregister an existing handler function from event engine.
+        """
+        handler_list: list = self._handlers[type]
+
+        if handler in handler_list:
+            handler_list.remove(handler)
+
+        if not handler_list:
+            self._handlers.pop(type)
+
+    def register_general(self, handler: HandlerType, mode: HandlerMode = HandlerMode.INLINE) -> None:
+        """
+        Register a new handler function for all event types. Every
+        function can only be registered once for each event type.
+        """
+        if handler not in self._general_handlers:
+            if mode is not HandlerMode.INLINE:
+                handler = PooledHandler(handler, mode, self)
+            self._general_handlers.append(handler)
+
+    def unregister_general(self, handler: HandlerType) -> None:
+        """
+        Unregister an existing general handler function.
+        """
+        if handler in self._general_handlers:
+            self._general_handlers.remove(handler)
+
+
+class ShardedEventEngine(EventEngine):
     """
-    Event engine distributes event object based on its type
-    to those handlers registered.
+    Event engine distributes events to several worker threads (shards)
+    by routing key, which is vt_symbol of event data by default.
 
-    It also generates timer event by every interval seconds,
-    which can be used for timing purpose.
+    Events with same routing key are always processed by the same shard
+    in order, while events without key (timer, log, account, etc.) are
+    processed by the control shard. Handlers can therefore be called
+    from different threads at the same time.
+    """
+
+    def __init__(
+        self,
+        interval: float = 1,
+        shard_count: int = 4,
+        key_func: Callable[[Event], Optional[str]] = None,
+        batch_size: int = 1,
+        priorities: Dict[str, int] = None,
+        starvation_limit: int = 100,
+        conflate_types: List[str] = None,
+        timer_resolution: float = 0.01,
+        queue_factory: Callable[[], Any] = None,
+        max_size: int = 0,
+        overflow_policies: Dict[str, OverflowPolicy] = None,
+        high_watermark: float = 0.8
+    ) -> None:
+        """
+        max_size is applied to each shard queue.
+        """
+        super().__init__(
+            interval,
+            batch_size,
+            priorities,
+            starvation_limit,
+            conflate_types,
+            timer_resolution,
+            queue_factory,
+            max_size,
+            overflow_policies,
+            high_watermark
+        )
+
+        if key_func:
+            self._key_func: Callable[[Event], Optional[str]] = key_func
+        else:
+            self._key_func = get_symbol_key
+
+        self._shard_queues: List[Queue] = []
+        self._shard_threads: List[Thread] = []
+
+        for _ in range(shard_count):
+            queue: Queue = self._create_queue()
+            self._shard_queues.append(queue)
+            self._shard_threads.append(Thread(target=self._run, args=(queue,)))
+
+    def start(self) -> None:
+        """
+        Start control shard, worker shards and timer.
+        """
+        super().start()
+
+        for thread in self._shard_threads:
+            thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop event engine.
+        """
+        super().stop()
+
+        for thread in self._shard_threads:
+            thread.join()
+
+    def put(self, event: Event) -> None:
+        """
+        Put event into queue of shard selected by routing key.
+        """
+        key: Optional[str] = self._key_func(event)
+
+        if key is None:
+            self._queue.put(event)
+        else:
+            shard: int = hash(key) % len(self._shard_queues)
+            self._shard_queues[shard].put(event)
+
+    def get_queue_depths(self) -> Dict[int, int]:
+        """
+        Get number of events waiting in queue for each shard,
+        0 is the control shard.
+        """
+        queues: List[Queue] = [self._queue] + self._shard_queues
+        return {i: queue.qsize() for i, queue in enumerate(queues)}
+
+    def get_coalesced_counts(self) -> Dict[str, int]:
+        """
+        Get number of events coalesced for each vt_symbol in
+        conflating mode.
+        """
+        counts: Dict[str, int] = super().get_coalesced_counts()
+
+        for queue in self._shard_queues:
+            if isinstance(queue, EventQueue):
+                counts.update(queue.get_coalesced())
+
+        return counts
+
+    def get_shed_counts(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get number of events shed by all shard queues for each event
+        type and overflow policy.
+        """
+        counts: Dict[str, Dict[str, int]] = super().get_shed_counts()
+
+        for queue in self._shard_queues:
+            if isinstance(queue, EventQueue):
+                for type, shed in queue.get_shed_counts().items():
+                    type_counts: Dict[str, int] = counts.setdefault(type, {})
+                    for policy, n in shed.items():
+                        type_counts[policy] = type_counts.get(policy, 0) + n
+
+        return counts
+
+    def get_blocked_count(self) -> int:
+        """
+        Get number of puts which had to wait for space in all queues.
+        """
+        count: int = super().get_blocked_count()
+
+        for queue in self._shard_queues:
+            if isinstance(queue, EventQueue):
+                count += queue.blocked
+
+        return count
+
+
+class AsyncEventEngine:
     """
+    Event engine running on asyncio event loop, with the same interface
+    as EventEngine.
 
-    def __init__(self, interval: int = 1) -> None:
+    Both normal functions and async functions can be registered as
+    handler. Normal handlers are called directly in the loop, while
+    each call of async handler is run as a task, so async handlers
+    can run concurrently (and finish out of order).
+
+    put can be called from any thread, e.g. callbacks of C++ gateway
+    API, events put between two wakeups of the loop are processed
+    in one batch.
+    """
+
+    def __init__(self, interval: float = 1, batch_size: int = 1000) -> None:
         """
         Timer event is generated every 1 second by default, if
         interval not specified.
+
+        At most batch_size events are processed in one callback of
+        the loop, so that tasks of async handlers are not starved.
         """
-        self._interval: int = interval
-        self._queue: Queue = Queue()
+        self._interval: float = interval
+        self._batch_size: int = batch_size
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[Thread] = None
+        self._thread_id: int = 0
         self._active: bool = False
-        self._thread: Thread = Thread(target=self._run)
-        self._timer: Thread = Thread(target=self._run_timer)
+
+        self._pending: Deque[Event] = deque()
+        self._scheduled: bool = False
+        self._timer_task: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+
         self._handlers: defaultdict = defaultdict(list)
         self._general_handlers: List = []
 
-    # 不断从队列中获取事件
     def _run(self) -> None:
         """
-        Get event from queue and then process it.
+        Run event loop in the thread created by start.
         """
-        while self._active:
-            try:
-                event: Event = self._queue.get(block=True, timeout=1)
-                self._process(event)
-            except Empty:
-                pass
-    
-    # 将不同类型的事件分发给不同的handler
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+        self._loop.run_until_complete(self._close())
+        self._loop.close()
+
+    def _process_pending(self) -> None:
+        """
+        Process events put since last wakeup of the loop.
+        """
+        self._scheduled = False
+
+        for _ in range(self._batch_size):
+            if not self._pending:
+                return
+            self._process(self._pending.popleft())
+
+        # Leave the rest to next callback, let other tasks run first
+        self._schedule()
+
     def _process(self, event: Event) -> None:
         """
         First distribute event to those handlers registered listening
@@ -72,42 +1942,111 @@ class EventEngine:
         to all types.
         """
         if event.type in self._handlers:
-            [handler(event) for handler in self._handlers[event.type]]
+            [self._call(handler, event) for handler in self._handlers[event.type]]
 
         if self._general_handlers:
-            [handler(event) for handler in self._general_handlers]
+            [self._call(handler, event) for handler in self._general_handlers]
 
-    def _run_timer(self) -> None:
+    def _call(self, handler: HandlerType, event: Event) -> None:
+        """
+        Call handler, and run it as task if it is async function.
+        """
+        result: Any = handler(event)
+
+        if asyncio.iscoroutine(result):
+            task: asyncio.Task = self._loop.create_task(result)
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _schedule(self) -> None:
+        """
+        Schedule processing of pending events in the loop.
+        """
+        if self._scheduled or not self._loop:
+            return
+        self._scheduled = True
+
+        if get_ident() == self._thread_id:
+            self._loop.call_soon(self._process_pending)
+        else:
+            self._loop.call_soon_threadsafe(self._process_pending)
+
+    async def _run_timer(self) -> None:
         """
-        Sleep by interval second(s) and then generate a timer event.
+        Generate timer event every interval seconds, deadline is
+        calculated from start time so the period does not drift.
         """
+        deadline: float = self._loop.time()
+
         while self._active:
-            sleep(self._interval)
-            event: Event = Event(EVENT_TIMER)
-            self.put(event)
+            deadline += self._interval
+            await asyncio.sleep(deadline - self._loop.time())
+            self.put(Event(EVENT_TIMER))
 
-    def start(self) -> None:
+    async def _close(self) -> None:
+        """
+        Cancel timer and wait for tasks of async handlers.
+        """
+        if self._timer_task:
+            self._timer_task.cancel()
+
+        tasks: List[asyncio.Task] = [self._timer_task, *self._tasks]
+        await asyncio.gather(*[t for t in tasks if t], return_exceptions=True)
+
+    def start(self, loop: asyncio.AbstractEventLoop = None) -> None:
         """
         Start event engine to process events and generate timer events.
+
+        If loop is given (e.g. the running loop of a web server), the
+        engine runs in it. Otherwise a new loop is run in a new thread.
         """
         self._active = True
-        self._thread.start()
-        self._timer.start()
+
+        if loop:
+            self._loop = loop
+            self._loop.call_soon_threadsafe(self._start_timer)
+        else:
+            self._loop = asyncio.new_event_loop()
+            self._loop.call_soon(self._start_timer)
+            self._thread = Thread(target=self._run)
+            self._thread.start()
+
+        self._schedule()
+
+    def _start_timer(self) -> None:
+        """
+        Start timer task, called in the loop.
+        """
+        self._thread_id = get_ident()
+        self._timer_task = self._loop.create_task(self._run_timer())
 
     def stop(self) -> None:
         """
         Stop event engine.
         """
         self._active = False
-        self._timer.join()
-        self._thread.join()
 
-    # 将待处理事件放入队列
+        if self._thread:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+        elif self._loop:
+            asyncio.run_coroutine_threadsafe(self._close(), self._loop)
+
+    # 将待处理事件放入队列，可在任意线程中调用
     def put(self, event: Event) -> None:
         """
         Put an event object into event queue.
         """
-        self._queue.put(event)
+        self._pending.append(event)
+        self._schedule()
+
+    # 在调用线程中直接分发事件（不经过队列），用于回放等场景
+    def dispatch(self, event: Event) -> None:
+        """
+        Distribute an event to handlers synchronously in calling thread,
+        bypassing the pending queue.
+        """
+        self._process(event)
 
     def register(self, type: str, handler: HandlerType) -> None:
         """
@@ -144,3 +2083,47 @@ class EventEngine:
         """
         if handler in self._general_handlers:
             self._general_handlers.remove(handler)
+
+
+def get_handler_name(handler: HandlerType) -> str:
+    """
+    Get readable name of handler function for metrics.
+    """
+    if isinstance(handler, PooledHandler):
+        handler = handler.handler
+
+    name: str = getattr(handler, "__qualname__", None) or repr(handler)
+    module: str = getattr(handler, "__module__", None)
+
+    if module:
+        return f"{module}.{name}"
+    else:
+        return name
+
+
+def call_handler(handler: HandlerType, events: List[Event]) -> List[Event]:
+    """
+    Call handler with events in worker process, return events generated.
+    """
+    results: List[Event] = []
+
+    for event in events:
+        try:
+            result: Any = handler(event)
+        except Exception:
+            sys.excepthook(*sys.exc_info())
+            continue
+
+        if isinstance(result, Event):
+            results.append(result)
+        elif isinstance(result, list):
+            results.extend(result)
+
+    return results
+
+
+def get_symbol_key(event: Event) -> Optional[str]:
+    """
+    Default routing key of sharded event engine.
+    """
+    return getattr(event.data, "vt_symbol", None)
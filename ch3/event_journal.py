@@ -0,0 +1,277 @@
+"""
+Binary event journal and deterministic replay for event engine.
+"""
+
+import copy
+import mmap
+import os
+import pickle
+from collections import deque
+from struct import Struct
+from threading import Event as Signal, Thread
+from time import monotonic_ns, perf_counter, sleep
+from typing import Any, BinaryIO, Deque, Iterator, List, Tuple
+
+from vnpy.event import Event, EventEngine
+
+
+# File header: magic and version
+JOURNAL_MAGIC: bytes = b"VNJOURNL"
+JOURNAL_VERSION: int = 1
+HEADER: Struct = Struct("<8sHQ")
+
+# Block header: block size, number of events
+BLOCK: Struct = Struct("<II")
+
+
+# Immutable data is journaled by reference
+IMMUTABLE_TYPES: tuple = (type(None), bool, int, float, str, bytes, tuple, frozenset)
+
+
+def snapshot(data: Any) -> Any:
+    """
+    Shallow copy event data, fast path for plain objects (e.g. dataclass
+    of vnpy.trader.object), return data itself if it can not be copied.
+    """
+    if isinstance(data, IMMUTABLE_TYPES):
+        return data
+
+    cls: type = data.__class__
+    if hasattr(data, "__dict__") and not hasattr(cls, "__copy__") and not hasattr(cls, "__slots__"):
+        try:
+            new: Any = cls.__new__(cls)
+            new.__dict__.update(data.__dict__)
+            return new
+        except Exception:
+            pass
+
+    try:
+        return copy.copy(data)
+    except Exception:
+        return data
+
+
+class EventJournal:
+    """
+    Appends every event processed by event engine into a memory-mapped
+    binary journal file.
+
+    The general handler only stores (timestamp, type, data) in memory,
+    serialization and file writing are done in batch by a background
+    thread, so the dispatch thread is never blocked by disk I/O.
+
+    As data objects (e.g. OrderData) may be modified after the event
+    is processed, a shallow copy of data is taken on dispatch thread,
+    so the journal keeps the state at the time of the event. Data
+    which can not be copied is kept by reference.
+
+    Events of each batch are pickled together into one block, which
+    shares the type strings and classes between events.
+    """
+
+    def __init__(
+        self,
+        event_engine: EventEngine,
+        path: str,
+        flush_interval: float = 0.1,
+        chunk_size: int = 64 * 1024 * 1024
+    ) -> None:
+        """"""
+        self.event_engine: EventEngine = event_engine
+        self.path: str = path
+        self.flush_interval: float = flush_interval
+        self.chunk_size: int = chunk_size
+
+        self.buffer: Deque[Tuple[int, str, Any]] = deque()
+        self.count: int = 0
+        self.errors: int = 0
+
+        self.file: BinaryIO = None
+        self.mmap: mmap.mmap = None
+        self.size: int = 0
+        self.position: int = 0
+
+        self.active: bool = False
+        self.signal: Signal = Signal()
+        self.thread: Thread = Thread(target=self.run)
+
+    def start(self) -> None:
+        """
+        Open journal file and start recording events.
+        """
+        self.file = open(self.path, "w+b")
+        self.resize(self.chunk_size)
+
+        header: bytes = HEADER.pack(JOURNAL_MAGIC, JOURNAL_VERSION, monotonic_ns())
+        self.write(header)
+
+        self.active = True
+        self.thread.start()
+
+        self.event_engine.register_general(self.process_event)
+
+    def close(self) -> None:
+        """
+        Stop recording, write remaining events and truncate file.
+        """
+        if not self.active:
+            return
+
+        self.event_engine.unregister_general(self.process_event)
+
+        self.active = False
+        self.signal.set()
+        self.thread.join()
+
+        self.flush()
+
+        self.mmap.flush()
+        self.mmap.close()
+        self.file.truncate(self.position)
+        self.file.close()
+
+    def process_event(self, event: Event) -> None:
+        """
+        Keep snapshot of event in memory, called on dispatch thread.
+        """
+        self.buffer.append((monotonic_ns(), event.type, snapshot(event.data)))
+
+    def run(self) -> None:
+        """
+        Write events in memory into file every flush interval.
+        """
+        while self.active:
+            self.signal.wait(self.flush_interval)
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Serialize events in memory and write them as one block.
+        """
+        records: List[Tuple[int, str, Any]] = []
+        while self.buffer:
+            records.append(self.buffer.popleft())
+
+        if not records:
+            return
+
+        try:
+            data: bytes = pickle.dumps(records, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            data = self.dumps_each(records)
+
+        self.write(BLOCK.pack(BLOCK.size + len(data), len(records)) + data)
+        self.count += len(records)
+
+    def dumps_each(self, records: List[Tuple[int, str, Any]]) -> bytes:
+        """
+        Serialize records one by one, replace data can not be pickled
+        with None.
+        """
+        checked: List[Tuple[int, str, Any]] = []
+
+        for timestamp, type, data in records:
+            try:
+                pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                data = None
+                self.errors += 1
+            checked.append((timestamp, type, data))
+
+        return pickle.dumps(checked, pickle.HIGHEST_PROTOCOL)
+
+    def write(self, data: bytes) -> None:
+        """
+        Write data at current position, extend file if necessary.
+        """
+        end: int = self.position + len(data)
+
+        if end > self.size:
+            chunks: int = (end - self.size) // self.chunk_size + 1
+            self.resize(self.size + chunks * self.chunk_size)
+
+        self.mmap[self.position:end] = data
+        self.position = end
+
+    def resize(self, size: int) -> None:
+        """
+        Extend file to size and map it again.
+        """
+        if self.mmap:
+            self.mmap.close()
+
+        self.file.truncate(size)
+        self.mmap = mmap.mmap(self.file.fileno(), size)
+        self.size = size
+
+
+class JournalReplayer:
+    """
+    Reads events from journal file and replays them into event engine.
+
+    Events are dispatched to handlers synchronously in the calling
+    thread by dispatch of the engine, bypassing its queue and timer
+    (the engine should not be started), so handlers see exactly the
+    recorded sequence. Events put by handlers during replay are left
+    in queue of the engine, as they have been recorded and replayed
+    at their own place.
+    """
+
+    def __init__(self, path: str) -> None:
+        """"""
+        self.path: str = path
+
+    def __iter__(self) -> Iterator[Tuple[int, Event]]:
+        """
+        Iterate (timestamp, event) in the order recorded.
+        """
+        with open(self.path, "rb") as f:
+            if not os.fstat(f.fileno()).st_size:
+                return
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                magic, version, _ = HEADER.unpack_from(m, 0)
+                if magic != JOURNAL_MAGIC or version != JOURNAL_VERSION:
+                    raise ValueError(f"不支持的事件日志文件：{self.path}")
+
+                position: int = HEADER.size
+                end: int = len(m)
+
+                while position + BLOCK.size <= end:
+                    size, _ = BLOCK.unpack_from(m, position)
+
+                    # Zero size means the unwritten part of file
+                    if not size:
+                        break
+
+                    records: list = pickle.loads(m[position + BLOCK.size:position + size])
+                    for timestamp, type, data in records:
+                        yield timestamp, Event(type, data)
+
+                    position += size
+
+    def replay(self, event_engine: EventEngine, speed: float = 0) -> int:
+        """
+        Replay events into event engine and return number of events.
+
+        Full speed if speed is 0, otherwise the recorded intervals are
+        kept (divided by speed, e.g. 1 for real-time, 10 for 10x).
+        """
+        count: int = 0
+        first_timestamp: int = 0
+        start: float = perf_counter()
+
+        for timestamp, event in self:
+            if speed:
+                if not first_timestamp:
+                    first_timestamp = timestamp
+
+                target: float = start + (timestamp - first_timestamp) / 1e9 / speed
+                wait: float = target - perf_counter()
+                if wait > 0:
+                    sleep(wait)
+
+            event_engine.dispatch(event)
+            count += 1
+
+        return count
@@ -0,0 +1,530 @@
+import atexit
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from vnpy.trader.constant import Exchange, Interval
+from vnpy.trader.object import BarData, TickData
+from vnpy.trader.utility import get_folder_path
+from vnpy.trader.database import (
+    BaseDatabase,
+    BarOverview,
+    BAR_DTYPE,
+    DB_TZ,
+    TICK_DTYPE,
+    TickOverview,
+    convert_tz
+)
+
+
+# 数据按合约分目录存放，每个月一个分区目录，目录中为一个或多个Parquet文件：
+#   bar/{symbol}.{exchange}/{interval}/{YYYY-MM}/part-00000.parquet
+#   tick/{symbol}.{exchange}/{YYYY-MM}/part-00000.parquet
+# 文件内数据按时间排序，datetime为DB_TZ时区下的无时区时间
+path: Path = get_folder_path("parquet")
+
+BAR_SCHEMA: pa.Schema = pa.schema(
+    [("datetime", pa.timestamp("us"))]
+    + [(name, pa.float64()) for name in BAR_DTYPE.names[1:]]
+)
+
+TICK_SCHEMA: pa.Schema = pa.schema(
+    [("datetime", pa.timestamp("us")), ("name", pa.string())]
+    + [(name, pa.float64()) for name in TICK_DTYPE.names[1:]]
+    + [("localtime", pa.timestamp("us"))]
+)
+
+
+def to_naive(dt: datetime) -> datetime:
+    """查询时间如果带时区则转换到DB_TZ，与文件中的时间比较"""
+    if dt.tzinfo:
+        return convert_tz(dt)
+    return dt
+
+
+def to_bar_table(bars: List[BarData]) -> pa.Table:
+    """将BarData列表按列转换为Arrow表"""
+    columns: list = [pa.array([convert_tz(bar.datetime) for bar in bars], pa.timestamp("us"))]
+    for name in BAR_DTYPE.names[1:]:
+        columns.append(pa.array([getattr(bar, name) for bar in bars], pa.float64()))
+    return pa.Table.from_arrays(columns, schema=BAR_SCHEMA)
+
+
+def to_tick_table(ticks: List[TickData]) -> pa.Table:
+    """将TickData列表按列转换为Arrow表"""
+    columns: list = [
+        pa.array([convert_tz(tick.datetime) for tick in ticks], pa.timestamp("us")),
+        pa.array([tick.name for tick in ticks], pa.string())
+    ]
+    for name in TICK_DTYPE.names[1:]:
+        columns.append(pa.array([getattr(tick, name) for tick in ticks], pa.float64()))
+    columns.append(pa.array([tick.localtime for tick in ticks], pa.timestamp("us")))
+    return pa.Table.from_arrays(columns, schema=TICK_SCHEMA)
+
+
+def to_list(column: pa.ChunkedArray) -> list:
+    """将Arrow列转换为Python列表，时间列经NumPy转换比to_pylist快得多"""
+    return column.to_numpy().astype(object).tolist()
+
+
+def to_bar_list(table: pa.Table, symbol: str, exchange: Exchange, interval: Interval) -> List[BarData]:
+    """将Arrow表转换为BarData列表"""
+    columns: List[list] = [to_list(table.column(name)) for name in BAR_DTYPE.names]
+
+    bars: List[BarData] = []
+    for dt, open_price, high_price, low_price, close_price, volume, turnover, open_interest in zip(*columns):
+        bar: BarData = BarData(
+            symbol=symbol,
+            exchange=exchange,
+            datetime=dt.replace(tzinfo=DB_TZ),
+            interval=interval,
+            volume=volume,
+            turnover=turnover,
+            open_interest=open_interest,
+            open_price=open_price,
+            high_price=high_price,
+            low_price=low_price,
+            close_price=close_price,
+            gateway_name="DB"
+        )
+        bars.append(bar)
+    return bars
+
+
+def to_tick_list(table: pa.Table, symbol: str, exchange: Exchange) -> List[TickData]:
+    """将Arrow表转换为TickData列表"""
+    names: tuple = TICK_SCHEMA.names
+    columns: List[list] = [to_list(table.column(name)) for name in names]
+
+    ticks: List[TickData] = []
+    for row in zip(*columns):
+        data: dict = dict(zip(names, row))
+        data["datetime"] = data["datetime"].replace(tzinfo=DB_TZ)
+
+        tick: TickData = TickData(symbol=symbol, exchange=exchange, gateway_name="DB", **data)
+        ticks.append(tick)
+    return ticks
+
+
+def to_array(table: pa.Table, dtype: np.dtype) -> np.ndarray:
+    """将Arrow表的各列直接复制到结构化数组"""
+    array: np.ndarray = np.empty(table.num_rows, dtype=dtype)
+    for name in dtype.names:
+        array[name] = table.column(name).to_numpy()
+    return array
+
+
+def sort_table(table: pa.Table) -> pa.Table:
+    """按时间排序并去除重复时间的数据，保留表中靠后的一条"""
+    dt: np.ndarray = table.column("datetime").to_numpy()
+
+    index: np.ndarray = np.argsort(dt, kind="stable")
+    sorted_dt: np.ndarray = dt[index]
+    last: np.ndarray = np.append(sorted_dt[1:] != sorted_dt[:-1], True)
+
+    return table.take(index[last])
+
+
+def split_months(table: pa.Table) -> Dict[str, pa.Table]:
+    """将数据按月拆分，返回月份（YYYY-MM）和对应的数据"""
+    months: np.ndarray = table.column("datetime").to_numpy().astype("datetime64[M]")
+
+    tables: Dict[str, pa.Table] = {}
+    for month in np.unique(months):
+        tables[str(month)] = table.filter(months == month)
+    return tables
+
+
+def get_parts(folder: Path) -> List[Path]:
+    """月份分区目录中的数据文件，按写入顺序排列"""
+    return sorted(folder.glob("part-*.parquet"))
+
+
+def get_month_folders(folder: Path, start: datetime = None, end: datetime = None) -> List[Path]:
+    """合约目录中的月份分区目录，按时间排列，只返回和查询范围有重叠的月份"""
+    if not folder.exists():
+        return []
+
+    folders: List[Path] = sorted(f for f in folder.iterdir() if f.is_dir())
+    if start:
+        folders = [f for f in folders if f.name >= f"{start:%Y-%m}"]
+    if end:
+        folders = [f for f in folders if f.name <= f"{end:%Y-%m}"]
+    return folders
+
+
+def read_overview(folder: Path) -> tuple:
+    """
+    从文件元数据统计合约目录中的数据量和起止时间，月份分区只有一个文件时
+    不读取数据本身，起止时间取自第一个和最后一个月份分区中datetime列的
+    行组统计信息
+    """
+    month_folders: List[Path] = get_month_folders(folder)
+
+    count: int = 0
+    for month_folder in month_folders:
+        parts: List[Path] = get_parts(month_folder)
+
+        # 单个文件内没有重复数据，多个文件时只读取时间列去重后统计
+        if len(parts) == 1:
+            count += pq.read_metadata(parts[0]).num_rows
+        elif parts:
+            dt: np.ndarray = np.concatenate([
+                pq.read_table(part, columns=["datetime"]).column("datetime").to_numpy()
+                for part in parts
+            ])
+            count += len(np.unique(dt))
+
+    if not count:
+        return 0, None, None
+
+    start: datetime = min(
+        statistics.min for statistics in read_statistics(month_folders[0])
+    )
+    end: datetime = max(
+        statistics.max for statistics in read_statistics(month_folders[-1])
+    )
+    return count, start, end
+
+
+def read_statistics(folder: Path) -> list:
+    """月份分区中所有行组datetime列的统计信息"""
+    statistics: list = []
+
+    for part in get_parts(folder):
+        metadata: pq.FileMetaData = pq.read_metadata(part)
+        for i in range(metadata.num_row_groups):
+            statistics.append(metadata.row_group(i).column(0).statistics)
+
+    return statistics
+
+
+def read_parts(parts: List[Path], start: datetime, end: datetime) -> pa.Table:
+    """
+    读取文件中时间范围内的数据，按datetime列的行组统计信息跳过不需要的行组。
+    stream模式追加的文件之间可能有相同时间的数据，以较新文件中的为准
+    """
+    if not parts:
+        return None
+
+    filters: list = [("datetime", ">=", start), ("datetime", "<=", end)]
+    tables: List[pa.Table] = [pq.read_table(part, filters=filters) for part in parts]
+    return sort_table(pa.concat_tables(tables))
+
+
+class ParquetDatabase(BaseDatabase):
+    """Parquet文件数据库接口"""
+
+    # 每个文件中行组的行数，读取时按行组的时间统计信息跳过不需要的数据
+    row_group_size: int = 65_536
+
+    # stream模式写入时缓存的数据量，达到后作为新文件写入月份分区
+    buffer_size: int = 10_000
+
+    # 月份分区中的文件数超过该值后合并为一个文件
+    max_parts: int = 16
+
+    def __init__(self, folder: Path = None) -> None:
+        """"""
+        self.folder: Path = folder or path
+
+        # stream模式写入的缓存数据，键为合约目录
+        self.bar_buffers: Dict[Path, List[BarData]] = {}
+        self.tick_buffers: Dict[Path, List[TickData]] = {}
+
+        atexit.register(self.flush)
+
+    def get_bar_folder(self, symbol: str, exchange: Exchange, interval: Interval) -> Path:
+        """K线数据目录"""
+        return self.folder.joinpath("bar", f"{symbol}.{exchange.value}", interval.value)
+
+    def get_tick_folder(self, symbol: str, exchange: Exchange) -> Path:
+        """TICK数据目录"""
+        return self.folder.joinpath("tick", f"{symbol}.{exchange.value}")
+
+    def save_bar_data(self, bars: List[BarData], stream: bool = False) -> bool:
+        """保存K线数据"""
+        bar: BarData = bars[0]
+        folder: Path = self.get_bar_folder(bar.symbol, bar.exchange, bar.interval)
+
+        if stream:
+            buffer: List[BarData] = self.bar_buffers.setdefault(folder, [])
+            buffer.extend(bars)
+
+            if len(buffer) >= self.buffer_size:
+                self.append_table(folder, to_bar_table(buffer))
+                buffer.clear()
+        else:
+            self.write_table(folder, to_bar_table(bars))
+
+        return True
+
+    def save_tick_data(self, ticks: List[TickData], stream: bool = False) -> bool:
+        """保存TICK数据"""
+        tick: TickData = ticks[0]
+        folder: Path = self.get_tick_folder(tick.symbol, tick.exchange)
+
+        if stream:
+            buffer: List[TickData] = self.tick_buffers.setdefault(folder, [])
+            buffer.extend(ticks)
+
+            if len(buffer) >= self.buffer_size:
+                self.append_table(folder, to_tick_table(buffer))
+                buffer.clear()
+        else:
+            self.write_table(folder, to_tick_table(ticks))
+
+        return True
+
+    def flush(self) -> None:
+        """将stream模式缓存的数据写入文件"""
+        for folder, bars in self.bar_buffers.items():
+            if bars:
+                self.append_table(folder, to_bar_table(bars))
+        self.bar_buffers.clear()
+
+        for folder, ticks in self.tick_buffers.items():
+            if ticks:
+                self.append_table(folder, to_tick_table(ticks))
+        self.tick_buffers.clear()
+
+    def write_table(self, folder: Path, table: pa.Table) -> None:
+        """覆盖写入：和月份分区中原有的数据合并，相同时间的数据以新数据为准"""
+        for month, month_table in split_months(table).items():
+            month_folder: Path = folder.joinpath(month)
+            parts: List[Path] = get_parts(month_folder)
+
+            if parts:
+                month_table = pa.concat_tables([pq.read_table(part) for part in parts] + [month_table])
+            self.write_part(month_folder, sort_table(month_table), parts)
+
+    def append_table(self, folder: Path, table: pa.Table) -> None:
+        """追加写入：数据作为新文件写入月份分区，文件数过多时合并"""
+        for month, month_table in split_months(table).items():
+            month_folder: Path = folder.joinpath(month)
+            parts: List[Path] = get_parts(month_folder)
+
+            if len(parts) < self.max_parts:
+                self.write_part(month_folder, sort_table(month_table))
+            else:
+                month_table = pa.concat_tables([pq.read_table(part) for part in parts] + [month_table])
+                self.write_part(month_folder, sort_table(month_table), parts)
+
+    def write_part(self, folder: Path, table: pa.Table, replaced: List[Path] = None) -> None:
+        """写入新文件（先写临时文件再重命名），然后删除被替换的旧文件"""
+        folder.mkdir(parents=True, exist_ok=True)
+
+        parts: List[Path] = get_parts(folder)
+        index: int = int(parts[-1].stem.split("-")[1]) + 1 if parts else 0
+        part_path: Path = folder.joinpath(f"part-{index:05d}.parquet")
+        temp_path: Path = part_path.with_suffix(".tmp")
+
+        pq.write_table(table, temp_path, row_group_size=self.row_group_size)
+        os.replace(temp_path, part_path)
+
+        for part in replaced or []:
+            part.unlink()
+
+    def read_table(self, folder: Path, start: datetime, end: datetime) -> pa.Table:
+        """读取时间范围内的数据：先按月份跳过分区，再按时间条件过滤行组和数据"""
+        start = to_naive(start)
+        end = to_naive(end)
+
+        parts: List[Path] = []
+        for month_folder in get_month_folders(folder, start, end):
+            parts.extend(get_parts(month_folder))
+
+        return read_parts(parts, start, end)
+
+    def iter_table(self, folder: Path, start: datetime, end: datetime, chunk_size: int) -> Iterator[pa.Table]:
+        """逐个月份读取时间范围内的数据，并拆分为最多chunk_size行的数据块"""
+        start = to_naive(start)
+        end = to_naive(end)
+
+        for month_folder in get_month_folders(folder, start, end):
+            table: pa.Table = read_parts(get_parts(month_folder), start, end)
+            if table is None:
+                continue
+
+            for i in range(0, table.num_rows, chunk_size):
+                yield table.slice(i, chunk_size)
+
+    def load_bar_data(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        interval: Interval,
+        start: datetime,
+        end: datetime
+    ) -> List[BarData]:
+        """读取K线数据"""
+        self.flush()
+
+        table: pa.Table = self.read_table(self.get_bar_folder(symbol, exchange, interval), start, end)
+        if table is None:
+            return []
+        return to_bar_list(table, symbol, exchange, interval)
+
+    def load_tick_data(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        start: datetime,
+        end: datetime
+    ) -> List[TickData]:
+        """读取TICK数据"""
+        self.flush()
+
+        table: pa.Table = self.read_table(self.get_tick_folder(symbol, exchange), start, end)
+        if table is None:
+            return []
+        return to_tick_list(table, symbol, exchange)
+
+    def iter_bar_data(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        interval: Interval,
+        start: datetime,
+        end: datetime,
+        chunk_size: int = 10_000
+    ) -> Iterator[List[BarData]]:
+        """逐块读取K线数据，每次只读取一个月份分区，每块最多chunk_size条"""
+        self.flush()
+
+        folder: Path = self.get_bar_folder(symbol, exchange, interval)
+        for table in self.iter_table(folder, start, end, chunk_size):
+            yield to_bar_list(table, symbol, exchange, interval)
+
+    def iter_tick_data(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        start: datetime,
+        end: datetime,
+        chunk_size: int = 10_000
+    ) -> Iterator[List[TickData]]:
+        """逐块读取TICK数据，每次只读取一个月份分区，每块最多chunk_size条"""
+        self.flush()
+
+        folder: Path = self.get_tick_folder(symbol, exchange)
+        for table in self.iter_table(folder, start, end, chunk_size):
+            yield to_tick_list(table, symbol, exchange)
+
+    def load_bar_arrays(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        interval: Interval,
+        start: datetime,
+        end: datetime
+    ) -> np.ndarray:
+        """读取K线数据，直接从列数据生成BAR_DTYPE结构化数组"""
+        self.flush()
+
+        table: pa.Table = self.read_table(self.get_bar_folder(symbol, exchange, interval), start, end)
+        if table is None:
+            return np.empty(0, dtype=BAR_DTYPE)
+        return to_array(table, BAR_DTYPE)
+
+    def load_tick_arrays(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        start: datetime,
+        end: datetime
+    ) -> np.ndarray:
+        """读取TICK数据，直接从列数据生成TICK_DTYPE结构化数组"""
+        self.flush()
+
+        table: pa.Table = self.read_table(self.get_tick_folder(symbol, exchange), start, end)
+        if table is None:
+            return np.empty(0, dtype=TICK_DTYPE)
+        return to_array(table, TICK_DTYPE)
+
+    def delete_bar_data(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        interval: Interval
+    ) -> int:
+        """删除K线数据"""
+        self.flush()
+
+        folder: Path = self.get_bar_folder(symbol, exchange, interval)
+        count: int = read_overview(folder)[0]
+
+        if folder.exists():
+            shutil.rmtree(folder)
+        return count
+
+    def delete_tick_data(
+        self,
+        symbol: str,
+        exchange: Exchange
+    ) -> int:
+        """删除TICK数据"""
+        self.flush()
+
+        folder: Path = self.get_tick_folder(symbol, exchange)
+        count: int = read_overview(folder)[0]
+
+        if folder.exists():
+            shutil.rmtree(folder)
+        return count
+
+    def get_bar_overview(self) -> List[BarOverview]:
+        """查询数据库中的K线汇总信息，数量和起止时间来自文件元数据"""
+        self.flush()
+
+        overviews: List[BarOverview] = []
+
+        for contract_folder in sorted(self.folder.glob("bar/*")):
+            symbol, exchange = contract_folder.name.rsplit(".", 1)
+
+            for folder in sorted(contract_folder.iterdir()):
+                count, start, end = read_overview(folder)
+                if not count:
+                    continue
+
+                overview: BarOverview = BarOverview(
+                    symbol=symbol,
+                    exchange=Exchange(exchange),
+                    interval=Interval(folder.name),
+                    count=count,
+                    start=start,
+                    end=end
+                )
+                overviews.append(overview)
+
+        return overviews
+
+    def get_tick_overview(self) -> List[TickOverview]:
+        """查询数据库中的Tick汇总信息，数量和起止时间来自文件元数据"""
+        self.flush()
+
+        overviews: List[TickOverview] = []
+
+        for folder in sorted(self.folder.glob("tick/*")):
+            count, start, end = read_overview(folder)
+            if not count:
+                continue
+
+            symbol, exchange = folder.name.rsplit(".", 1)
+            overview: TickOverview = TickOverview(
+                symbol=symbol,
+                exchange=Exchange(exchange),
+                count=count,
+                start=start,
+                end=end
+            )
+            overviews.append(overview)
+
+        return overviews
+
@@ -1,98 +1,183 @@
 # flake8: noqa
+import subprocess
+import sys
+from argparse import ArgumentParser
+from collections import defaultdict
+from functools import partial
+from importlib import import_module
+from importlib.util import find_spec
+from pathlib import Path
+
 from vnpy.event import EventEngine
 
+from vnpy.trader.constant import Exchange
 from vnpy.trader.engine import MainEngine
-from vnpy.trader.ui import MainWindow, create_qapp
-
-# from vnpy_ctp import CtpGateway
-# from vnpy_ctptest import CtptestGateway
-# from vnpy_mini import MiniGateway
-# from vnpy_femas import FemasGateway
-# from vnpy_sopt import SoptGateway
-# from vnpy_sec import SecGateway
-# from vnpy_uft import UftGateway
-# from vnpy_esunny import EsunnyGateway
-# from vnpy_xtp import XtpGateway
-# from vnpy_tora import ToraStockGateway
-# from vnpy_tora import ToraOptionGateway
-# from vnpy_comstar import ComstarGateway
-# from vnpy_ib import IbGateway
-# from vnpy_tap import TapGateway
-# from vnpy_da import DaGateway
-# from vnpy_rohon import RohonGateway
-# from vnpy_tts import TtsGateway
-# from vnpy_ost import OstGateway
-# from vnpy_hft import GtjaGateway
-
-from vnpy_ctastrategy import CtaStrategyApp
-from vnpy_ctabacktester import CtaBacktesterApp
-from vnpy_spreadtrading import SpreadTradingApp
-from vnpy_algotrading import AlgoTradingApp
-from vnpy_optionmaster import OptionMasterApp
-from vnpy_portfoliostrategy import PortfolioStrategyApp
-from vnpy_scripttrader import ScriptTraderApp
-from vnpy_chartwizard import ChartWizardApp
-from vnpy_rpcservice import RpcServiceApp
-from vnpy_excelrtd import ExcelRtdApp
-from vnpy_datamanager import DataManagerApp
-from vnpy_datarecorder import DataRecorderApp
-from vnpy_riskmanager import RiskManagerApp
-from vnpy_webtrader import WebTraderApp
-from vnpy_portfoliomanager import PortfolioManagerApp
-from vnpy_paperaccount import PaperAccountApp
+from vnpy.trader.ui import MainWindow, QtWidgets, create_qapp
+
+
+FUTURES = [Exchange.CFFEX, Exchange.SHFE, Exchange.CZCE, Exchange.DCE, Exchange.INE, Exchange.GFEX]
+STOCKS = [Exchange.SSE, Exchange.SZSE]
+
+# 接口和应用只注册导入路径, 在首次使用时才导入模块并创建.
+# 接口同时给出支持的交易所, 交易界面列出交易所时无需导入接口,
+# 为None时则在列出交易所时导入
+GATEWAYS = {
+    # "CTP": ("vnpy_ctp:CtpGateway", FUTURES),
+    # "CTPTEST": ("vnpy_ctptest:CtptestGateway", FUTURES),
+    # "MINI": ("vnpy_mini:MiniGateway", FUTURES),
+    # "FEMAS": ("vnpy_femas:FemasGateway", FUTURES),
+    # "SOPT": ("vnpy_sopt:SoptGateway", STOCKS),
+    # "SEC": ("vnpy_sec:SecGateway", STOCKS),
+    # "UFT": ("vnpy_uft:UftGateway", FUTURES + STOCKS),
+    # "ESUNNY": ("vnpy_esunny:EsunnyGateway", None),
+    # "XTP": ("vnpy_xtp:XtpGateway", STOCKS),
+    # "TORASTOCK": ("vnpy_tora:ToraStockGateway", STOCKS),
+    # "TORAOPTION": ("vnpy_tora:ToraOptionGateway", STOCKS),
+    # "COMSTAR": ("vnpy_comstar:ComstarGateway", None),
+    # "IB": ("vnpy_ib:IbGateway", None),
+    # "TAP": ("vnpy_tap:TapGateway", None),
+    # "DA": ("vnpy_da:DaGateway", None),
+    # "ROHON": ("vnpy_rohon:RohonGateway", FUTURES),
+    # "TTS": ("vnpy_tts:TtsGateway", FUTURES + STOCKS),
+    # "OST": ("vnpy_ost:OstGateway", STOCKS),
+    # "GTJA": ("vnpy_hft:GtjaGateway", STOCKS),
+}
+
+# 应用同时给出功能菜单中显示的名称
+APPS = {
+    "PaperAccount": ("vnpy_paperaccount:PaperAccountApp", "模拟交易"),
+    "CtaStrategy": ("vnpy_ctastrategy:CtaStrategyApp", "CTA策略"),
+    # 添加回测模块
+    "CtaBacktester": ("vnpy_ctabacktester:CtaBacktesterApp", "CTA回测"),
+    "SpreadTrading": ("vnpy_spreadtrading:SpreadTradingApp", "价差交易"),
+    "AlgoTrading": ("vnpy_algotrading:AlgoTradingApp", "算法交易"),
+    "OptionMaster": ("vnpy_optionmaster:OptionMasterApp", "期权交易"),
+    "PortfolioStrategy": ("vnpy_portfoliostrategy:PortfolioStrategyApp", "组合策略"),
+    "ScriptTrader": ("vnpy_scripttrader:ScriptTraderApp", "脚本策略"),
+    "ChartWizard": ("vnpy_chartwizard:ChartWizardApp", "K线图表"),
+    "RpcService": ("vnpy_rpcservice:RpcServiceApp", "RPC服务"),
+    "ExcelRtd": ("vnpy_excelrtd:ExcelRtdApp", "Excel RTD"),
+    "DataManager": ("vnpy_datamanager:DataManagerApp", "数据管理"),
+    "DataRecorder": ("vnpy_datarecorder:DataRecorderApp", "行情记录"),
+    "RiskManager": ("vnpy_riskmanager:RiskManagerApp", "交易风控"),
+    "WebTrader": ("vnpy_webtrader:WebTraderApp", "Web服务"),
+    "PortfolioManager": ("vnpy_portfoliomanager:PortfolioManagerApp", "投资组合"),
+}
+
+
+def find_app_icon(app_path: str) -> str:
+    """在应用包的ui目录中查找图标文件, 只定位包的路径而不导入"""
+    spec = find_spec(app_path.partition(":")[0])
+    if not spec or not spec.submodule_search_locations:
+        return ""
+
+    for folder in spec.submodule_search_locations:
+        for icon_path in Path(folder, "ui").glob("*.ico"):
+            return str(icon_path)
+    return ""
+
+
+class LazyMainWindow(MainWindow):
+    """功能菜单中尚未加载的应用, 在首次打开时才导入模块并创建"""
+
+    def init_menu(self) -> None:
+        """"""
+        # 父类只为已加载的应用创建菜单项, 避免导入所有应用
+        lazy_apps: dict = self.main_engine.lazy_apps
+        self.main_engine.lazy_apps = {}
+
+        try:
+            super().init_menu()
+        finally:
+            self.main_engine.lazy_apps = lazy_apps
+
+        app_menu: QtWidgets.QMenu = [
+            action.menu() for action in self.menuBar().actions() if action.text() == "功能"
+        ][0]
+
+        for app_name, app_path in lazy_apps.items():
+            display_name: str = APPS[app_name][1]
+            func = partial(self.open_lazy_app, app_name)
+            self.add_action(app_menu, display_name, find_app_icon(app_path), func, True)
+
+    def open_lazy_app(self, app_name: str) -> None:
+        """加载应用后打开其界面"""
+        app = self.main_engine.load_app(app_name)
+        if not app:
+            return
+
+        ui_module = import_module(app.app_module + ".ui")
+        widget_class: QtWidgets.QWidget = getattr(ui_module, app.widget_name)
+        self.open_widget(widget_class, app.app_name)
+
+
+def report_import_time() -> None:
+    """
+    使用python -X importtime统计每个接口和应用的导入耗时(不含已由
+    vnpy.trader.ui导入的公共模块), 以及其中自身耗时最高的几个包
+    """
+    print(f"{'模块':<24}{'导入耗时':>10}{'模块数':>8}  耗时最高的包")
+
+    for path, _ in list(GATEWAYS.values()) + list(APPS.values()):
+        module_name: str = path.partition(":")[0]
+        code: str = f"import vnpy.trader.ui\nimport {module_name}"
+
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            capture_output=True,
+            text=True
+        )
+
+        if result.returncode:
+            print(f"{module_name:<24}{'导入失败':>10}")
+            continue
+
+        # 每行格式为: import time: self [us] | cumulative | imported package
+        lines: list = [
+            line.split("|")
+            for line in result.stderr.splitlines()
+            if line.startswith("import time:") and "self [us]" not in line
+        ]
+
+        # 公共模块导入完成后的行都属于该接口或应用
+        start: int = [i for i, fields in enumerate(lines) if fields[2].strip() == "vnpy.trader.ui"][-1] + 1
+        lines = lines[start:]
+
+        package_costs: dict = defaultdict(int)
+        for fields in lines:
+            package: str = fields[2].strip().split(".")[0]
+            package_costs[package] += int(fields[0].split(":")[1])
+
+        total: int = sum(package_costs.values())
+        top: list = sorted(package_costs.items(), key=lambda item: item[1], reverse=True)[:3]
+        top_text: str = ", ".join(f"{package} {cost / 1000:.0f}ms" for package, cost in top)
+
+        print(f"{module_name:<24}{total / 1000:>8.0f}ms{len(lines):>8}  {top_text}")
 
 
 def main():
     """"""
+    parser = ArgumentParser()
+    parser.add_argument("--importtime", action="store_true", help="输出接口和应用的导入耗时报告")
+    args = parser.parse_args()
+
+    if args.importtime:
+        report_import_time()
+        return
+
     qapp = create_qapp()
 
     event_engine = EventEngine()
 
     main_engine = MainEngine(event_engine)
 
-    # main_engine.add_gateway(CtpGateway)
-    # main_engine.add_gateway(CtptestGateway)
-    # main_engine.add_gateway(MiniGateway)
-    # main_engine.add_gateway(FemasGateway)
-    # main_engine.add_gateway(SoptGateway)
-    # main_engine.add_gateway(SecGateway)    
-    # main_engine.add_gateway(UftGateway)
-    # main_engine.add_gateway(EsunnyGateway)
-    # main_engine.add_gateway(XtpGateway)
-    # main_engine.add_gateway(ToraStockGateway)
-    # main_engine.add_gateway(ToraOptionGateway)
-    # main_engine.add_gateway(OesGateway)
-    # main_engine.add_gateway(ComstarGateway)
-    # main_engine.add_gateway(IbGateway)
-    # main_engine.add_gateway(TapGateway)
-    # main_engine.add_gateway(DaGateway)
-    # main_engine.add_gateway(RohonGateway)
-    # main_engine.add_gateway(TtsGateway)
-    # main_engine.add_gateway(OstGateway)
-    # main_engine.add_gateway(NhFuturesGateway)
-    # main_engine.add_gateway(NhStockGateway)
-
-    main_engine.add_app(PaperAccountApp)
-    main_engine.add_app(CtaStrategyApp)
+    for gateway_name, (gateway_path, exchanges) in GATEWAYS.items():
+        main_engine.add_lazy_gateway(gateway_path, gateway_name, exchanges)
 
-    # 添加回测模块
-    main_engine.add_app(CtaBacktesterApp)
-
-    main_engine.add_app(SpreadTradingApp)
-    main_engine.add_app(AlgoTradingApp)
-    main_engine.add_app(OptionMasterApp)
-    main_engine.add_app(PortfolioStrategyApp)
-    main_engine.add_app(ScriptTraderApp)
-    main_engine.add_app(ChartWizardApp)
-    main_engine.add_app(RpcServiceApp)
-    main_engine.add_app(ExcelRtdApp)
-    main_engine.add_app(DataManagerApp)
-    main_engine.add_app(DataRecorderApp)
-    main_engine.add_app(RiskManagerApp)
-    main_engine.add_app(WebTraderApp)
-    main_engine.add_app(PortfolioManagerApp)
-    
-    main_window = MainWindow(main_engine, event_engine)
+    for app_name, (app_path, _) in APPS.items():
+        main_engine.add_lazy_app(app_path, app_name)
+
+    main_window = LazyMainWindow(main_engine, event_engine)
     main_window.showMaximized()
 
     qapp.exec()
@@ -0,0 +1,676 @@
+"""
+Cross-process event bus based on shared memory ring buffers.
+
+Gateway process publishes tick, order and trade events of its event
+engine into a broadcast ring, strategy processes subscribe the ring and
+dispatch events into their own event engine. Order requests from
+strategy processes flow back through a request ring of each subscriber.
+"""
+
+import pickle
+import sys
+from datetime import datetime
+from itertools import count
+from logging import WARNING
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from struct import Struct
+from threading import Event as Signal, Lock, Thread
+from time import monotonic, sleep
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from vnpy.event import Event, EventEngine
+from vnpy.trader.constant import Exchange
+from vnpy.trader.event import EVENT_LOG, EVENT_ORDER, EVENT_TICK, EVENT_TRADE
+from vnpy.trader.object import CancelRequest, LogData, OrderData, OrderRequest, TickData, TradeData
+from vnpy.trader.utility import ZoneInfo
+
+
+CHINA_TZ = ZoneInfo("Asia/Shanghai")       # 中国时区
+
+# Ring header: magic, capacity, slot size, write sequence, client flags,
+# read sequence (acknowledged by the only reader of request ring)
+RING_MAGIC: bytes = b"VNSHMBUS"
+MAX_CLIENTS: int = 16
+HEADER: Struct = Struct(f"<8sIIQ{MAX_CLIENTS}sQ")
+HEADER_SIZE: int = 64
+SEQUENCE: Struct = Struct("<Q")
+SEQUENCE_OFFSET: int = 16
+CLIENTS_OFFSET: int = 24
+ACK_OFFSET: int = 24 + MAX_CLIENTS
+
+# Slot header: sequence, record kind, payload size
+SLOT: Struct = Struct("<QHH")
+
+# Record kinds
+KIND_TICK: int = 1
+KIND_ORDER: int = 2
+KIND_TRADE: int = 3
+KIND_REPLY: int = 4
+KIND_SEND_ORDER: int = 11
+KIND_CANCEL_ORDER: int = 12
+
+# Fixed layout of tick record: symbol, exchange, gateway name, name
+# (UTF-8, truncated to 64 bytes), datetime/localtime (microseconds
+# since epoch), 31 float fields
+TICK_FLOAT_FIELDS: List[str] = [
+    "volume", "turnover", "open_interest", "last_price", "last_volume",
+    "limit_up", "limit_down", "open_price", "high_price", "low_price", "pre_close",
+    "bid_price_1", "bid_price_2", "bid_price_3", "bid_price_4", "bid_price_5",
+    "ask_price_1", "ask_price_2", "ask_price_3", "ask_price_4", "ask_price_5",
+    "bid_volume_1", "bid_volume_2", "bid_volume_3", "bid_volume_4", "bid_volume_5",
+    "ask_volume_1", "ask_volume_2", "ask_volume_3", "ask_volume_4", "ask_volume_5",
+]
+TICK_RECORD: Struct = Struct(f"<32s16s16s64sqq{len(TICK_FLOAT_FIELDS)}d")
+
+
+class ShmRing:
+    """
+    Ring of fixed size slots in shared memory, written by one producer
+    and read by any number of readers, each keeping its own cursor.
+
+    Producer never waits for readers: a reader falling behind by more
+    than capacity loses the records overwritten, which is detected by
+    sequence number of slot (seqlock) and counted by the reader.
+
+    A ring with only one reader (request ring) can use flow control
+    instead: the reader acknowledges sequence read with set_ack, and
+    producer checks is_full before writing, so no record is lost.
+    """
+
+    def __init__(self, memory: SharedMemory, owner: bool) -> None:
+        """
+        Use ShmRing.create or ShmRing.attach instead.
+        """
+        self.memory: SharedMemory = memory
+        self.owner: bool = owner
+        self.buffer: memoryview = memory.buf
+
+        magic, self.capacity, self.slot_size, _, _, _ = HEADER.unpack_from(self.buffer, 0)
+        if magic != RING_MAGIC:
+            raise ValueError(f"不支持的共享内存：{memory.name}")
+
+        self.payload_size: int = self.slot_size - SLOT.size
+        self.sequence: int = SEQUENCE.unpack_from(self.buffer, SEQUENCE_OFFSET)[0]
+
+    @classmethod
+    def create(cls, name: str, capacity: int = 16384, slot_size: int = 1024) -> "ShmRing":
+        """
+        Create ring in a new shared memory block.
+        """
+        memory: SharedMemory = SharedMemory(name, create=True, size=HEADER_SIZE + capacity * slot_size)
+        HEADER.pack_into(memory.buf, 0, RING_MAGIC, capacity, slot_size, 0, bytes(MAX_CLIENTS), 0)
+        return cls(memory, True)
+
+    @classmethod
+    def attach(cls, name: str) -> "ShmRing":
+        """
+        Map ring created by another process.
+        """
+        return cls(attach_memory(name), False)
+
+    def close(self) -> None:
+        """
+        Unmap ring, and remove it if created by this process.
+        """
+        self.buffer = None
+        self.memory.close()
+
+        if self.owner:
+            self.memory.unlink()
+
+    def reserve(self) -> int:
+        """
+        Mark next slot as being written and return payload offset,
+        payload is then written in place and published by commit.
+        """
+        offset: int = HEADER_SIZE + (self.sequence + 1) % self.capacity * self.slot_size
+        SLOT.pack_into(self.buffer, offset, 0, 0, 0)
+        return offset + SLOT.size
+
+    def commit(self, kind: int, size: int) -> None:
+        """
+        Publish the slot reserved.
+        """
+        self.sequence += 1
+        offset: int = HEADER_SIZE + self.sequence % self.capacity * self.slot_size
+
+        SLOT.pack_into(self.buffer, offset, self.sequence, kind, size)
+        SEQUENCE.pack_into(self.buffer, SEQUENCE_OFFSET, self.sequence)
+
+    def write(self, kind: int, data: bytes) -> None:
+        """
+        Copy data into next slot and publish it.
+        """
+        if len(data) > self.payload_size:
+            raise ValueError(f"记录长度{len(data)}超过共享内存槽位大小{self.payload_size}")
+
+        offset: int = self.reserve()
+        self.buffer[offset:offset + len(data)] = data
+        self.commit(kind, len(data))
+
+    def write_struct(self, kind: int, record: Struct, *values: Any) -> None:
+        """
+        Pack values directly into next slot and publish it.
+        """
+        offset: int = self.reserve()
+        record.pack_into(self.buffer, offset, *values)
+        self.commit(kind, record.size)
+
+    def get_sequence(self) -> int:
+        """
+        Get sequence of the last record published.
+        """
+        return SEQUENCE.unpack_from(self.buffer, SEQUENCE_OFFSET)[0]
+
+    def set_ack(self, sequence: int) -> None:
+        """
+        Acknowledge records read up to sequence, freeing their slots.
+        """
+        SEQUENCE.pack_into(self.buffer, ACK_OFFSET, sequence)
+
+    def is_full(self) -> bool:
+        """
+        Check if all slots are holding records not acknowledged yet.
+        """
+        return self.sequence - SEQUENCE.unpack_from(self.buffer, ACK_OFFSET)[0] >= self.capacity
+
+    def set_client(self, client_id: int, active: bool) -> None:
+        """
+        Set active flag of client in header.
+        """
+        self.buffer[CLIENTS_OFFSET + client_id] = int(active)
+
+    def get_clients(self) -> List[int]:
+        """
+        Get id of clients active.
+        """
+        flags: bytes = bytes(self.buffer[CLIENTS_OFFSET:CLIENTS_OFFSET + MAX_CLIENTS])
+        return [i for i, flag in enumerate(flags) if flag]
+
+
+class ShmRingReader:
+    """
+    Reads records of ring after cursor, which is the last record
+    published when reader created by default.
+    """
+
+    def __init__(self, ring: ShmRing, cursor: int = None) -> None:
+        """"""
+        self.ring: ShmRing = ring
+        self.lost: int = 0
+
+        if cursor is None:
+            self.cursor: int = ring.get_sequence()
+        else:
+            self.cursor: int = cursor
+
+    def read(self, decode: Callable[[int, memoryview, int, int], Any]) -> List[Tuple[int, Any]]:
+        """
+        Return (kind, value) of new records, value is decoded by
+        decode(kind, buffer, offset, size) in place from shared memory.
+
+        Value is discarded if the slot is overwritten by producer during
+        decoding, so decode should copy what it needs out of buffer.
+        """
+        ring: ShmRing = self.ring
+        buffer: memoryview = ring.buffer
+        last: int = ring.get_sequence()
+        records: List[Tuple[int, Any]] = []
+
+        # Skip records already overwritten
+        if last - self.cursor > ring.capacity:
+            self.lost += last - self.cursor - ring.capacity
+            self.cursor = last - ring.capacity
+
+        while self.cursor < last:
+            sequence: int = self.cursor + 1
+            offset: int = HEADER_SIZE + sequence % ring.capacity * ring.slot_size
+
+            slot_sequence, kind, size = SLOT.unpack_from(buffer, offset)
+            if slot_sequence == sequence:
+                value: Any = decode(kind, buffer, offset + SLOT.size, size)
+
+                # Check again in case slot overwritten during decoding
+                if SLOT.unpack_from(buffer, offset)[0] == sequence:
+                    records.append((kind, value))
+                else:
+                    self.lost += 1
+            else:
+                self.lost += 1
+
+            self.cursor = sequence
+
+        return records
+
+
+class ShmEventPublisher:
+    """
+    Publishes tick, order and trade events of event engine (in gateway
+    process) into broadcast ring, and executes order requests from
+    subscribers with main engine.
+
+    Tick is written as fixed layout record directly into shared memory,
+    order and trade are pickled.
+    """
+
+    def __init__(
+        self,
+        event_engine: EventEngine,
+        name: str,
+        main_engine: Any = None,
+        capacity: int = 16384,
+        poll_interval: float = 0.0001
+    ) -> None:
+        """
+        main_engine (MainEngine) is used to execute order requests,
+        which are ignored if not given.
+        """
+        self.event_engine: EventEngine = event_engine
+        self.name: str = name
+        self.main_engine: Any = main_engine
+        self.capacity: int = capacity
+        self.poll_interval: float = poll_interval
+
+        self.ring: ShmRing = None
+        self.lock: Lock = Lock()
+        self.request_readers: Dict[int, ShmRingReader] = {}
+
+        self.active: bool = False
+        self.thread: Thread = Thread(target=self.run, daemon=True)
+
+    def start(self) -> None:
+        """
+        Create broadcast ring and start publishing events.
+        """
+        self.ring = ShmRing.create(self.name, self.capacity)
+
+        self.event_engine.register(EVENT_TICK, self.process_tick_event)
+        self.event_engine.register(EVENT_ORDER, self.process_order_event)
+        self.event_engine.register(EVENT_TRADE, self.process_trade_event)
+
+        self.active = True
+        self.thread.start()
+
+    def close(self) -> None:
+        """
+        Stop publishing and remove broadcast ring.
+        """
+        if not self.active:
+            return
+
+        self.event_engine.unregister(EVENT_TICK, self.process_tick_event)
+        self.event_engine.unregister(EVENT_ORDER, self.process_order_event)
+        self.event_engine.unregister(EVENT_TRADE, self.process_trade_event)
+
+        self.active = False
+        self.thread.join()
+
+        for reader in self.request_readers.values():
+            reader.ring.close()
+        self.ring.close()
+
+    def process_tick_event(self, event: Event) -> None:
+        """"""
+        tick: TickData = event.data
+
+        with self.lock:
+            self.ring.write_struct(KIND_TICK, TICK_RECORD, *pack_tick(tick))
+
+    def process_order_event(self, event: Event) -> None:
+        """"""
+        self.publish(KIND_ORDER, event.data)
+
+    def process_trade_event(self, event: Event) -> None:
+        """"""
+        self.publish(KIND_TRADE, event.data)
+
+    def publish(self, kind: int, data: Any) -> None:
+        """
+        Pickle data into broadcast ring.
+        """
+        data_bytes: bytes = pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+
+        with self.lock:
+            self.ring.write(kind, data_bytes)
+
+    def run(self) -> None:
+        """
+        Attach request rings of clients and execute requests.
+        """
+        while self.active:
+            self.check_clients()
+
+            read_count: int = 0
+            for reader in list(self.request_readers.values()):
+                records: List[Tuple[int, Any]] = reader.read(decode_record)
+                read_count += len(records)
+                reader.ring.set_ack(reader.cursor)
+
+                for kind, data in records:
+                    self.process_request(kind, pickle.loads(data))
+
+            if not read_count:
+                sleep(self.poll_interval)
+
+    def check_clients(self) -> None:
+        """
+        Attach request rings of new clients, and close those of clients
+        already left.
+        """
+        clients: List[int] = self.ring.get_clients()
+
+        for client_id in clients:
+            if client_id not in self.request_readers:
+                try:
+                    ring: ShmRing = ShmRing.attach(get_request_ring_name(self.name, client_id))
+                except FileNotFoundError:
+                    continue
+
+                # Read from start, requests may be sent before attached
+                self.request_readers[client_id] = ShmRingReader(ring, 0)
+
+        for client_id in list(self.request_readers):
+            if client_id not in clients:
+                reader: ShmRingReader = self.request_readers.pop(client_id)
+                reader.ring.close()
+
+    def process_request(self, kind: int, request: tuple) -> None:
+        """
+        Execute order request and reply vt_orderid of new order.
+        """
+        client_id, request_id, req, gateway_name = request
+
+        if not self.main_engine:
+            return
+
+        if kind == KIND_SEND_ORDER:
+            vt_orderid: str = self.main_engine.send_order(req, gateway_name)
+            self.publish(KIND_REPLY, (client_id, request_id, vt_orderid))
+        elif kind == KIND_CANCEL_ORDER:
+            self.main_engine.cancel_order(req, gateway_name)
+
+
+class ShmEventSubscriber:
+    """
+    Maps broadcast ring of publisher and puts tick, order and trade
+    events into event engine of this process (with same event types
+    as gateway), and sends order requests back through request ring.
+
+    Each subscriber process uses an unique client_id (0-15).
+
+    Requests are never overwritten in request ring: if publisher has not
+    read capacity requests yet, new request is refused with a warning log
+    event (send_order returns empty string, cancel_order returns False).
+
+    Publisher never waits for subscribers, so a subscriber falling
+    behind by more than capacity of broadcast ring loses the records
+    overwritten, which may include orders and trades (kind of lost
+    record is unknown). When records are lost, a warning log event is
+    put into event engine (at most once per lost_log_interval seconds)
+    and the total is available from get_lost_count, then order and
+    trade status should be queried from gateway again.
+    """
+
+    def __init__(
+        self,
+        event_engine: EventEngine,
+        name: str,
+        client_id: int,
+        capacity: int = 1024,
+        poll_interval: float = 0.0001
+    ) -> None:
+        """
+        Broadcast ring is polled every poll_interval seconds when idle,
+        0 means yielding only (lowest latency with one CPU core busy).
+        """
+        if not 0 <= client_id < MAX_CLIENTS:
+            raise ValueError(f"client_id超出范围：{client_id}")
+
+        self.event_engine: EventEngine = event_engine
+        self.name: str = name
+        self.client_id: int = client_id
+        self.capacity: int = capacity
+        self.poll_interval: float = poll_interval
+
+        self.ring: ShmRing = None
+        self.reader: ShmRingReader = None
+        self.request_ring: ShmRing = None
+        self.request_lock: Lock = Lock()
+
+        self.request_ids: count = count(1)
+        self.replies: Dict[int, Tuple[Signal, list]] = {}
+
+        self.lost_log_interval: float = 1
+        self.lost_logged: int = 0
+        self.lost_log_time: float = 0
+
+        self.active: bool = False
+        self.thread: Thread = Thread(target=self.run, daemon=True)
+
+    def start(self) -> None:
+        """
+        Map broadcast ring, create request ring and start dispatching.
+        """
+        self.ring = ShmRing.attach(self.name)
+        self.reader = ShmRingReader(self.ring)
+
+        request_name: str = get_request_ring_name(self.name, self.client_id)
+        self.request_ring = ShmRing.create(request_name, self.capacity)
+        self.ring.set_client(self.client_id, True)
+
+        self.active = True
+        self.thread.start()
+
+    def close(self) -> None:
+        """
+        Stop dispatching and remove request ring.
+        """
+        if not self.active:
+            return
+
+        self.active = False
+        self.thread.join()
+
+        self.ring.set_client(self.client_id, False)
+        self.request_ring.close()
+        self.ring.close()
+
+    def run(self) -> None:
+        """
+        Poll broadcast ring and dispatch records.
+        """
+        while self.active:
+            records: List[Tuple[int, Any]] = self.reader.read(decode_record)
+
+            for kind, value in records:
+                self.process_record(kind, value)
+
+            if self.reader.lost > self.lost_logged:
+                self.check_lost()
+
+            if not records:
+                sleep(self.poll_interval)
+
+    def check_lost(self) -> None:
+        """
+        Put warning log of records lost since last one.
+        """
+        now: float = monotonic()
+        if now < self.lost_log_time:
+            return
+        self.lost_log_time = now + self.lost_log_interval
+
+        lost: int = self.reader.lost - self.lost_logged
+        self.lost_logged = self.reader.lost
+
+        self.write_log(f"共享内存事件订阅落后，丢失记录{lost}条（累计{self.lost_logged}条），可能包含委托和成交，请重新查询")
+
+    def write_log(self, msg: str) -> None:
+        """
+        Put warning log event into event engine.
+        """
+        log: LogData = LogData(msg=msg, gateway_name=self.name, level=WARNING)
+        self.event_engine.put(Event(EVENT_LOG, log))
+
+    def process_record(self, kind: int, value: Any) -> None:
+        """
+        Convert record into data and put event into event engine.
+        """
+        if kind == KIND_TICK:
+            tick: TickData = unpack_tick(value)
+            self.event_engine.put(Event(EVENT_TICK, tick))
+            self.event_engine.put(Event(EVENT_TICK + tick.vt_symbol, tick))
+            return
+
+        data: Any = pickle.loads(value)
+
+        if kind == KIND_ORDER:
+            order: OrderData = data
+            self.event_engine.put(Event(EVENT_ORDER, order))
+            self.event_engine.put(Event(EVENT_ORDER + order.vt_orderid, order))
+        elif kind == KIND_TRADE:
+            trade: TradeData = data
+            self.event_engine.put(Event(EVENT_TRADE, trade))
+            self.event_engine.put(Event(EVENT_TRADE + trade.vt_symbol, trade))
+        elif kind == KIND_REPLY:
+            client_id, request_id, vt_orderid = data
+            if client_id == self.client_id:
+                self.process_reply(request_id, vt_orderid)
+
+    def process_reply(self, request_id: int, vt_orderid: str) -> None:
+        """"""
+        reply: Optional[Tuple[Signal, list]] = self.replies.get(request_id, None)
+        if reply:
+            signal, result = reply
+            result.append(vt_orderid)
+            signal.set()
+
+    def send_order(self, req: OrderRequest, gateway_name: str, timeout: float = 1) -> str:
+        """
+        Send order request to gateway process and wait for vt_orderid,
+        empty string is returned if no reply in timeout.
+        """
+        request_id: int = next(self.request_ids)
+        signal: Signal = Signal()
+        result: list = []
+        self.replies[request_id] = (signal, result)
+
+        if not self.send_request(KIND_SEND_ORDER, request_id, req, gateway_name):
+            self.replies.pop(request_id, None)
+            self.write_log(f"共享内存请求队列已满，委托请求被拒绝：{req.vt_symbol}")
+            return ""
+
+        signal.wait(timeout)
+
+        self.replies.pop(request_id, None)
+        return result[0] if result else ""
+
+    def cancel_order(self, req: CancelRequest, gateway_name: str) -> bool:
+        """
+        Send cancel request to gateway process, return False if refused.
+        """
+        request_id: int = next(self.request_ids)
+
+        if not self.send_request(KIND_CANCEL_ORDER, request_id, req, gateway_name):
+            self.write_log(f"共享内存请求队列已满，撤单请求被拒绝：{req.orderid}")
+            return False
+        return True
+
+    def send_request(self, kind: int, request_id: int, req: Any, gateway_name: str) -> bool:
+        """
+        Pickle request into request ring, return False if ring is full.
+        """
+        data: bytes = pickle.dumps(
+            (self.client_id, request_id, req, gateway_name),
+            pickle.HIGHEST_PROTOCOL
+        )
+
+        with self.request_lock:
+            if self.request_ring.is_full():
+                return False
+
+            self.request_ring.write(kind, data)
+            return True
+
+    def get_lost_count(self) -> int:
+        """
+        Get number of records lost for falling behind publisher.
+        """
+        return self.reader.lost
+
+
+def attach_memory(name: str) -> SharedMemory:
+    """
+    Map existing shared memory without tracking it, so that it is not
+    removed when this process exits (only creator process removes it).
+    """
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name, track=False)
+
+    # Before 3.13 memory attached is also tracked on posix (bpo-39959)
+    register: Callable = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return SharedMemory(name)
+    finally:
+        resource_tracker.register = register
+
+
+def get_request_ring_name(name: str, client_id: int) -> str:
+    """
+    Get shared memory name of request ring of client.
+    """
+    return f"{name}_{client_id}"
+
+
+def decode_record(kind: int, buffer: memoryview, offset: int, size: int) -> Any:
+    """
+    Unpack tick record directly from shared memory into values, and copy
+    payload of other records for unpickling.
+    """
+    if kind == KIND_TICK:
+        return TICK_RECORD.unpack_from(buffer, offset)
+    else:
+        return bytes(buffer[offset:offset + size])
+
+
+def pack_tick(tick: TickData) -> tuple:
+    """
+    Convert tick into values of fixed layout record.
+    """
+    if tick.localtime:
+        localtime: int = int(tick.localtime.timestamp() * 1_000_000)
+    else:
+        localtime: int = 0
+
+    return (
+        tick.symbol.encode(),
+        tick.exchange.value.encode(),
+        tick.gateway_name.encode(),
+        tick.name.encode(),
+        int(tick.datetime.timestamp() * 1_000_000),
+        localtime,
+        *[getattr(tick, name) for name in TICK_FLOAT_FIELDS]
+    )
+
+
+def unpack_tick(values: tuple) -> TickData:
+    """
+    Convert values of fixed layout record into tick.
+    """
+    symbol, exchange, gateway_name, name, dt, localtime = values[:6]
+
+    tick: TickData = TickData(
+        symbol=symbol.rstrip(b"\0").decode(),
+        exchange=Exchange(exchange.rstrip(b"\0").decode()),
+        datetime=datetime.fromtimestamp(dt / 1_000_000, CHINA_TZ),
+        gateway_name=gateway_name.rstrip(b"\0").decode(),
+        name=name.rstrip(b"\0").decode(errors="ignore"),
+        **dict(zip(TICK_FLOAT_FIELDS, values[6:]))
+    )
+
+    if localtime:
+        tick.localtime = datetime.fromtimestamp(localtime / 1_000_000)
+
+    return tick
@@ -1,6 +1,8 @@
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List
+from typing import Iterable, Iterator, List, Set, Tuple
 
+import numpy as np
 from peewee import (
     AutoField,
     CharField,
@@ -20,7 +22,9 @@ from vnpy.trader.utility import get_file_path
 from vnpy.trader.database import (
     BaseDatabase,
     BarOverview,
+    BAR_DTYPE,
     DB_TZ,
+    TICK_DTYPE,
     TickOverview,
     convert_tz
 )
@@ -140,15 +144,322 @@ class DbTickOverview(Model):
         indexes: tuple = ((("symbol", "exchange"), True),)
 
 
+# 批量写入使用的SQL语句和字段
+BAR_FIELDS: List[str] = [
+    "symbol", "exchange", "datetime", "interval",
+    "volume", "turnover", "open_interest",
+    "open_price", "high_price", "low_price", "close_price"
+]
+
+TICK_FIELDS: List[str] = [
+    "symbol", "exchange", "datetime",
+    "name", "volume", "turnover", "open_interest",
+    "last_price", "last_volume", "limit_up", "limit_down",
+    "open_price", "high_price", "low_price", "pre_close",
+    "bid_price_1", "bid_price_2", "bid_price_3", "bid_price_4", "bid_price_5",
+    "ask_price_1", "ask_price_2", "ask_price_3", "ask_price_4", "ask_price_5",
+    "bid_volume_1", "bid_volume_2", "bid_volume_3", "bid_volume_4", "bid_volume_5",
+    "ask_volume_1", "ask_volume_2", "ask_volume_3", "ask_volume_4", "ask_volume_5",
+    "localtime"
+]
+
+
+def get_insert_sql(model: Model, fields: List[str]) -> str:
+    """生成upsert语句"""
+    columns: str = ", ".join(f'"{field}"' for field in fields)
+    values: str = ", ".join("?" for _ in fields)
+    return f'INSERT OR REPLACE INTO "{model._meta.table_name}" ({columns}) VALUES ({values})'
+
+
+BAR_INSERT_SQL: str = get_insert_sql(DbBarData, BAR_FIELDS)
+TICK_INSERT_SQL: str = get_insert_sql(DbTickData, TICK_FIELDS)
+
+
+def to_bar_row(bar: BarData) -> tuple:
+    """将BarData转换为数据库中一行数据，不修改原对象"""
+    return (
+        bar.symbol,
+        bar.exchange.value,
+        str(convert_tz(bar.datetime)),
+        bar.interval.value,
+        bar.volume,
+        bar.turnover,
+        bar.open_interest,
+        bar.open_price,
+        bar.high_price,
+        bar.low_price,
+        bar.close_price
+    )
+
+
+def to_tick_row(tick: TickData) -> tuple:
+    """将TickData转换为数据库中一行数据，不修改原对象"""
+    return (
+        tick.symbol,
+        tick.exchange.value,
+        str(convert_tz(tick.datetime)),
+        tick.name,
+        tick.volume,
+        tick.turnover,
+        tick.open_interest,
+        tick.last_price,
+        tick.last_volume,
+        tick.limit_up,
+        tick.limit_down,
+        tick.open_price,
+        tick.high_price,
+        tick.low_price,
+        tick.pre_close,
+        tick.bid_price_1,
+        tick.bid_price_2,
+        tick.bid_price_3,
+        tick.bid_price_4,
+        tick.bid_price_5,
+        tick.ask_price_1,
+        tick.ask_price_2,
+        tick.ask_price_3,
+        tick.ask_price_4,
+        tick.ask_price_5,
+        tick.bid_volume_1,
+        tick.bid_volume_2,
+        tick.bid_volume_3,
+        tick.bid_volume_4,
+        tick.bid_volume_5,
+        tick.ask_volume_1,
+        tick.ask_volume_2,
+        tick.ask_volume_3,
+        tick.ask_volume_4,
+        tick.ask_volume_5,
+        str(tick.localtime) if tick.localtime else None
+    )
+
+
+def to_bar_data(db_bar: DbBarData) -> BarData:
+    """将数据库中的K线转换为BarData"""
+    bar: BarData = BarData(
+        symbol=db_bar.symbol,
+        exchange=Exchange(db_bar.exchange),
+        datetime=datetime.fromtimestamp(db_bar.datetime.timestamp(), DB_TZ),
+        interval=Interval(db_bar.interval),
+        volume=db_bar.volume,
+        turnover=db_bar.turnover,
+        open_interest=db_bar.open_interest,
+        open_price=db_bar.open_price,
+        high_price=db_bar.high_price,
+        low_price=db_bar.low_price,
+        close_price=db_bar.close_price,
+        gateway_name="DB"
+    )
+    return bar
+
+
+def to_tick_data(db_tick: DbTickData) -> TickData:
+    """将数据库中的TICK转换为TickData"""
+    tick: TickData = TickData(
+        symbol=db_tick.symbol,
+        exchange=Exchange(db_tick.exchange),
+        datetime=datetime.fromtimestamp(db_tick.datetime.timestamp(), DB_TZ),
+        name=db_tick.name,
+        volume=db_tick.volume,
+        turnover=db_tick.turnover,
+        open_interest=db_tick.open_interest,
+        last_price=db_tick.last_price,
+        last_volume=db_tick.last_volume,
+        limit_up=db_tick.limit_up,
+        limit_down=db_tick.limit_down,
+        open_price=db_tick.open_price,
+        high_price=db_tick.high_price,
+        low_price=db_tick.low_price,
+        pre_close=db_tick.pre_close,
+        bid_price_1=db_tick.bid_price_1,
+        bid_price_2=db_tick.bid_price_2,
+        bid_price_3=db_tick.bid_price_3,
+        bid_price_4=db_tick.bid_price_4,
+        bid_price_5=db_tick.bid_price_5,
+        ask_price_1=db_tick.ask_price_1,
+        ask_price_2=db_tick.ask_price_2,
+        ask_price_3=db_tick.ask_price_3,
+        ask_price_4=db_tick.ask_price_4,
+        ask_price_5=db_tick.ask_price_5,
+        bid_volume_1=db_tick.bid_volume_1,
+        bid_volume_2=db_tick.bid_volume_2,
+        bid_volume_3=db_tick.bid_volume_3,
+        bid_volume_4=db_tick.bid_volume_4,
+        bid_volume_5=db_tick.bid_volume_5,
+        ask_volume_1=db_tick.ask_volume_1,
+        ask_volume_2=db_tick.ask_volume_2,
+        ask_volume_3=db_tick.ask_volume_3,
+        ask_volume_4=db_tick.ask_volume_4,
+        ask_volume_5=db_tick.ask_volume_5,
+        localtime=db_tick.localtime,
+        gateway_name="DB"
+    )
+    return tick
+
+
+def fetch_array(cursor, dtype: np.dtype, chunk_size: int = 100_000) -> np.ndarray:
+    """分批读取查询结果并转换为结构化数组，时间字符串由NumPy批量解析"""
+    arrays: List[np.ndarray] = []
+
+    while True:
+        rows: List[tuple] = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        arrays.append(np.array(rows, dtype=dtype))
+
+    if not arrays:
+        return np.empty(0, dtype=dtype)
+    return np.concatenate(arrays)
+
+
 class SqliteDatabase(BaseDatabase):
     """SQLite数据库接口"""
 
+    # 每次executemany写入的行数
+    chunk_size: int = 50_000
+
     def __init__(self) -> None:
         """"""
         self.db: PeeweeSqliteDatabase = db
         self.db.connect()
+        self.recover_indexes()
         self.db.create_tables([DbBarData, DbTickData, DbBarOverview, DbTickOverview])
 
+        # 批量导入时延后重建索引的数据表，以及需要重新统计汇总的合约
+        self.deferred: bool = False
+        self.deferred_models: List[Model] = []
+        self.deferred_bars: Set[Tuple[str, str, str]] = set()
+        self.deferred_ticks: Set[Tuple[str, str]] = set()
+
+    @contextmanager
+    def bulk_ingest(self, defer_index: bool = False, cache_size: int = -256_000) -> Iterator[None]:
+        """
+        批量导入模式，在with语句中调用save_bar_data/save_tick_data：
+
+        1. 使用WAL日志模式，关闭同步写盘，增大页缓存（cache_size为负数时单位为KB）
+        2. 若defer_index为True，首次写入数据表前删除其唯一索引，导入完成后删除
+           重复数据（保留最后写入的一条）并重建索引，最后重新统计相关合约的汇总数据
+
+        导入过程中如果断电可能丢失已导入的数据，完成后恢复原有设置。如果进程在
+        重建索引前退出，下次创建SqliteDatabase时会删除重复数据并重建索引
+        """
+        journal_mode: str = self.db.pragma("journal_mode")
+        synchronous: int = self.db.pragma("synchronous")
+        old_cache_size: int = self.db.pragma("cache_size")
+
+        self.db.pragma("journal_mode", "wal")
+        self.db.pragma("synchronous", 0)
+        self.db.pragma("cache_size", cache_size)
+
+        self.deferred = defer_index
+
+        try:
+            yield
+        finally:
+            if defer_index:
+                self.rebuild_indexes()
+
+            self.db.pragma("journal_mode", journal_mode)
+            self.db.pragma("synchronous", synchronous)
+            self.db.pragma("cache_size", old_cache_size)
+
+    def defer_indexes(self, model: Model) -> None:
+        """删除数据表上的索引，在导入完成后重建"""
+        if model in self.deferred_models:
+            return
+        self.deferred_models.append(model)
+
+        cursor = self.db.execute_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (model._meta.table_name,)
+        )
+        for (name,) in cursor.fetchall():
+            self.db.execute_sql(f'DROP INDEX "{name}"')
+
+    def rebuild_indexes(self) -> None:
+        """删除重复数据，重建索引并更新汇总数据"""
+        self.deferred = False
+
+        for model in self.deferred_models:
+            self.create_indexes(model)
+        self.deferred_models.clear()
+
+        for overview in self.deferred_bars:
+            self.recount_bar_overview(*overview)
+
+        for overview in self.deferred_ticks:
+            self.recount_tick_overview(*overview)
+
+        self.deferred_bars.clear()
+        self.deferred_ticks.clear()
+
+    def recover_indexes(self) -> None:
+        """
+        上次批量导入在重建索引前中断时，数据表的唯一索引已被删除，且可能
+        写入了重复数据：删除重复数据后重建索引，并重新统计全部汇总数据
+        """
+        for model in [DbBarData, DbTickData]:
+            if not model.table_exists():
+                continue
+
+            table: str = model._meta.table_name
+            if any(index.unique for index in self.db.get_indexes(table)):
+                continue
+
+            self.create_indexes(model)
+
+            if model is DbBarData:
+                for overview in DbBarOverview.select():
+                    self.recount_bar_overview(overview.symbol, overview.exchange, overview.interval)
+            else:
+                for overview in DbTickOverview.select():
+                    self.recount_tick_overview(overview.symbol, overview.exchange)
+
+    def create_indexes(self, model: Model) -> None:
+        """删除重复数据（保留最后写入的一条）后创建唯一索引"""
+        table: str = model._meta.table_name
+        keys: str = ", ".join(model._meta.indexes[0][0])
+
+        with self.db.atomic():
+            self.db.execute_sql(
+                f'DELETE FROM "{table}" WHERE id NOT IN (SELECT MAX(id) FROM "{table}" GROUP BY {keys})'
+            )
+            model._schema.create_indexes()
+
+    def recount_bar_overview(self, symbol: str, exchange: str, interval: str) -> None:
+        """重新统计K线汇总的数据量"""
+        overview: DbBarOverview = DbBarOverview.get(
+            DbBarOverview.symbol == symbol,
+            DbBarOverview.exchange == exchange,
+            DbBarOverview.interval == interval,
+        )
+        overview.count = DbBarData.select().where(
+            (DbBarData.symbol == symbol)
+            & (DbBarData.exchange == exchange)
+            & (DbBarData.interval == interval)
+        ).count()
+        overview.save()
+
+    def recount_tick_overview(self, symbol: str, exchange: str) -> None:
+        """重新统计TICK汇总的数据量"""
+        overview: DbTickOverview = DbTickOverview.get(
+            DbTickOverview.symbol == symbol,
+            DbTickOverview.exchange == exchange,
+        )
+        overview.count = DbTickData.select().where(
+            (DbTickData.symbol == symbol)
+            & (DbTickData.exchange == exchange)
+        ).count()
+        overview.save()
+
+    def insert_rows(self, sql: str, rows: Iterable[tuple]) -> None:
+        """使用预编译语句分批写入数据，所有批次在同一个事务中"""
+        connection = self.db.connection()
+
+        with self.db.atomic():
+            for chunk in chunked(rows, self.chunk_size):
+                connection.executemany(sql, chunk)
+
     def save_bar_data(self, bars: List[BarData], stream: bool = False) -> bool:
         """保存K线数据"""
         # 读取主键参数
@@ -157,54 +468,59 @@ class SqliteDatabase(BaseDatabase):
         exchange: Exchange = bar.exchange
         interval: Interval = bar.interval
 
-        # 将BarData数据转换为字典，并调整时区
-        data: list = []
-
-        for bar in bars:
-            bar.datetime = convert_tz(bar.datetime)
-
-            d: dict = bar.__dict__
-            d["exchange"] = d["exchange"].value
-            d["interval"] = d["interval"].value
-            d.pop("gateway_name")
-            d.pop("vt_symbol")
-            data.append(d)
-
-        # 使用upsert操作将数据更新到数据库中
-        with self.db.atomic():
-            for c in chunked(data, 50):
-                DbBarData.insert_many(c).on_conflict_replace().execute()
+        start: datetime = convert_tz(min(bar.datetime for bar in bars))
+        end: datetime = convert_tz(max(bar.datetime for bar in bars))
 
-        # 更新K线汇总数据
         overview: DbBarOverview = DbBarOverview.get_or_none(
             DbBarOverview.symbol == symbol,
             DbBarOverview.exchange == exchange.value,
             DbBarOverview.interval == interval.value,
         )
 
-        if not overview:
-            overview = DbBarOverview()
-            overview.symbol = symbol
-            overview.exchange = exchange.value
-            overview.interval = interval.value
-            overview.start = bars[0].datetime
-            overview.end = bars[-1].datetime
-            overview.count = len(bars)
-        elif stream:
-            overview.end = bars[-1].datetime
-            overview.count += len(bars)
-        else:
-            overview.start = min(bars[0].datetime, overview.start)
-            overview.end = max(bars[-1].datetime, overview.end)
-
-            s: ModelSelect = DbBarData.select().where(
-                (DbBarData.symbol == symbol)
-                & (DbBarData.exchange == exchange.value)
-                & (DbBarData.interval == interval.value)
-            )
-            overview.count = s.count()
+        # 在一个事务中写入数据并更新汇总
+        with self.db.atomic():
+            # 统计写入时间范围内原有的数据量，用于计算新增数量
+            incremental: bool = bool(overview) and not stream and not self.deferred
+            if incremental:
+                range_select: ModelSelect = DbBarData.select().where(
+                    (DbBarData.symbol == symbol)
+                    & (DbBarData.exchange == exchange.value)
+                    & (DbBarData.interval == interval.value)
+                    & (DbBarData.datetime >= start)
+                    & (DbBarData.datetime <= end)
+                )
+                old_count: int = range_select.count()
+
+            # 使用upsert操作将数据更新到数据库中
+            if self.deferred:
+                self.defer_indexes(DbBarData)
+            self.insert_rows(BAR_INSERT_SQL, map(to_bar_row, bars))
+
+            # 更新K线汇总数据
+            if not overview:
+                overview = DbBarOverview()
+                overview.symbol = symbol
+                overview.exchange = exchange.value
+                overview.interval = interval.value
+                overview.start = start
+                overview.end = end
+                overview.count = len(bars)
+            elif stream:
+                overview.end = end
+                overview.count += len(bars)
+            elif self.deferred:
+                # 数据量在重建索引后统计
+                overview.start = min(start, overview.start)
+                overview.end = max(end, overview.end)
+            else:
+                overview.start = min(start, overview.start)
+                overview.end = max(end, overview.end)
+                overview.count += range_select.count() - old_count
 
-        overview.save()
+            overview.save()
+
+        if self.deferred:
+            self.deferred_bars.add((symbol, exchange.value, interval.value))
 
         return True
 
@@ -215,50 +531,56 @@ class SqliteDatabase(BaseDatabase):
         symbol: str = tick.symbol
         exchange: Exchange = tick.exchange
 
-        # 将TickData数据转换为字典，并调整时区
-        data: list = []
-
-        for tick in ticks:
-            tick.datetime = convert_tz(tick.datetime)
-
-            d: dict = tick.__dict__
-            d["exchange"] = d["exchange"].value
-            d.pop("gateway_name")
-            d.pop("vt_symbol")
-            data.append(d)
+        start: datetime = convert_tz(min(tick.datetime for tick in ticks))
+        end: datetime = convert_tz(max(tick.datetime for tick in ticks))
 
-        # 使用upsert操作将数据更新到数据库中
-        with self.db.atomic():
-            for c in chunked(data, 10):
-                DbTickData.insert_many(c).on_conflict_replace().execute()
-
-        # 更新Tick汇总数据
         overview: DbTickOverview = DbTickOverview.get_or_none(
             DbTickOverview.symbol == symbol,
             DbTickOverview.exchange == exchange.value,
         )
 
-        if not overview:
-            overview: DbTickOverview = DbTickOverview()
-            overview.symbol = symbol
-            overview.exchange = exchange.value
-            overview.start = ticks[0].datetime
-            overview.end = ticks[-1].datetime
-            overview.count = len(ticks)
-        elif stream:
-            overview.end = ticks[-1].datetime
-            overview.count += len(ticks)
-        else:
-            overview.start = min(ticks[0].datetime, overview.start)
-            overview.end = max(ticks[-1].datetime, overview.end)
-
-            s: ModelSelect = DbTickData.select().where(
-                (DbTickData.symbol == symbol)
-                & (DbTickData.exchange == exchange.value)
-            )
-            overview.count = s.count()
+        # 在一个事务中写入数据并更新汇总
+        with self.db.atomic():
+            # 统计写入时间范围内原有的数据量，用于计算新增数量
+            incremental: bool = bool(overview) and not stream and not self.deferred
+            if incremental:
+                range_select: ModelSelect = DbTickData.select().where(
+                    (DbTickData.symbol == symbol)
+                    & (DbTickData.exchange == exchange.value)
+                    & (DbTickData.datetime >= start)
+                    & (DbTickData.datetime <= end)
+                )
+                old_count: int = range_select.count()
+
+            # 使用upsert操作将数据更新到数据库中
+            if self.deferred:
+                self.defer_indexes(DbTickData)
+            self.insert_rows(TICK_INSERT_SQL, map(to_tick_row, ticks))
+
+            # 更新Tick汇总数据
+            if not overview:
+                overview: DbTickOverview = DbTickOverview()
+                overview.symbol = symbol
+                overview.exchange = exchange.value
+                overview.start = start
+                overview.end = end
+                overview.count = len(ticks)
+            elif stream:
+                overview.end = end
+                overview.count += len(ticks)
+            elif self.deferred:
+                # 数据量在重建索引后统计
+                overview.start = min(start, overview.start)
+                overview.end = max(end, overview.end)
+            else:
+                overview.start = min(start, overview.start)
+                overview.end = max(end, overview.end)
+                overview.count += range_select.count() - old_count
 
-        overview.save()
+            overview.save()
+
+        if self.deferred:
+            self.deferred_ticks.add((symbol, exchange.value))
 
         return True
 
@@ -281,24 +603,7 @@ class SqliteDatabase(BaseDatabase):
             ).order_by(DbBarData.datetime)
         )
 
-        bars: List[BarData] = []
-        for db_bar in s:
-            bar: BarData = BarData(
-                symbol=db_bar.symbol,
-                exchange=Exchange(db_bar.exchange),
-                datetime=datetime.fromtimestamp(db_bar.datetime.timestamp(), DB_TZ),
-                interval=Interval(db_bar.interval),
-                volume=db_bar.volume,
-                turnover=db_bar.turnover,
-                open_interest=db_bar.open_interest,
-                open_price=db_bar.open_price,
-                high_price=db_bar.high_price,
-                low_price=db_bar.low_price,
-                close_price=db_bar.close_price,
-                gateway_name="DB"
-            )
-            bars.append(bar)
-
+        bars: List[BarData] = [to_bar_data(db_bar) for db_bar in s]
         return bars
 
     def load_tick_data(
@@ -318,50 +623,113 @@ class SqliteDatabase(BaseDatabase):
             ).order_by(DbTickData.datetime)
         )
 
-        ticks: List[TickData] = []
-        for db_tick in s:
-            tick: TickData = TickData(
-                symbol=db_tick.symbol,
-                exchange=Exchange(db_tick.exchange),
-                datetime=datetime.fromtimestamp(db_tick.datetime.timestamp(), DB_TZ),
-                name=db_tick.name,
-                volume=db_tick.volume,
-                turnover=db_tick.turnover,
-                open_interest=db_tick.open_interest,
-                last_price=db_tick.last_price,
-                last_volume=db_tick.last_volume,
-                limit_up=db_tick.limit_up,
-                limit_down=db_tick.limit_down,
-                open_price=db_tick.open_price,
-                high_price=db_tick.high_price,
-                low_price=db_tick.low_price,
-                pre_close=db_tick.pre_close,
-                bid_price_1=db_tick.bid_price_1,
-                bid_price_2=db_tick.bid_price_2,
-                bid_price_3=db_tick.bid_price_3,
-                bid_price_4=db_tick.bid_price_4,
-                bid_price_5=db_tick.bid_price_5,
-                ask_price_1=db_tick.ask_price_1,
-                ask_price_2=db_tick.ask_price_2,
-                ask_price_3=db_tick.ask_price_3,
-                ask_price_4=db_tick.ask_price_4,
-                ask_price_5=db_tick.ask_price_5,
-                bid_volume_1=db_tick.bid_volume_1,
-                bid_volume_2=db_tick.bid_volume_2,
-                bid_volume_3=db_tick.bid_volume_3,
-                bid_volume_4=db_tick.bid_volume_4,
-                bid_volume_5=db_tick.bid_volume_5,
-                ask_volume_1=db_tick.ask_volume_1,
-                ask_volume_2=db_tick.ask_volume_2,
-                ask_volume_3=db_tick.ask_volume_3,
-                ask_volume_4=db_tick.ask_volume_4,
-                ask_volume_5=db_tick.ask_volume_5,
-                localtime=db_tick.localtime,
-                gateway_name="DB"
+        ticks: List[TickData] = [to_tick_data(db_tick) for db_tick in s]
+        return ticks
+
+    def iter_bar_data(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        interval: Interval,
+        start: datetime,
+        end: datetime,
+        chunk_size: int = 10_000
+    ) -> Iterator[List[BarData]]:
+        """逐块读取K线数据，基于索引按时间翻页，每块最多chunk_size条"""
+        condition = (
+            (DbBarData.symbol == symbol)
+            & (DbBarData.exchange == exchange.value)
+            & (DbBarData.interval == interval.value)
+            & (DbBarData.datetime <= end)
+        )
+        page_condition = DbBarData.datetime >= start
+
+        while True:
+            s: ModelSelect = (
+                DbBarData.select()
+                .where(condition & page_condition)
+                .order_by(DbBarData.datetime)
+                .limit(chunk_size)
             )
-            ticks.append(tick)
+            db_bars: List[DbBarData] = list(s.iterator())
+            if not db_bars:
+                return
 
-        return ticks
+            yield [to_bar_data(db_bar) for db_bar in db_bars]
+
+            if len(db_bars) < chunk_size:
+                return
+            page_condition = DbBarData.datetime > db_bars[-1].datetime
+
+    def iter_tick_data(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        start: datetime,
+        end: datetime,
+        chunk_size: int = 10_000
+    ) -> Iterator[List[TickData]]:
+        """逐块读取TICK数据，基于索引按时间翻页，每块最多chunk_size条"""
+        condition = (
+            (DbTickData.symbol == symbol)
+            & (DbTickData.exchange == exchange.value)
+            & (DbTickData.datetime <= end)
+        )
+        page_condition = DbTickData.datetime >= start
+
+        while True:
+            s: ModelSelect = (
+                DbTickData.select()
+                .where(condition & page_condition)
+                .order_by(DbTickData.datetime)
+                .limit(chunk_size)
+            )
+            db_ticks: List[DbTickData] = list(s.iterator())
+            if not db_ticks:
+                return
+
+            yield [to_tick_data(db_tick) for db_tick in db_ticks]
+
+            if len(db_ticks) < chunk_size:
+                return
+            page_condition = DbTickData.datetime > db_ticks[-1].datetime
+
+    def load_bar_arrays(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        interval: Interval,
+        start: datetime,
+        end: datetime
+    ) -> np.ndarray:
+        """读取K线数据，直接从查询结果生成BAR_DTYPE结构化数组"""
+        columns: str = ", ".join(f'"{name}"' for name in BAR_DTYPE.names)
+
+        cursor = self.db.execute_sql(
+            f'SELECT {columns} FROM "{DbBarData._meta.table_name}" '
+            "WHERE symbol = ? AND exchange = ? AND interval = ? AND datetime >= ? AND datetime <= ? "
+            "ORDER BY datetime",
+            (symbol, exchange.value, interval.value, str(start), str(end))
+        )
+        return fetch_array(cursor, BAR_DTYPE)
+
+    def load_tick_arrays(
+        self,
+        symbol: str,
+        exchange: Exchange,
+        start: datetime,
+        end: datetime
+    ) -> np.ndarray:
+        """读取TICK数据，直接从查询结果生成TICK_DTYPE结构化数组"""
+        columns: str = ", ".join(f'"{name}"' for name in TICK_DTYPE.names)
+
+        cursor = self.db.execute_sql(
+            f'SELECT {columns} FROM "{DbTickData._meta.table_name}" '
+            "WHERE symbol = ? AND exchange = ? AND datetime >= ? AND datetime <= ? "
+            "ORDER BY datetime",
+            (symbol, exchange.value, str(start), str(end))
+        )
+        return fetch_array(cursor, TICK_DTYPE)
 
     def delete_bar_data(
         self,
@@ -434,13 +802,26 @@ class SqliteDatabase(BaseDatabase):
         return overviews
 
     def init_bar_overview(self) -> None:
-        """初始化数据库中的K线汇总信息"""
+        """
+        初始化数据库中的K线汇总信息，一次分组查询得到数量和起止时间：
+        数量由分组统计得到，起止时间使用关联子查询在索引上直接定位，
+        比对每一行计算MIN/MAX更快
+        """
+        bar: Model = DbBarData.alias()
+        condition = (
+            (bar.symbol == DbBarData.symbol)
+            & (bar.exchange == DbBarData.exchange)
+            & (bar.interval == DbBarData.interval)
+        )
+
         s: ModelSelect = (
             DbBarData.select(
                 DbBarData.symbol,
                 DbBarData.exchange,
                 DbBarData.interval,
-                fn.COUNT(DbBarData.id).alias("count")
+                fn.COUNT(DbBarData.id).alias("count"),
+                bar.select(fn.MIN(bar.datetime)).where(condition).alias("start"),
+                bar.select(fn.MAX(bar.datetime)).where(condition).alias("end")
             ).group_by(
                 DbBarData.symbol,
                 DbBarData.exchange,
@@ -448,35 +829,9 @@ class SqliteDatabase(BaseDatabase):
             )
         )
 
-        for data in s:
-            overview: DbBarOverview = DbBarOverview()
-            overview.symbol = data.symbol
-            overview.exchange = data.exchange
-            overview.interval = data.interval
-            overview.count = data.count
-
-            start_bar: DbBarData = (
-                DbBarData.select()
-                .where(
-                    (DbBarData.symbol == data.symbol)
-                    & (DbBarData.exchange == data.exchange)
-                    & (DbBarData.interval == data.interval)
-                )
-                .order_by(DbBarData.datetime.asc())
-                .first()
-            )
-            overview.start = start_bar.datetime
+        data: List[dict] = list(s.dicts())
 
-            end_bar: DbBarData = (
-                DbBarData.select()
-                .where(
-                    (DbBarData.symbol == data.symbol)
-                    & (DbBarData.exchange == data.exchange)
-                    & (DbBarData.interval == data.interval)
-                )
-                .order_by(DbBarData.datetime.desc())
-                .first()
-            )
-            overview.end = end_bar.datetime
-
-            overview.save()
+        with self.db.atomic():
+            DbBarOverview.delete().execute()
+            for c in chunked(data, 100):
+                DbBarOverview.insert_many(c).execute()
@@ -1,16 +1,24 @@
 import logging
 from logging import Logger
+from logging.handlers import QueueHandler, QueueListener
 import smtplib
+import sqlite3
+import pickle
 import os
 from abc import ABC
+from collections import deque
+from copy import copy
+from dataclasses import dataclass
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
 from email.message import EmailMessage
-from queue import Empty, Queue
+from importlib import import_module
+from queue import Empty, Full, Queue
 from threading import Thread
-from typing import Any, Type, Dict, List, Optional
+from time import monotonic, sleep
+from typing import Any, Type, Deque, Dict, List, Optional, Set, Tuple
 
-from vnpy.event import Event, EventEngine
+from vnpy.event import Event, EventEngine, EVENT_TIMER
 from .app import BaseApp
 from .event import (
     EVENT_TICK,
@@ -40,8 +48,9 @@ from .object import (
     ContractData,
     Exchange
 )
+from .constant import Direction, Offset, Product
 from .setting import SETTINGS
-from .utility import get_folder_path, TRADER_DIR
+from .utility import get_file_path, get_folder_path, TRADER_DIR
 
 
 class MainEngine:
@@ -62,6 +71,13 @@ class MainEngine:
         self.apps: Dict[str, BaseApp] = {}
         self.exchanges: List[Exchange] = []
 
+        # Import paths of apps and gateways not loaded yet
+        self.lazy_apps: Dict[str, str] = {}
+        self.lazy_gateways: Dict[str, str] = {}
+
+        # Lazy gateways whose exchanges were given on registration
+        self.listed_gateways: Set[str] = set()
+
         os.chdir(TRADER_DIR)    # Change working directory
         self.init_engines()     # Initialize function engines
 
@@ -101,6 +117,58 @@ class MainEngine:
         engine: BaseEngine = self.add_engine(app.engine_class)
         return engine
 
+    def add_lazy_app(self, app_path: str, app_name: str) -> None:
+        """
+        Register app by import path like "vnpy_ctastrategy:CtaStrategyApp",
+        which is imported and added on first access of its engine.
+        """
+        self.lazy_apps[app_name] = app_path
+
+    def add_lazy_gateway(
+        self,
+        gateway_path: str,
+        gateway_name: str,
+        exchanges: List[Exchange] = None
+    ) -> None:
+        """
+        Register gateway by import path like "vnpy_ctp:CtpGateway",
+        which is imported and added on first access.
+
+        If supported exchanges are given, get_all_exchanges can list
+        them without importing the gateway.
+        """
+        self.lazy_gateways[gateway_name] = gateway_path
+
+        if exchanges is not None:
+            self.listed_gateways.add(gateway_name)
+
+            for exchange in exchanges:
+                if exchange not in self.exchanges:
+                    self.exchanges.append(exchange)
+
+    def load_app(self, app_name: str) -> Optional[BaseApp]:
+        """
+        Import and add app registered with add_lazy_app.
+        """
+        app_path: Optional[str] = self.lazy_apps.pop(app_name, None)
+        if app_path:
+            self.add_app(load_object(app_path))
+
+            if app_name not in self.apps:
+                self.write_log(f"应用名称与注册名称不一致：{app_path}，{app_name}")
+
+        return self.apps.get(app_name, None)
+
+    def load_gateway(self, gateway_name: str) -> Optional[BaseGateway]:
+        """
+        Import and add gateway registered with add_lazy_gateway.
+        """
+        gateway_path: Optional[str] = self.lazy_gateways.pop(gateway_name, None)
+        if gateway_path:
+            self.add_gateway(load_object(gateway_path), gateway_name)
+
+        return self.gateways.get(gateway_name, None)
+
     def init_engines(self) -> None:
         """
         Init all engines.
@@ -122,6 +190,9 @@ class MainEngine:
         Return gateway object by name.
         """
         gateway: BaseGateway = self.gateways.get(gateway_name, None)
+        if not gateway and gateway_name in self.lazy_gateways:
+            gateway = self.load_gateway(gateway_name)
+
         if not gateway:
             self.write_log(f"找不到底层接口：{gateway_name}")
         return gateway
@@ -131,6 +202,10 @@ class MainEngine:
         Return engine object by name.
         """
         engine: BaseEngine = self.engines.get(engine_name, None)
+        if not engine and engine_name in self.lazy_apps:
+            self.load_app(engine_name)
+            engine = self.engines.get(engine_name, None)
+
         if not engine:
             self.write_log(f"找不到引擎：{engine_name}")
         return engine
@@ -146,20 +221,29 @@ class MainEngine:
 
     def get_all_gateway_names(self) -> List[str]:
         """
-        Get all names of gateway added in main engine.
+        Get all names of gateway added in main engine, including those
+        not loaded yet.
         """
-        return list(self.gateways.keys())
+        return list(self.gateways.keys()) + list(self.lazy_gateways.keys())
 
     def get_all_apps(self) -> List[BaseApp]:
         """
-        Get all app objects.
+        Get all app objects, apps not loaded yet are loaded first.
         """
+        for app_name in list(self.lazy_apps.keys()):
+            self.load_app(app_name)
+
         return list(self.apps.values())
 
     def get_all_exchanges(self) -> List[Exchange]:
         """
-        Get all exchanges.
+        Get all exchanges, gateways not loaded yet are loaded first
+        unless their exchanges were given on registration.
         """
+        for gateway_name in list(self.lazy_gateways.keys()):
+            if gateway_name not in self.listed_gateways:
+                self.load_gateway(gateway_name)
+
         return self.exchanges
 
     def connect(self, setting: dict, gateway_name: str) -> None:
@@ -263,6 +347,10 @@ class BaseEngine(ABC):
 class LogEngine(BaseEngine):
     """
     Processes log event and output with logging module.
+
+    Log records are only put into a bounded queue on event engine
+    thread, formatting and I/O are done in batch by a background
+    listener.
     """
 
     def __init__(self, main_engine: MainEngine, event_engine: EventEngine) -> None:
@@ -281,6 +369,10 @@ class LogEngine(BaseEngine):
             "%(asctime)s  %(levelname)s: %(message)s"
         )
 
+        self.queue: Queue = Queue(maxsize=SETTINGS.get("log.buffer", 100_000))
+        self.queue_handler: LogQueueHandler = LogQueueHandler(self.queue)
+        self.listener: LogListener = LogListener(self.queue, self.queue_handler)
+
         self.add_null_handler()
 
         if SETTINGS["log.console"]:
@@ -289,6 +381,9 @@ class LogEngine(BaseEngine):
         if SETTINGS["log.file"]:
             self.add_file_handler()
 
+        self.logger.addHandler(self.queue_handler)
+        self.listener.start()
+
         self.register_event()
 
     def add_null_handler(self) -> None:
@@ -302,26 +397,21 @@ class LogEngine(BaseEngine):
         """
         Add console output of log.
         """
-        console_handler: logging.StreamHandler = logging.StreamHandler()
+        console_handler: BufferedStreamHandler = BufferedStreamHandler()
         console_handler.setLevel(self.level)
         console_handler.setFormatter(self.formatter)
-        self.logger.addHandler(console_handler)
+        self.listener.handlers += (console_handler,)
 
     def add_file_handler(self) -> None:
         """
-        Add file output of log.
+        Add file output of log, a new file is used every day.
         """
-        today_date: str = datetime.now().strftime("%Y%m%d")
-        filename: str = f"vt_{today_date}.log"
         log_path: Path = get_folder_path("log")
-        file_path: Path = log_path.joinpath(filename)
 
-        file_handler: logging.FileHandler = logging.FileHandler(
-            file_path, mode="a", encoding="utf8"
-        )
+        file_handler: DailyFileHandler = DailyFileHandler(log_path)
         file_handler.setLevel(self.level)
         file_handler.setFormatter(self.formatter)
-        self.logger.addHandler(file_handler)
+        self.listener.handlers += (file_handler,)
 
     def register_event(self) -> None:
         """"""
@@ -332,7 +422,156 @@ class LogEngine(BaseEngine):
         Process log event.
         """
         log: LogData = event.data
-        self.logger.log(log.level, log.msg)
+
+        # Skip finding caller in Logger.log, which is not used by format
+        if self.logger.isEnabledFor(log.level):
+            record: logging.LogRecord = self.logger.makeRecord(
+                self.logger.name, log.level, "", 0, log.msg, None, None
+            )
+            self.logger.handle(record)
+
+    def close(self) -> None:
+        """
+        Write all log records in queue before exit.
+        """
+        if not SETTINGS["log.active"]:
+            return
+
+        self.logger.removeHandler(self.queue_handler)
+        self.listener.stop()
+        self.listener.flush()
+
+        for handler in self.listener.handlers:
+            handler.close()
+
+
+class LogQueueHandler(QueueHandler):
+    """
+    Puts log record into bounded queue without formatting it, records
+    are dropped (and counted) when queue is full.
+    """
+
+    def __init__(self, queue: Queue) -> None:
+        """"""
+        super().__init__(queue)
+
+        self.dropped: int = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Formatting is left to listener thread.
+        """
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """"""
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
+
+
+class LogListener(QueueListener):
+    """
+    Writes log records in background thread. Once queue is empty,
+    handlers are flushed and records arriving in the next interval
+    are written together, instead of waking up for every record.
+    """
+
+    def __init__(self, queue: Queue, queue_handler: LogQueueHandler, interval: float = 0.05) -> None:
+        """"""
+        super().__init__(queue, respect_handler_level=True)
+
+        self.queue_handler: LogQueueHandler = queue_handler
+        self.interval: float = interval
+        self.dropped: int = 0
+
+    def dequeue(self, block: bool) -> logging.LogRecord:
+        """"""
+        if self.queue.empty():
+            self.flush()
+            sleep(self.interval)
+
+        return self.queue.get(block)
+
+    def enqueue_sentinel(self) -> None:
+        """
+        Wait for space in queue to stop listener.
+        """
+        self.queue.put(self._sentinel)
+
+    def flush(self) -> None:
+        """
+        Report dropped records and flush all handlers.
+        """
+        dropped: int = self.queue_handler.dropped
+        if dropped > self.dropped:
+            record: logging.LogRecord = logging.makeLogRecord({
+                "name": "veighna",
+                "levelno": logging.WARNING,
+                "levelname": "WARNING",
+                "msg": f"日志队列已满，丢弃日志{dropped - self.dropped}条"
+            })
+            self.dropped = dropped
+            super().handle(record)
+
+        for handler in self.handlers:
+            handler.flush()
+
+
+class BufferedStreamHandler(logging.StreamHandler):
+    """
+    Stream handler which leaves flushing to listener.
+    """
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """"""
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+
+class DailyFileHandler(BufferedStreamHandler):
+    """
+    Writes log into vt_{date}.log under folder, switches to the file of
+    next day when a record created after midnight arrives.
+    """
+
+    def __init__(self, folder: Path) -> None:
+        """"""
+        self.folder: Path = folder
+        self.rollover_at: float = 0
+
+        super().__init__(self.open(datetime.now()))
+
+    def open(self, dt: datetime) -> Any:
+        """
+        Open log file of the date and set next rollover time.
+        """
+        filename: str = f"vt_{dt.strftime('%Y%m%d')}.log"
+        next_date: datetime = datetime(dt.year, dt.month, dt.day) + timedelta(days=1)
+        self.rollover_at = next_date.timestamp()
+
+        return open(self.folder.joinpath(filename), mode="a", encoding="utf8")
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """"""
+        if record.created >= self.rollover_at:
+            self.setStream(self.open(datetime.fromtimestamp(record.created))).close()
+
+        super().emit(record)
+
+    def close(self) -> None:
+        """"""
+        self.acquire()
+        try:
+            self.flush()
+            self.stream.close()
+        finally:
+            self.release()
+
+        super().close()
 
 
 class OmsEngine(BaseEngine):
@@ -355,6 +594,46 @@ class OmsEngine(BaseEngine):
         self.active_orders: Dict[str, OrderData] = {}
         self.active_quotes: Dict[str, QuoteData] = {}
 
+        # Secondary indexes: key -> {vt_id: data}
+        self.symbol_active_orders: Dict[str, Dict[str, OrderData]] = {}
+        self.gateway_active_orders: Dict[str, Dict[str, OrderData]] = {}
+        self.direction_active_orders: Dict[Direction, Dict[str, OrderData]] = {}
+        self.symbol_active_quotes: Dict[str, Dict[str, QuoteData]] = {}
+        self.gateway_active_quotes: Dict[str, Dict[str, QuoteData]] = {}
+        self.symbol_positions: Dict[str, Dict[str, PositionData]] = {}
+        self.order_trades: Dict[str, Dict[str, TradeData]] = {}
+
+        # Retention of finished orders and trades: (finish time, vt_id)
+        self.archive: Optional[OmsArchive] = None
+        self.archive_count: int = 0
+        self.archive_age: float = 0
+        self.finished_orders: Deque[Tuple[float, str]] = deque()
+        self.finished_trades: Deque[Tuple[float, str]] = deque()
+
+        # Snapshot for warm restart, written by snapshot thread
+        self.snapshot_path: str = ""
+        self.snapshot_interval: float = 0
+        self.snapshot_time: float = 0
+        self.snapshot_dirty: bool = False
+        self.snapshot_queue: Queue = Queue()
+        self.snapshot_thread: Optional[Thread] = None
+
+        # Data restored from snapshot but not confirmed by gateway yet
+        self.stale_orders: Dict[str, OrderData] = {}
+        self.stale_positions: Dict[str, PositionData] = {}
+        self.stale_accounts: Dict[str, AccountData] = {}
+        self.reconcile_time: float = 0
+
+        # Incremental PnL, exposure and margin of positions
+        self.exposure_active: bool = False
+        self.margin_rate: float = 0
+        self.margin_rates: Dict[str, float] = {}
+        self.position_exposures: Dict[str, PositionExposure] = {}
+        self.symbol_exposures: Dict[str, Dict[str, PositionExposure]] = {}
+        self.account_exposures: Dict[str, ExposureData] = {}
+        self.product_exposures: Dict[Product, ExposureData] = {}
+        self.total_exposure: ExposureData = ExposureData()
+
         self.add_function()
         self.register_event()
 
@@ -377,6 +656,11 @@ class OmsEngine(BaseEngine):
         self.main_engine.get_all_quotes = self.get_all_quotes
         self.main_engine.get_all_active_orders = self.get_all_active_orders
         self.main_engine.get_all_active_quotes = self.get_all_active_quotes
+        self.main_engine.get_order_trades = self.get_order_trades
+        self.main_engine.get_position_exposure = self.get_position_exposure
+        self.main_engine.get_account_exposure = self.get_account_exposure
+        self.main_engine.get_product_exposure = self.get_product_exposure
+        self.main_engine.get_total_exposure = self.get_total_exposure
 
     def register_event(self) -> None:
         """"""
@@ -393,49 +677,104 @@ class OmsEngine(BaseEngine):
         tick: TickData = event.data
         self.ticks[tick.vt_symbol] = tick
 
+        if self.exposure_active:
+            items: Optional[Dict[str, PositionExposure]] = self.symbol_exposures.get(tick.vt_symbol, None)
+            if items:
+                for item in items.values():
+                    self.update_exposure(item, item.volume, item.price, tick.last_price)
+
     def process_order_event(self, event: Event) -> None:
         """"""
         order: OrderData = event.data
-        self.orders[order.vt_orderid] = order
+        vt_orderid: str = order.vt_orderid
+        new: bool = vt_orderid not in self.orders
+        self.orders[vt_orderid] = order
+        self.snapshot_dirty = True
+
+        if self.stale_orders and self.stale_orders.get(vt_orderid, None) is not order:
+            self.stale_orders.pop(vt_orderid, None)
 
         # If order is active, then update data in dict.
         if order.is_active():
-            self.active_orders[order.vt_orderid] = order
+            self.active_orders[vt_orderid] = order
+
+            add_index(self.symbol_active_orders, order.vt_symbol, vt_orderid, order)
+            add_index(self.gateway_active_orders, order.gateway_name, vt_orderid, order)
+            add_index(self.direction_active_orders, order.direction, vt_orderid, order)
         # Otherwise, pop inactive order from in dict
-        elif order.vt_orderid in self.active_orders:
-            self.active_orders.pop(order.vt_orderid)
+        elif vt_orderid in self.active_orders:
+            self.active_orders.pop(vt_orderid)
+
+            remove_index(self.symbol_active_orders, order.vt_symbol, vt_orderid)
+            remove_index(self.gateway_active_orders, order.gateway_name, vt_orderid)
+            remove_index(self.direction_active_orders, order.direction, vt_orderid)
+
+            if self.archive:
+                self.finished_orders.append((monotonic(), vt_orderid))
+        # Order pushed without active status before
+        elif new and self.archive:
+            self.finished_orders.append((monotonic(), vt_orderid))
 
     def process_trade_event(self, event: Event) -> None:
         """"""
         trade: TradeData = event.data
         self.trades[trade.vt_tradeid] = trade
 
+        add_index(self.order_trades, trade.vt_orderid, trade.vt_tradeid, trade)
+
+        if self.archive:
+            self.finished_trades.append((monotonic(), trade.vt_tradeid))
+
+        if self.exposure_active:
+            self.process_trade_exposure(trade)
+
     def process_position_event(self, event: Event) -> None:
         """"""
         position: PositionData = event.data
         self.positions[position.vt_positionid] = position
+        self.snapshot_dirty = True
+
+        add_index(self.symbol_positions, position.vt_symbol, position.vt_positionid, position)
+
+        if self.stale_positions and self.stale_positions.get(position.vt_positionid, None) is not position:
+            self.stale_positions.pop(position.vt_positionid, None)
+
+        if self.exposure_active:
+            self.process_position_exposure(position)
 
     def process_account_event(self, event: Event) -> None:
         """"""
         account: AccountData = event.data
         self.accounts[account.vt_accountid] = account
+        self.snapshot_dirty = True
+
+        if self.stale_accounts and self.stale_accounts.get(account.vt_accountid, None) is not account:
+            self.stale_accounts.pop(account.vt_accountid, None)
 
     def process_contract_event(self, event: Event) -> None:
         """"""
         contract: ContractData = event.data
         self.contracts[contract.vt_symbol] = contract
+        self.snapshot_dirty = True
 
     def process_quote_event(self, event: Event) -> None:
         """"""
         quote: QuoteData = event.data
-        self.quotes[quote.vt_quoteid] = quote
+        vt_quoteid: str = quote.vt_quoteid
+        self.quotes[vt_quoteid] = quote
 
         # If quote is active, then update data in dict.
         if quote.is_active():
-            self.active_quotes[quote.vt_quoteid] = quote
+            self.active_quotes[vt_quoteid] = quote
+
+            add_index(self.symbol_active_quotes, quote.vt_symbol, vt_quoteid, quote)
+            add_index(self.gateway_active_quotes, quote.gateway_name, vt_quoteid, quote)
         # Otherwise, pop inactive quote from in dict
-        elif quote.vt_quoteid in self.active_quotes:
-            self.active_quotes.pop(quote.vt_quoteid)
+        elif vt_quoteid in self.active_quotes:
+            self.active_quotes.pop(vt_quoteid)
+
+            remove_index(self.symbol_active_quotes, quote.vt_symbol, vt_quoteid)
+            remove_index(self.gateway_active_quotes, quote.gateway_name, vt_quoteid)
 
     def get_tick(self, vt_symbol: str) -> Optional[TickData]:
         """
@@ -443,17 +782,428 @@ class OmsEngine(BaseEngine):
         """
         return self.ticks.get(vt_symbol, None)
 
+    def process_timer_event(self, event: Event) -> None:
+        """
+        Move finished orders and trades beyond retention into archive,
+        take snapshot and reconcile restored data when it is time.
+        """
+        if self.archive:
+            self.archive_finished()
+
+        if self.snapshot_interval or self.reconcile_time:
+            now: float = monotonic()
+
+            if self.snapshot_interval and now >= self.snapshot_time:
+                self.snapshot_time = now + self.snapshot_interval
+                if self.snapshot_dirty:
+                    self.take_snapshot()
+
+            if self.reconcile_time and now >= self.reconcile_time:
+                self.reconcile_snapshot()
+
+    def enable_exposure(self, margin_rate: float = 0.1) -> None:
+        """
+        Start maintaining mark-to-market PnL, notional exposure and
+        margin of each position, and their totals by account (gateway),
+        by product and of all positions.
+
+        Totals are updated with the change of a position, only when tick
+        of its contract, its trade or its position data arrives.
+        Margin is absolute notional value multiplied by margin rate,
+        which can be set for each contract with set_margin_rate.
+        """
+        self.margin_rate = margin_rate
+        self.exposure_active = True
+
+        for position in self.positions.values():
+            self.process_position_exposure(position)
+
+    def set_margin_rate(self, vt_symbol: str, margin_rate: float) -> None:
+        """
+        Set margin rate of a contract.
+        """
+        self.margin_rates[vt_symbol] = margin_rate
+
+        for item in self.symbol_exposures.get(vt_symbol, {}).values():
+            item.margin_rate = margin_rate
+            self.update_exposure(item, item.volume, item.price, item.last_price)
+
+    def process_position_exposure(self, position: PositionData) -> None:
+        """
+        Replace volume and cost price with data from gateway.
+        """
+        item: Optional[PositionExposure] = self.get_exposure_item(position.vt_positionid)
+        if not item:
+            return
+
+        volume: float = position.volume
+        if position.direction == Direction.SHORT:
+            volume = -volume
+
+        self.update_exposure(item, volume, position.price, item.last_price)
+
+    def process_trade_exposure(self, trade: TradeData) -> None:
+        """
+        Apply trade to position before gateway pushes new position data.
+        """
+        prefix: str = f"{trade.gateway_name}.{trade.vt_symbol}."
+
+        # Net position (also for trade arriving before first net position
+        # data), or long/short position opened or closed by trade
+        vt_positionid: str = prefix + Direction.NET.value
+        contract: Optional[ContractData] = self.contracts.get(trade.vt_symbol, None)
+
+        if (
+            vt_positionid not in self.position_exposures
+            and trade.offset != Offset.NONE
+            and not (contract and contract.net_position)
+        ):
+            if trade.offset == Offset.OPEN:
+                direction: Direction = trade.direction
+            elif trade.direction == Direction.LONG:
+                direction = Direction.SHORT
+            else:
+                direction = Direction.LONG
+            vt_positionid = prefix + direction.value
+
+        item: Optional[PositionExposure] = self.get_exposure_item(vt_positionid)
+        if not item:
+            return
+
+        change: float = trade.volume if trade.direction == Direction.LONG else -trade.volume
+        volume: float = item.volume + change
+        price: float = item.price
+
+        # Cost price changes only when position is increased or reversed
+        if not item.volume or (item.volume > 0) == (change > 0):
+            price = (item.price * abs(item.volume) + trade.price * trade.volume) / abs(volume)
+        elif volume and (volume > 0) != (item.volume > 0):
+            price = trade.price
+
+        self.update_exposure(item, volume, price, item.last_price)
+
+    def get_exposure_item(self, vt_positionid: str) -> Optional["PositionExposure"]:
+        """
+        Get exposure of position, create it if contract is known.
+        """
+        item: Optional[PositionExposure] = self.position_exposures.get(vt_positionid, None)
+        if item:
+            return item
+
+        gateway_name, _, rest = vt_positionid.partition(".")
+        vt_symbol: str = rest.rpartition(".")[0]
+
+        contract: Optional[ContractData] = self.contracts.get(vt_symbol, None)
+        if not contract:
+            return None
+
+        tick: Optional[TickData] = self.ticks.get(vt_symbol, None)
+
+        item = PositionExposure(
+            vt_positionid=vt_positionid,
+            vt_symbol=vt_symbol,
+            gateway_name=gateway_name,
+            product=contract.product,
+            size=contract.size,
+            margin_rate=self.margin_rates.get(vt_symbol, self.margin_rate),
+            last_price=tick.last_price if tick else 0
+        )
+        self.position_exposures[vt_positionid] = item
+        add_index(self.symbol_exposures, vt_symbol, vt_positionid, item)
+
+        if gateway_name not in self.account_exposures:
+            self.account_exposures[gateway_name] = ExposureData()
+        if item.product not in self.product_exposures:
+            self.product_exposures[item.product] = ExposureData()
+
+        return item
+
+    def update_exposure(self, item: "PositionExposure", volume: float, price: float, last_price: float) -> None:
+        """
+        Update exposure of position and add the change into totals.
+        """
+        item.volume = volume
+        item.price = price
+        item.last_price = last_price
+
+        # Use cost price before first tick arrives
+        mark_price: float = last_price or price
+
+        exposure: float = mark_price * volume * item.size
+        pnl: float = exposure - price * volume * item.size
+        margin: float = abs(exposure) * item.margin_rate
+
+        pnl_change: float = pnl - item.pnl
+        exposure_change: float = exposure - item.exposure
+        margin_change: float = margin - item.margin
+
+        item.pnl = pnl
+        item.exposure = exposure
+        item.margin = margin
+
+        for total in (
+            self.account_exposures[item.gateway_name],
+            self.product_exposures[item.product],
+            self.total_exposure
+        ):
+            total.pnl += pnl_change
+            total.exposure += exposure_change
+            total.margin += margin_change
+
+    def get_position_exposure(self, vt_positionid: str) -> Optional["PositionExposure"]:
+        """
+        Get PnL, exposure and margin of position.
+        """
+        item: Optional[PositionExposure] = self.position_exposures.get(vt_positionid, None)
+        return copy(item) if item else None
+
+    def get_account_exposure(self, gateway_name: str) -> Optional["ExposureData"]:
+        """
+        Get total PnL, exposure and margin of positions in account.
+        """
+        total: Optional[ExposureData] = self.account_exposures.get(gateway_name, None)
+        if not total:
+            return None
+        return ExposureData(total.pnl, total.exposure, total.margin)
+
+    def get_product_exposure(self, product: Product) -> Optional["ExposureData"]:
+        """
+        Get total PnL, exposure and margin of positions of product.
+        """
+        total: Optional[ExposureData] = self.product_exposures.get(product, None)
+        if not total:
+            return None
+        return ExposureData(total.pnl, total.exposure, total.margin)
+
+    def get_total_exposure(self) -> "ExposureData":
+        """
+        Get total PnL, exposure and margin of all positions.
+        """
+        total: ExposureData = self.total_exposure
+        return ExposureData(total.pnl, total.exposure, total.margin)
+
+    def enable_snapshot(self, interval: float = 5, path: str = "") -> None:
+        """
+        Save snapshot of contracts, positions, accounts and active
+        orders every interval seconds (only if changed) for warm restart.
+
+        Data is copied on event engine thread, while pickling and file
+        writing are done by snapshot thread.
+        """
+        self.snapshot_path = path or str(get_file_path("oms_snapshot.pkl"))
+        self.snapshot_interval = interval
+        self.snapshot_time = monotonic() + interval
+
+        if not self.snapshot_thread:
+            self.snapshot_thread = Thread(target=self.run_snapshot, daemon=True)
+            self.snapshot_thread.start()
+            self.event_engine.register(EVENT_TIMER, self.process_timer_event)
+
+    def take_snapshot(self) -> None:
+        """
+        Copy data and hand it to snapshot thread.
+
+        Each object is shallow copied here on event engine thread, as
+        they may be modified by other engines while being pickled.
+        """
+        self.snapshot_dirty = False
+
+        snapshot: dict = {
+            "datetime": datetime.now(),
+            "contracts": [copy(contract) for contract in self.contracts.values()],
+            "positions": [copy(position) for position in self.positions.values()],
+            "accounts": [copy(account) for account in self.accounts.values()],
+            "orders": [copy(order) for order in self.active_orders.values()],
+        }
+        self.snapshot_queue.put(snapshot)
+
+    def run_snapshot(self) -> None:
+        """
+        Write snapshot into file, replacing the old one atomically.
+        None is put into queue to stop.
+        """
+        while True:
+            snapshot: Optional[dict] = self.snapshot_queue.get()
+            if snapshot is None:
+                return
+
+            # Only the latest snapshot is worth writing
+            while not self.snapshot_queue.empty():
+                latest: Optional[dict] = self.snapshot_queue.get()
+                if latest is None:
+                    self.snapshot_queue.put(None)
+                    break
+                snapshot = latest
+
+            temp_path: str = self.snapshot_path + ".tmp"
+            with open(temp_path, "wb") as f:
+                pickle.dump(snapshot, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.snapshot_path)
+
+    def load_snapshot(self, path: str = "", reconcile_timeout: float = 30) -> bool:
+        """
+        Restore data from snapshot before connecting gateways, so that
+        they can be used at once. Events of restored data are also put
+        into event engine for other engines.
+
+        Restored orders, positions and accounts not updated by gateway
+        within reconcile_timeout seconds are removed as stale, or call
+        reconcile_snapshot after all gateways finished querying.
+        """
+        path = path or str(get_file_path("oms_snapshot.pkl"))
+        if not os.path.exists(path):
+            return False
+
+        with open(path, "rb") as f:
+            snapshot: dict = pickle.load(f)
+
+        for contract in snapshot["contracts"]:
+            self.process_contract_event(Event(EVENT_CONTRACT, contract))
+            self.event_engine.put(Event(EVENT_CONTRACT, contract))
+
+        for position in snapshot["positions"]:
+            self.stale_positions[position.vt_positionid] = position
+            self.process_position_event(Event(EVENT_POSITION, position))
+            self.event_engine.put(Event(EVENT_POSITION, position))
+            self.event_engine.put(Event(EVENT_POSITION + position.vt_symbol, position))
+
+        for account in snapshot["accounts"]:
+            self.stale_accounts[account.vt_accountid] = account
+            self.process_account_event(Event(EVENT_ACCOUNT, account))
+            self.event_engine.put(Event(EVENT_ACCOUNT, account))
+            self.event_engine.put(Event(EVENT_ACCOUNT + account.vt_accountid, account))
+
+        for order in snapshot["orders"]:
+            self.stale_orders[order.vt_orderid] = order
+            self.process_order_event(Event(EVENT_ORDER, order))
+            self.event_engine.put(Event(EVENT_ORDER, order))
+            self.event_engine.put(Event(EVENT_ORDER + order.vt_orderid, order))
+
+        self.reconcile_time = monotonic() + reconcile_timeout
+        self.event_engine.register(EVENT_TIMER, self.process_timer_event)
+
+        self.main_engine.write_log(
+            f"委托管理快照加载完成（{snapshot['datetime']}），合约{len(snapshot['contracts'])}个，"
+            f"持仓{len(snapshot['positions'])}个，活动委托{len(snapshot['orders'])}个"
+        )
+        return True
+
+    def reconcile_snapshot(self) -> None:
+        """
+        Remove restored data not confirmed by gateway.
+        """
+        self.reconcile_time = 0
+
+        for vt_orderid, order in self.stale_orders.items():
+            self.orders.pop(vt_orderid, None)
+            self.active_orders.pop(vt_orderid, None)
+
+            remove_index(self.symbol_active_orders, order.vt_symbol, vt_orderid)
+            remove_index(self.gateway_active_orders, order.gateway_name, vt_orderid)
+            remove_index(self.direction_active_orders, order.direction, vt_orderid)
+
+        for vt_positionid, position in self.stale_positions.items():
+            self.positions.pop(vt_positionid, None)
+            remove_index(self.symbol_positions, position.vt_symbol, vt_positionid)
+
+            item: Optional[PositionExposure] = self.position_exposures.get(vt_positionid, None)
+            if item:
+                self.update_exposure(item, 0, 0, item.last_price)
+
+        for vt_accountid in self.stale_accounts:
+            self.accounts.pop(vt_accountid, None)
+
+        if self.stale_orders or self.stale_positions or self.stale_accounts:
+            self.main_engine.write_log(
+                f"委托管理快照核对完成，移除未确认的委托{len(self.stale_orders)}个，"
+                f"持仓{len(self.stale_positions)}个，账户{len(self.stale_accounts)}个"
+            )
+
+        self.stale_orders.clear()
+        self.stale_positions.clear()
+        self.stale_accounts.clear()
+
+    def enable_archive(self, max_count: int = 10_000, max_age: float = 0, path: str = "") -> None:
+        """
+        Keep at most max_count finished (inactive) orders and trades in
+        memory, and those finished more than max_age seconds ago if
+        max_age is given. The rest are moved into an archive file every
+        second, and still found by get_order/get_trade/get_order_trades,
+        but no longer included in get_all_orders/get_all_trades.
+        """
+        if not self.archive:
+            self.archive = OmsArchive(path or str(get_file_path("oms_archive.db")))
+            self.event_engine.register(EVENT_TIMER, self.process_timer_event)
+
+            now: float = monotonic()
+            for order in self.orders.values():
+                if not order.is_active():
+                    self.finished_orders.append((now, order.vt_orderid))
+            for vt_tradeid in self.trades:
+                self.finished_trades.append((now, vt_tradeid))
+
+        self.archive_count = max_count
+        self.archive_age = max_age
+
+    def archive_finished(self) -> None:
+        """
+        Move finished orders and trades beyond retention into archive.
+        """
+        orders: List[OrderData] = []
+        for vt_orderid in self.pop_finished(self.finished_orders):
+            order: Optional[OrderData] = self.orders.get(vt_orderid, None)
+
+            # Skip order updated to active again or archived already
+            if order and not order.is_active():
+                orders.append(self.orders.pop(vt_orderid))
+
+        trades: List[TradeData] = []
+        for vt_tradeid in self.pop_finished(self.finished_trades):
+            trade: Optional[TradeData] = self.trades.pop(vt_tradeid, None)
+            if trade:
+                trades.append(trade)
+                remove_index(self.order_trades, trade.vt_orderid, vt_tradeid)
+
+        if orders or trades:
+            self.archive.save(orders, trades)
+
+    def pop_finished(self, finished: Deque[Tuple[float, str]]) -> List[str]:
+        """
+        Pop vt_id of data beyond max count or max age.
+        """
+        vt_ids: List[str] = []
+
+        while len(finished) > self.archive_count:
+            vt_ids.append(finished.popleft()[1])
+
+        if self.archive_age:
+            expiry: float = monotonic() - self.archive_age
+            while finished and finished[0][0] < expiry:
+                vt_ids.append(finished.popleft()[1])
+
+        return vt_ids
+
     def get_order(self, vt_orderid: str) -> Optional[OrderData]:
         """
         Get latest order data by vt_orderid.
         """
-        return self.orders.get(vt_orderid, None)
+        order: Optional[OrderData] = self.orders.get(vt_orderid, None)
+
+        if not order and self.archive:
+            order = self.archive.load_order(vt_orderid)
+
+        return order
 
     def get_trade(self, vt_tradeid: str) -> Optional[TradeData]:
         """
         Get trade data by vt_tradeid.
         """
-        return self.trades.get(vt_tradeid, None)
+        trade: Optional[TradeData] = self.trades.get(vt_tradeid, None)
+
+        if not trade and self.archive:
+            trade = self.archive.load_trade(vt_tradeid)
+
+        return trade
 
     def get_position(self, vt_positionid: str) -> Optional[PositionData]:
         """
@@ -497,11 +1247,16 @@ class OmsEngine(BaseEngine):
         """
         return list(self.trades.values())
 
-    def get_all_positions(self) -> List[PositionData]:
+    def get_all_positions(self, vt_symbol: str = "") -> List[PositionData]:
         """
-        Get all position data.
+        Get all position data by vt_symbol.
+
+        If vt_symbol is empty, return all positions.
         """
-        return list(self.positions.values())
+        if not vt_symbol:
+            return list(self.positions.values())
+        else:
+            return list(self.symbol_positions.get(vt_symbol, {}).values())
 
     def get_all_accounts(self) -> List[AccountData]:
         """
@@ -521,41 +1276,169 @@ class OmsEngine(BaseEngine):
         """
         return list(self.quotes.values())
 
-    def get_all_active_orders(self, vt_symbol: str = "") -> List[OrderData]:
+    def get_all_active_orders(
+        self,
+        vt_symbol: str = "",
+        gateway_name: str = "",
+        direction: Direction = None
+    ) -> List[OrderData]:
         """
-        Get all active orders by vt_symbol.
+        Get all active orders by vt_symbol, gateway_name and direction.
 
-        If vt_symbol is empty, return all active orders.
+        Filters not given are ignored. If none is given, return all
+        active orders.
         """
-        if not vt_symbol:
-            return list(self.active_orders.values())
-        else:
-            active_orders: List[OrderData] = [
-                order
-                for order in self.active_orders.values()
-                if order.vt_symbol == vt_symbol
-            ]
-            return active_orders
+        indexes: List[Dict[str, OrderData]] = []
+
+        if vt_symbol:
+            indexes.append(self.symbol_active_orders.get(vt_symbol, {}))
+        if gateway_name:
+            indexes.append(self.gateway_active_orders.get(gateway_name, {}))
+        if direction:
+            indexes.append(self.direction_active_orders.get(direction, {}))
+
+        return intersect_indexes(indexes, self.active_orders)
 
-    def get_all_active_quotes(self, vt_symbol: str = "") -> List[QuoteData]:
+    def get_all_active_quotes(self, vt_symbol: str = "", gateway_name: str = "") -> List[QuoteData]:
         """
-        Get all active quotes by vt_symbol.
-        If vt_symbol is empty, return all active qutoes.
+        Get all active quotes by vt_symbol and gateway_name.
+        If none is given, return all active qutoes.
         """
-        if not vt_symbol:
-            return list(self.active_quotes.values())
-        else:
-            active_quotes: List[QuoteData] = [
-                quote
-                for quote in self.active_quotes.values()
-                if quote.vt_symbol == vt_symbol
-            ]
-            return active_quotes
+        indexes: List[Dict[str, QuoteData]] = []
+
+        if vt_symbol:
+            indexes.append(self.symbol_active_quotes.get(vt_symbol, {}))
+        if gateway_name:
+            indexes.append(self.gateway_active_quotes.get(gateway_name, {}))
+
+        return intersect_indexes(indexes, self.active_quotes)
+
+    def get_order_trades(self, vt_orderid: str) -> List[TradeData]:
+        """
+        Get all trades of order by vt_orderid.
+        """
+        trades: List[TradeData] = list(self.order_trades.get(vt_orderid, {}).values())
+
+        if self.archive:
+            trades = self.archive.load_order_trades(vt_orderid) + trades
+
+        return trades
+
+    def close(self) -> None:
+        """"""
+        if self.archive:
+            self.archive.close()
+
+        if self.snapshot_thread:
+            if self.snapshot_dirty:
+                self.take_snapshot()
+
+            self.snapshot_queue.put(None)
+            self.snapshot_thread.join()
+
+
+@dataclass
+class ExposureData:
+    """
+    Total mark-to-market PnL, notional exposure (long positive, short
+    negative) and margin of positions.
+    """
+
+    pnl: float = 0
+    exposure: float = 0
+    margin: float = 0
+
+
+@dataclass
+class PositionExposure(ExposureData):
+    """
+    PnL, exposure and margin of a position, volume is negative for
+    short position.
+    """
+
+    vt_positionid: str = ""
+    vt_symbol: str = ""
+    gateway_name: str = ""
+    product: Optional[Product] = None
+    size: float = 1
+    margin_rate: float = 0
+
+    volume: float = 0
+    price: float = 0
+    last_price: float = 0
+
+
+class OmsArchive:
+    """
+    Archive of finished orders and trades in a SQLite file, each data
+    is stored as pickled bytes and found by its vt_id.
+
+    Archive is cleared when created, so it only holds data of current
+    process.
+    """
+
+    def __init__(self, path: str) -> None:
+        """"""
+        self.connection: sqlite3.Connection = sqlite3.connect(path, check_same_thread=False)
+
+        self.connection.executescript(
+            """
+            DROP TABLE IF EXISTS orders;
+            DROP TABLE IF EXISTS trades;
+            CREATE TABLE orders (vt_orderid TEXT PRIMARY KEY, data BLOB);
+            CREATE TABLE trades (vt_tradeid TEXT PRIMARY KEY, vt_orderid TEXT, data BLOB);
+            CREATE INDEX trades_vt_orderid ON trades (vt_orderid);
+            """
+        )
+
+    def save(self, orders: List[OrderData], trades: List[TradeData]) -> None:
+        """
+        Save orders and trades in one transaction.
+        """
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO orders VALUES (?, ?)",
+                [(order.vt_orderid, dumps(order)) for order in orders]
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO trades VALUES (?, ?, ?)",
+                [(trade.vt_tradeid, trade.vt_orderid, dumps(trade)) for trade in trades]
+            )
+
+    def load_order(self, vt_orderid: str) -> Optional[OrderData]:
+        """"""
+        row: Optional[tuple] = self.connection.execute(
+            "SELECT data FROM orders WHERE vt_orderid = ?", (vt_orderid,)
+        ).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def load_trade(self, vt_tradeid: str) -> Optional[TradeData]:
+        """"""
+        row: Optional[tuple] = self.connection.execute(
+            "SELECT data FROM trades WHERE vt_tradeid = ?", (vt_tradeid,)
+        ).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def load_order_trades(self, vt_orderid: str) -> List[TradeData]:
+        """"""
+        rows: List[tuple] = self.connection.execute(
+            "SELECT data FROM trades WHERE vt_orderid = ? ORDER BY rowid", (vt_orderid,)
+        ).fetchall()
+        return [pickle.loads(row[0]) for row in rows]
+
+    def close(self) -> None:
+        """"""
+        self.connection.close()
 
 
 class EmailEngine(BaseEngine):
     """
     Provides email sending function.
+
+    One authenticated SMTP session is kept alive and reconnected on
+    failure. Emails to the same receiver arriving within email.window
+    seconds are combined into one digest, and at most one email is
+    sent to each receiver every email.interval seconds.
     """
 
     def __init__(self, main_engine: MainEngine, event_engine: EventEngine) -> None:
@@ -566,6 +1449,15 @@ class EmailEngine(BaseEngine):
         self.queue: Queue = Queue()
         self.active: bool = False
 
+        self.window: float = SETTINGS.get("email.window", 0)
+        self.interval: float = SETTINGS.get("email.interval", 0)
+        self.retry_interval: float = 5
+        self.timeout: float = 10
+
+        self.smtp: Optional[smtplib.SMTP] = None
+        self.pending: Dict[str, List[EmailMessage]] = {}
+        self.send_times: Dict[str, float] = {}
+
         self.main_engine.send_email = self.send_email
 
     def send_email(self, subject: str, content: str, receiver: str = "") -> None:
@@ -588,29 +1480,201 @@ class EmailEngine(BaseEngine):
 
     def run(self) -> None:
         """"""
-        while self.active:
+        while self.active or self.pending or not self.queue.empty():
+            # Wait shorter if some receiver is being rate limited
+            timeout: float = 1
+            if self.pending:
+                send_time: float = min(self.send_times.get(receiver, 0) for receiver in self.pending)
+                timeout = max(send_time - monotonic(), 0)
+
             try:
-                msg: EmailMessage = self.queue.get(block=True, timeout=1)
-
-                with smtplib.SMTP_SSL(
-                    SETTINGS["email.server"], SETTINGS["email.port"]
-                ) as smtp:
-                    smtp.login(
-                        SETTINGS["email.username"], SETTINGS["email.password"]
-                    )
-                    smtp.send_message(msg)
+                msg: EmailMessage = self.queue.get(block=True, timeout=timeout)
+                self.pending.setdefault(msg["To"], []).append(msg)
+
+                # Collect emails arriving within window
+                end: float = monotonic() + self.window
+                while True:
+                    msg = self.queue.get(block=True, timeout=max(end - monotonic(), 0))
+                    self.pending.setdefault(msg["To"], []).append(msg)
             except Empty:
                 pass
 
+            self.send_pending(flush=not self.active)
+
+        self.disconnect()
+
+    def send_pending(self, flush: bool = False) -> None:
+        """
+        Send digest to every receiver not limited by interval.
+        """
+        now: float = monotonic()
+
+        for receiver in list(self.pending.keys()):
+            if not flush and self.send_times.get(receiver, 0) > now:
+                continue
+
+            msgs: List[EmailMessage] = self.pending.pop(receiver)
+            msg: EmailMessage = create_digest(msgs)
+
+            if self.send_message(msg):
+                self.send_times[receiver] = now + self.interval
+            elif flush:
+                self.main_engine.write_log(f"邮件发送失败，丢弃邮件{len(msgs)}封")
+            else:
+                self.pending[receiver] = msgs + self.pending.get(receiver, [])
+                self.send_times[receiver] = now + self.retry_interval
+
+        # Keep send time only for receivers still being limited
+        for receiver in list(self.send_times.keys()):
+            if self.send_times[receiver] <= now and receiver not in self.pending:
+                self.send_times.pop(receiver)
+
+    def send_message(self, msg: EmailMessage) -> bool:
+        """
+        Send message with current session, reconnect once on failure.
+
+        Session kept alive may have been closed by server when idle,
+        so it is checked with NOOP and reconnected before sending.
+        """
+        if self.smtp and not self.check_session():
+            self.disconnect()
+
+        for _ in range(2):
+            try:
+                if not self.smtp:
+                    self.connect()
+
+                self.smtp.send_message(msg)
+                return True
+            except (smtplib.SMTPException, OSError) as e:
+                self.main_engine.write_log(f"邮件发送异常：{e}")
+                self.disconnect()
+
+        return False
+
+    def connect(self) -> None:
+        """
+        Open SMTP session and login.
+        """
+        if SETTINGS.get("email.ssl", True):
+            self.smtp = smtplib.SMTP_SSL(SETTINGS["email.server"], SETTINGS["email.port"], timeout=self.timeout)
+        else:
+            self.smtp = smtplib.SMTP(SETTINGS["email.server"], SETTINGS["email.port"], timeout=self.timeout)
+
+        if SETTINGS["email.username"]:
+            self.smtp.login(SETTINGS["email.username"], SETTINGS["email.password"])
+
+    def check_session(self) -> bool:
+        """
+        Check whether current SMTP session is still alive.
+        """
+        try:
+            code, _ = self.smtp.noop()
+        except (smtplib.SMTPException, OSError):
+            return False
+
+        return code == 250
+
+    def disconnect(self) -> None:
+        """
+        Close SMTP session, ignoring error of broken connection.
+        """
+        if not self.smtp:
+            return
+
+        try:
+            self.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self.smtp.close()
+
+        self.smtp = None
+
     def start(self) -> None:
         """"""
         self.active = True
         self.thread.start()
 
     def close(self) -> None:
-        """"""
+        """
+        Send all emails in queue before exit.
+        """
         if not self.active:
             return
 
         self.active = False
         self.thread.join()
+
+
+def create_digest(msgs: List[EmailMessage]) -> EmailMessage:
+    """
+    Combine emails to the same receiver into one.
+    """
+    if len(msgs) == 1:
+        return msgs[0]
+
+    first: EmailMessage = msgs[0]
+
+    digest: EmailMessage = EmailMessage()
+    digest["From"] = first["From"]
+    digest["To"] = first["To"]
+    digest["Subject"] = f"{first['Subject']}等{len(msgs)}条通知"
+    digest.set_content("\n\n".join(
+        f"【{msg['Subject']}】\n{msg.get_content()}" for msg in msgs
+    ))
+
+    return digest
+
+
+def load_object(path: str) -> Any:
+    """
+    Import object by path like "module:name".
+    """
+    module_name, _, name = path.partition(":")
+    return getattr(import_module(module_name), name)
+
+
+def dumps(data: Any) -> bytes:
+    """
+    Pickle data for archive.
+    """
+    return pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+
+
+def add_index(index: Dict[Any, Dict[str, Any]], key: Any, vt_id: str, data: Any) -> None:
+    """
+    Add (or update) data into secondary index under key.
+    """
+    bucket: Optional[Dict[str, Any]] = index.get(key, None)
+    if bucket is None:
+        bucket = index[key] = {}
+    bucket[vt_id] = data
+
+
+def remove_index(index: Dict[Any, Dict[str, Any]], key: Any, vt_id: str) -> None:
+    """
+    Remove data from secondary index, and the key if nothing left.
+    """
+    bucket: Optional[Dict[str, Any]] = index.get(key, None)
+    if bucket is None:
+        return
+
+    bucket.pop(vt_id, None)
+    if not bucket:
+        index.pop(key)
+
+
+def intersect_indexes(indexes: List[Dict[str, Any]], default: Dict[str, Any]) -> List[Any]:
+    """
+    Get data in all indexes, starting from the smallest one. Return all
+    data in default if no index given.
+    """
+    if not indexes:
+        return list(default.values())
+
+    indexes.sort(key=len)
+    result: Dict[str, Any] = indexes[0]
+
+    for index in indexes[1:]:
+        result = {vt_id: data for vt_id, data in result.items() if vt_id in index}
+
+    return list(result.values())
@@ -156,6 +156,9 @@ class UftGateway(BaseGateway):
 
         self.td_api: "UftTdApi" = UftTdApi(self)
         self.md_api: "UftMdApi" = UftMdApi(self)
+
+        # 定时查询使用的定时器，事件引擎不支持add_timer时为EVENT_TIMER
+        self.timer_type: str = ""
         self.server: str = ""
 
     def connect(self, setting: dict) -> None:
@@ -223,6 +226,12 @@ class UftGateway(BaseGateway):
 
     def close(self) -> None:
         """关闭接口"""
+        if self.timer_type == EVENT_TIMER:
+            self.event_engine.unregister(EVENT_TIMER, self.process_timer_event)
+        elif self.timer_type:
+            self.event_engine.remove_timer(self.timer_type)
+        self.timer_type = ""
+
         self.td_api.close()
         self.md_api.close()
 
@@ -235,20 +244,30 @@ class UftGateway(BaseGateway):
 
     def process_timer_event(self, event) -> None:
         """定时事件处理"""
-        self.count += 1
-        if self.count < 2:
-            return
-        self.count = 0
+        # 使用EVENT_TIMER时每2秒查询一次
+        if self.timer_type == EVENT_TIMER:
+            self.count += 1
+            if self.count < 2:
+                return
+            self.count = 0
 
         func = self.query_functions.pop(0)
         func()
         self.query_functions.append(func)
 
     def init_query(self) -> None:
-        """初始化查询任务"""
+        """初始化查询任务，重复连接时不再添加定时器"""
         self.count: int = 0
         self.query_functions: list = [self.query_account, self.query_position]
-        self.event_engine.register(EVENT_TIMER, self.process_timer_event)
+
+        if self.timer_type:
+            return
+
+        if hasattr(self.event_engine, "add_timer"):
+            self.timer_type = self.event_engine.add_timer(2, self.process_timer_event)
+        else:
+            self.timer_type = EVENT_TIMER
+            self.event_engine.register(EVENT_TIMER, self.process_timer_event)
 
 
 class UftMdApi(MdApi):